@@ -12,6 +12,10 @@ from email_utils import send_error_email
 
 class DataMartLoader:
     """Base class cho data mart loader - kế thừa từ DatabaseLoader pattern"""
+
+    # Load đầy đủ (truncate_before) ghi vào bảng shadow rồi RENAME đổi chỗ; bản trước giữ ở <bảng>__old để rollback
+    SHADOW_SUFFIX = "__new"
+    OLD_SUFFIX = "__old"
     
     def __init__(self):
         self.cfg = None
@@ -141,28 +145,54 @@ class DataMartLoader:
         files.sort(key=os.path.getmtime, reverse=True)
         return files[0]
 
-      # 7.1 Truncate table trước khi load
-    def truncate_table(self, table_name):
-        """Truncate table trước khi load"""
+    # 7.1 Bảng shadow cho load đầy đủ
+    def prepare_shadow_table(self, table_name):
+        """Tạo bảng shadow rỗng cùng cấu trúc với bảng thật (bảng thật vẫn đọc được trong lúc load)"""
+        shadow = table_name + self.SHADOW_SUFFIX
+        with self.conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {shadow}")
+            cur.execute(f"CREATE TABLE {shadow} LIKE {table_name}")
+        print(f"Prepared shadow table: {shadow}")
+        return shadow
+
+    def swap_in_shadow(self, table_name):
+        """1 lệnh RENAME TABLE (atomic): bảng thật → __old, shadow → bảng thật. Người đọc không thấy bảng rỗng"""
+        old = table_name + self.OLD_SUFFIX
+        with self.conn.cursor() as cur:
+            cur.execute(f"DROP TABLE IF EXISTS {old}")
+            cur.execute(f"RENAME TABLE {table_name} TO {old}, {table_name}{self.SHADOW_SUFFIX} TO {table_name}")
+        print(f"Swapped {table_name} (previous generation kept in {old})")
+
+    def drop_shadow_table(self, table_name):
         try:
             with self.conn.cursor() as cur:
-                cur.execute(f"TRUNCATE TABLE {table_name}")
-                self.conn.commit()
-                print(f"Truncated table: {table_name}")
-                return True
+                cur.execute(f"DROP TABLE IF EXISTS {table_name}{self.SHADOW_SUFFIX}")
         except Exception as e:
-            print(f"  WARNING: Error truncating {table_name}: {e}")
-            return False
-    
+            print(f"  WARNING: Error dropping shadow of {table_name}: {e}")
+
+    def rollback_table(self, table_name):
+        """Đổi lại bản trước (__old) vào bảng thật; bản vừa bị thay ra nằm ở __old nên rollback lại được"""
+        old = table_name + self.OLD_SUFFIX
+        swap = table_name + "__swap"
+        schema, _, name = old.rpartition(".")
+        with self.conn.cursor() as cur:
+            if schema:
+                cur.execute(f"SHOW TABLES FROM {schema} LIKE %s", (name,))
+            else:
+                cur.execute("SHOW TABLES LIKE %s", (name,))
+            if not cur.fetchone():
+                print(f"ERROR: No previous generation {old} to roll back to")
+                return False
+            cur.execute(f"RENAME TABLE {table_name} TO {swap}, {old} TO {table_name}, {swap} TO {old}")
+        print(f"Rolled back {table_name} to previous generation")
+        return True
+
     # 8️ LOAD DỮ LIỆU VÀO BẢNG
     def load_csv_to_table(self, csv_file, target_table, truncate_before=False):
         start_time = datetime.now()
-        """Load CSV file vào table"""
+        """Load CSV file vào table (truncate_before: thay toàn bộ dữ liệu qua bảng shadow + RENAME)"""
+        load_table = target_table
         try:
-            if truncate_before:
-                # 7.1 Truncate table trước khi load
-                self.truncate_table(target_table)
-
             print(f"Reading CSV: {os.path.basename(csv_file)}")
             
             with open(csv_file, 'r', encoding='utf-8') as f:
@@ -172,13 +202,17 @@ class DataMartLoader:
             if not rows:
                 print(f"No data in CSV file")
                 return False
+
+            if truncate_before:
+                # 7.1 Load vào shadow thay vì TRUNCATE bảng đang được đọc (chỉ tạo khi CSV có dữ liệu)
+                load_table = self.prepare_shadow_table(target_table)
             
             # Lấy columns từ CSV
             columns = list(rows[0].keys())
             
             # Tạo INSERT statement
             placeholders = ', '.join(['%s'] * len(columns))
-            sql = f"INSERT INTO {target_table} ({', '.join(columns)}) VALUES ({placeholders})"
+            sql = f"INSERT INTO {load_table} ({', '.join(columns)}) VALUES ({placeholders})"
             
             # 7.2 Thêm dữ liệu
             with self.conn.cursor() as cur:
@@ -187,6 +221,8 @@ class DataMartLoader:
                     cur.execute(sql, values)
                 
                 self.conn.commit()
+                if truncate_before:
+                    self.swap_in_shadow(target_table)
 
                 exec_time = (datetime.now() - start_time).total_seconds()
                 """ghi file log thành công"""
@@ -199,6 +235,13 @@ class DataMartLoader:
             """ghi file log thất bại"""
             self.log_file_fail(csv_file, exec_time, status="FAIL")
             print(f"Error loading {csv_file} to {target_table}: {e}")
+            if truncate_before:
+                # Bảng thật chưa bị đụng tới, chỉ cần bỏ shadow dở dang (kết nối có thể đã chết)
+                try:
+                    self.conn.rollback()
+                except Exception as rollback_error:
+                    print(f"  WARNING: Error rolling back: {rollback_error}")
+                self.drop_shadow_table(target_table)
             return False
     
     def log_file_success(self, csv_file, row_count, exec_time):
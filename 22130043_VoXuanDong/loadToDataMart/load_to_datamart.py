@@ -7,6 +7,7 @@ import argparse
 from load_price_trends import LoadPriceTrends
 from load_sales_daily import LoadSalesDaily  
 from load_features_daily import LoadFeaturesDaily
+from datamart_loader import DataMartLoader
 
 # ============================================================
 # LOAD TO DATA MART - CHẠY TẤT CẢ 3 PROCESSES
@@ -81,10 +82,23 @@ class LoadToDataMart:
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Load all Data Mart processes")
     parser.add_argument('--config', type=str, help='Path to custom config JSON')
+    parser.add_argument('--rollback', type=str, metavar='TABLE',
+                        help='Swap the previous generation (TABLE__old) back in, e.g. mart.dim_sales_daily')
     args = parser.parse_args()
 
     # Use default config if no config is provided
     config_source = args.config if args.config else "/D/DW/control/config_load.json"
+
+    if args.rollback:
+        loader = DataMartLoader()
+        if not loader.initialize("Rollback Data Mart", config_source):
+            sys.exit(1)
+        try:
+            ok = loader.rollback_table(args.rollback)
+        finally:
+            loader.close_connection()
+        sys.exit(0 if ok else 1)
+
     coordinator = LoadToDataMart(config_source=config_source)
     success = coordinator.run_all()
     
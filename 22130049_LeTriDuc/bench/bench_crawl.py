@@ -0,0 +1,146 @@
+"""
+Benchmark thông lượng crawler offline: dựng server giả lập (stub_site.py), chạy ChoTot.py và bds.py trỏ vào đó
+trong 1 thư mục tạm (không đụng ../data thật, không dùng seen index), rồi báo tin/s, p95 độ trễ và RSS đỉnh.
+Tin/s và độ trễ lấy từ file JSON metrics mà crawler tự ghi (crawl_metrics.py); RSS đỉnh lấy từ wait4 của process con
+(với bds.py chỉ tính process Python, không gồm Chromium).
+
+    cd 22130049_LeTriDuc/bench && python bench_crawl.py --latency-ms 80 --error-rate 0.02
+    python bench_crawl.py --only chotot --shards 8 --enrich
+"""
+import argparse
+import glob
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from stub_site import API_PATH, BDS_PATH, StubSite
+
+EXTRACT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "extract")
+
+
+def chotot_config(path, shards, pages):
+    """Cấu hình shard cho lần benchmark: N quận giả, mỗi quận tối đa `pages` trang."""
+    config = {
+        "max_requests": shards * pages * 2,
+        "max_pages_per_shard": pages,
+        "workers": min(4, shards),
+        "wave_pages": 10,
+        "discover": {"enabled": False},
+        "shards": [{"region_v2": 13000, "area_v2": 13100 + i, "province": "thanh pho ho chi minh"}
+                   for i in range(shards)],
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+
+
+def bench_block_config(path, host):
+    """Bản sao bds_block.json có thêm host của server giả lập vào first-party, để chặn third-party không chặn stub."""
+    with open(os.path.join(EXTRACT_DIR, "bds_block.json"), encoding="utf-8") as f:
+        config = json.load(f)
+    config["first_party_domains"] = list(config.get("first_party_domains", [])) + [host]
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def run_crawler(name, argv, run_dir, log_path):
+    """Chạy 1 crawler trong process con; trả về (exit code, thời gian, RSS đỉnh MB)."""
+    started = time.perf_counter()
+    with open(log_path, "w", encoding="utf-8") as log:
+        proc = subprocess.Popen([sys.executable, os.path.join(EXTRACT_DIR, argv[0])] + argv[1:],
+                                cwd=run_dir, stdout=log, stderr=subprocess.STDOUT)
+        # wait4 trả rusage của riêng process này (RUSAGE_CHILDREN thì gộp mọi process đã chạy)
+        _, status, rusage = os.wait4(proc.pid, 0)
+        proc.returncode = os.waitstatus_to_exitcode(status)
+    elapsed = time.perf_counter() - started
+    print(f" [{name}] exit {proc.returncode}, {elapsed:.1f}s, log: {log_path}")
+    if proc.returncode != 0:
+        with open(log_path, encoding="utf-8", errors="replace") as f:
+            print("".join(f.readlines()[-10:]))
+    return proc.returncode, elapsed, rusage.ru_maxrss / 1024
+
+
+def latest_metrics(metrics_dir, source):
+    paths = sorted(glob.glob(os.path.join(metrics_dir, f"{source}_*.json")), key=os.path.getmtime)
+    if not paths:
+        return None
+    with open(paths[-1], encoding="utf-8") as f:
+        return json.load(f)
+
+
+def report(name, result, metrics, server_requests):
+    code, elapsed, rss_mb = result
+    if metrics is None:
+        print(f" {name:7s}: không có file metrics (crawler lỗi?), RSS đỉnh {rss_mb:.0f} MB")
+        return
+    latency = ", ".join(f"{kind} p95 {v['p95_s'] * 1000:.0f} ms (p50 {v['p50_s'] * 1000:.0f}, n={v['count']})"
+                        for kind, v in metrics["latency"].items())
+    req = metrics["requests"]
+    print(f" {name:7s}: {metrics['listings']} tin trong {metrics['duration_s']:.1f}s → "
+          f"{metrics['listings_per_s']:.1f} tin/s, {metrics['pages_per_s']:.1f} trang/s | {latency} | "
+          f"lỗi/timeout/chặn {req['error']}/{req['timeout']}/{req['blocked']} | "
+          f"RSS đỉnh {rss_mb:.0f} MB | server nhận {server_requests} request | exit {code}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark crawler ChoTot/BDS với server giả lập")
+    parser.add_argument("--only", choices=["chotot", "bds"], default=None, help="Chỉ chạy 1 crawler")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Độ trễ cố định mỗi request (ms)")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="Độ trễ ngẫu nhiên thêm (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ response 503")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="Tỉ lệ response 429")
+    parser.add_argument("--shards", type=int, default=4, help="Số shard ChoTot")
+    parser.add_argument("--pages", type=int, default=20, help="Số trang mỗi shard ChoTot / số trang danh sách BDS")
+    parser.add_argument("--concurrency", type=int, default=8, help="--concurrency của ChoTot.py")
+    parser.add_argument("--rate", type=float, default=200.0,
+                        help="Giới hạn request/giây truyền cho crawler, cả request chi tiết khi --enrich "
+                             "(mặc định cao để đo chính crawler)")
+    parser.add_argument("--enrich", action="store_true", help="ChoTot gọi thêm API chi tiết")
+    parser.add_argument("--keep", action="store_true", help="Giữ thư mục tạm (log, CSV, metrics) sau khi chạy")
+    args = parser.parse_args()
+
+    site = StubSite(0, args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.block_rate).start()
+    # Cấu trúc giống repo: <tmp>/extract là cwd của crawler, ../data là thư mục output
+    root = tempfile.mkdtemp(prefix="bench_crawl_")
+    run_dir = os.path.join(root, "extract")
+    metrics_dir = os.path.join(root, "data", "metrics")
+    os.makedirs(run_dir)
+    os.makedirs(os.path.join(root, "data"))
+    today = datetime.now().strftime("%d%m%Y")
+    print(f"Server giả lập {site.base_url} (trễ {args.latency_ms:.0f}+{args.jitter_ms:.0f} ms, "
+          f"503 {args.error_rate:.0%}, 429 {args.block_rate:.0%}), thư mục chạy {root}")
+
+    try:
+        results = {}
+        if args.only in (None, "chotot"):
+            config_path = os.path.join(run_dir, "bench_shards.json")
+            chotot_config(config_path, args.shards, args.pages)
+            before = site.requests
+            argv = ["ChoTot.py", "--config", config_path, "--api-url", site.base_url + API_PATH,
+                    "--no-skip-seen", "--date", today, "--concurrency", str(args.concurrency), "--rate", str(args.rate)]
+            if args.enrich:
+                argv += ["--enrich", "--detail-budget", str(args.shards * args.pages * 20),
+                         "--detail-rate", str(args.rate)]
+            result = run_crawler("chotot", argv, run_dir, os.path.join(root, "chotot.log"))
+            results["chotot"] = (result, latest_metrics(metrics_dir, "chotot"), site.requests - before)
+
+        if args.only in (None, "bds"):
+            before = site.requests
+            block_config = bench_block_config(os.path.join(run_dir, "bds_block_bench.json"), "127.0.0.1")
+            argv = ["bds.py", "--url", site.base_url + BDS_PATH, "--max-pages", str(args.pages),
+                    "--no-skip-seen", "--date", today, "--rate", str(args.rate), "--block-config", block_config]
+            result = run_crawler("bds", argv, run_dir, os.path.join(root, "bds.log"))
+            results["bds"] = (result, latest_metrics(metrics_dir, "bds"), site.requests - before)
+
+        print("\nKết quả:")
+        for name, (result, metrics, server_requests) in results.items():
+            report(name, result, metrics, server_requests)
+    finally:
+        site.shutdown()
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
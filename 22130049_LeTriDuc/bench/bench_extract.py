@@ -0,0 +1,85 @@
+"""
+Benchmark trích xuất trang chi tiết BDS: 1 lần page.evaluate vs query_selector_all + inner_text từng phần tử.
+Dùng HTML đã lưu trong raw archive (bds.py), không gọi mạng. Chưa có archive thì dùng HTML mẫu.
+
+    cd 22130049_LeTriDuc/bench && python bench_extract.py --date 25112025 --rounds 20
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "extract"))
+
+from playwright.async_api import async_playwright  # noqa: E402
+
+from bds_browser import LAUNCH_ARGS, extract_detail, extract_detail_per_element  # noqa: E402
+from raw_archive import RawArchive  # noqa: E402
+
+SAMPLE_SPECS = [
+    ("Diện tích", "100,6 m²"), ("Khoảng giá", "16,48 tỷ"), ("Mặt tiền", "8 m"), ("Đường vào", "3 m"),
+    ("Hướng nhà", "Đông"), ("Hướng ban công", "Nam"), ("Số tầng", "4 tầng"), ("Số phòng ngủ", "8 phòng"),
+    ("Số phòng tắm, vệ sinh", "5 phòng"), ("Pháp lý", "Sổ đỏ/sổ hồng"), ("Nội thất", "Full nội thất"),
+]
+
+
+def sample_html():
+    items = "".join(
+        f'<div class="re__pr-specs-content-item"><span class="re__pr-specs-content-item-title">{k}</span>'
+        f'<span class="re__pr-specs-content-item-value">{v}</span></div>'
+        for k, v in SAMPLE_SPECS
+    )
+    return f'<html><body><h1 class="re__pr-title">Nhà mẫu benchmark</h1><div>{items}</div></body></html>'
+
+
+def load_pages(date, limit):
+    archive = RawArchive("bds", date, root=os.path.join("..", "data", "raw"))
+    pages = []
+    for entry, html in archive.iter_bodies():
+        pages.append((entry["url"], html))
+        if len(pages) >= limit:
+            break
+    if not pages:
+        print(" Không có archive cho ngày này → dùng HTML mẫu")
+        pages = [("https://batdongsan.com.vn/sample", sample_html())]
+    return pages
+
+
+async def bench(pages, rounds):
+    async with async_playwright() as p:
+        browser = await p.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        page = await browser.new_page()
+        results = {"evaluate": [], "per_element": []}
+        for link, html in pages:
+            await page.set_content(html, wait_until="domcontentloaded")
+            a = await extract_detail(page, link)
+            b = await extract_detail_per_element(page, link)
+            if a != b:
+                print(f" CẢNH BÁO: 2 cách cho kết quả khác nhau ở {link}")
+            for name, fn in (("evaluate", extract_detail), ("per_element", extract_detail_per_element)):
+                for _ in range(rounds):
+                    start = time.perf_counter()
+                    await fn(page, link)
+                    results[name].append(time.perf_counter() - start)
+        await browser.close()
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark trích xuất trang chi tiết BDS")
+    parser.add_argument("--date", type=str, default="", help="Ngày archive (ddmmyyyy)")
+    parser.add_argument("--pages", type=int, default=20, help="Số trang lấy từ archive")
+    parser.add_argument("--rounds", type=int, default=20, help="Số lần đo mỗi trang")
+    args = parser.parse_args()
+
+    pages = load_pages(args.date, args.pages)
+    results = asyncio.run(bench(pages, args.rounds))
+
+    base = statistics.median(results["per_element"])
+    for name, samples in results.items():
+        med = statistics.median(samples) * 1000
+        p95 = sorted(samples)[int(len(samples) * 0.95) - 1] * 1000
+        print(f" {name:12s}: median {med:.2f} ms, p95 {p95:.2f} ms (n={len(samples)})")
+    print(f" → evaluate nhanh hơn {base / statistics.median(results['evaluate']):.1f}x")
@@ -0,0 +1,176 @@
+"""
+Benchmark bước load staging (load_csv.py): cách cũ (read_csv cả file + iterrows + dict từng dòng + executemany 1 lần)
+so với cách mới (iter_csv_batches: đọc theo chunk, tuple lấy thẳng từ mảng cột, executemany từng lô)
+và LOAD DATA LOCAL INFILE (mode infile, chỉ đo được với --target mysql, server phải bật local_infile).
+Sinh file bds_*/chotot_* giả với số dòng tuỳ chọn; mỗi lần đo chạy trong process con riêng để lấy RSS đỉnh (wait4).
+Đích ghi mặc định là file SQLite tạm (thay cho MySQL staging, chỉ đổi placeholder %s → ?); --target mysql
+thì ghi vào bảng <table>_bench trên STAGING_DB_CONFIG.
+
+    cd 22130049_LeTriDuc/bench && python bench_load_csv.py --rows 250000,1000000
+    python bench_load_csv.py --target mysql --modes chunked,infile
+"""
+import argparse
+import csv
+import json
+import os
+import random
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "extract"))
+
+import pandas as pd  # noqa: E402
+
+from load_csv import (  # noqa: E402
+    INSERT_BATCH_SIZE, STAGING_DB_CONFIG, insert_batches, iter_csv_batches, load_data_infile, local_infile_enabled,
+    read_csv_header
+)
+
+BDS_HEADER = ["Link", "Tiêu đề", "Diện tích", "Hướng ban công", "Hướng nhà", "Khoảng giá", "Mặt tiền", "Nội thất",
+              "Pháp lý", "Số phòng ngủ", "Số phòng tắm, vệ sinh", "Số tầng", "Đường vào"]
+CHOTOT_HEADER = ["title", "location", "area", "size", "rooms", "sqm_m2", "price_VND", "province", "country"]
+
+
+def generate_csv(path, source, rows, seed=1):
+    """File CSV giả cùng dạng với crawler (BOM, ô trống, chuỗi tiếng Việt có dấu phẩy)."""
+    rnd = random.Random(seed)
+    with open(path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f)
+        if source == "bds":
+            writer.writerow(BDS_HEADER)
+            for i in range(rows):
+                size = rnd.randint(30, 200)
+                writer.writerow([
+                    f"https://batdongsan.com.vn/ban-nha-rieng-quan-{i % 24}/nha-dep-pr{40000000 + i}",
+                    f"Bán nhà {size}m2, sổ hồng riêng, hẻm xe hơi, gần chợ {i}", f"{size} m²",
+                    rnd.choice(["", "Đông", "Tây Nam"]), rnd.choice(["", "Nam", "Bắc"]), f"{rnd.randint(1, 30)},5 tỷ",
+                    rnd.choice(["", "4 m", "8 m"]), rnd.choice(["", "Cơ bản", "Full nội thất"]), "Sổ đỏ/sổ hồng",
+                    f"{rnd.randint(1, 8)} phòng", rnd.choice(["", "2 phòng"]), rnd.choice(["", "3 tầng"]), "",
+                ])
+        else:
+            writer.writerow(CHOTOT_HEADER)
+            for i in range(rows):
+                size, rooms = rnd.randint(30, 200), rnd.randint(1, 6)
+                writer.writerow([
+                    f"Bán căn hộ {size}m2 {rooms}PN mã {i}", f"Quận {i % 24}", f"{size} m² - {rooms} PN", f"{size} m²",
+                    f"{rooms} PN", float(size), size * rnd.randint(40, 120) * 1_000_000, "thanh pho ho chi minh",
+                    "vietnam",
+                ])
+
+
+def iter_rows_iterrows(csv_file):
+    """Cách cũ của load_csv_to_db: đọc cả file, dict từng dòng qua iterrows rồi tuple → 1 lô duy nhất."""
+    df = pd.read_csv(csv_file, dtype=str, keep_default_na=False, na_values='')
+    data_to_insert = []
+    for _, row in df.iterrows():
+        data_to_insert.append({f'field{i + 1}': str(val) if pd.notna(val) else '' for i, val in enumerate(row)})
+    field_names = [f'field{i + 1}' for i in range(len(df.columns))]
+    yield [tuple(row_dict[field] for field in field_names) for row_dict in data_to_insert]
+
+
+class SqliteCursor:
+    """Cursor SQLite nhận câu lệnh kiểu pymysql (%s) để dùng lại insert_batches."""
+
+    def __init__(self, conn):
+        self.cursor = conn.cursor()
+
+    def execute(self, sql, args=()):
+        return self.cursor.execute(sql.replace("%s", "?"), args)
+
+    def executemany(self, sql, rows):
+        return self.cursor.executemany(sql.replace("%s", "?"), rows)
+
+
+def run_child(mode, csv_file, target, db_path):
+    """Chạy 1 lần load trong process con, in 1 dòng JSON kết quả."""
+    num_fields = len(read_csv_header(csv_file))
+    table = "bds_raw_bench" if os.path.basename(csv_file).startswith("bds") else "chotot_raw_bench"
+    fields_def = ', '.join([f'field{i + 1} TEXT' for i in range(num_fields)])
+    if target == "mysql":
+        import pymysql
+        conn = pymysql.connect(**STAGING_DB_CONFIG, local_infile=mode == "infile")
+        cursor = conn.cursor()
+        if mode == "infile" and not local_infile_enabled(cursor):
+            raise Exception("Server tắt local_infile")
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE TABLE {table} (id INT AUTO_INCREMENT PRIMARY KEY, {fields_def}) "
+                       f"ENGINE=InnoDB DEFAULT CHARSET=utf8mb4")
+    else:
+        conn = sqlite3.connect(db_path)
+        cursor = SqliteCursor(conn)
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, {fields_def})")
+
+    started = time.perf_counter()
+    if mode == "infile":
+        total = load_data_infile(cursor, csv_file, table, num_fields)
+    else:
+        batches = iter_csv_batches(csv_file) if mode == "chunked" else iter_rows_iterrows(csv_file)
+        total = insert_batches(cursor, table, num_fields, batches)
+    conn.commit()
+    elapsed = time.perf_counter() - started
+    if target == "mysql":
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+    conn.close()
+    print(json.dumps({"rows": total, "seconds": elapsed}))
+
+
+def measure(mode, csv_file, target, db_path):
+    proc = subprocess.Popen([sys.executable, os.path.abspath(__file__), "--child", mode, csv_file,
+                             "--target", target, "--db", db_path], stdout=subprocess.PIPE, text=True)
+    out = proc.stdout.read()
+    _, status, rusage = os.wait4(proc.pid, 0)
+    if os.waitstatus_to_exitcode(status) != 0:
+        raise Exception(f"{mode} {csv_file} lỗi (exit {os.waitstatus_to_exitcode(status)})")
+    result = json.loads(out.strip().splitlines()[-1])
+    result["peak_rss_mb"] = rusage.ru_maxrss / 1024
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark load CSV vào staging: iterrows vs chunk + mảng cột")
+    parser.add_argument("--rows", type=str, default="1000000", help="Số dòng mỗi file, nhiều cỡ cách nhau dấu phẩy")
+    parser.add_argument("--target", choices=["sqlite", "mysql"], default="sqlite", help="Đích ghi")
+    parser.add_argument("--modes", type=str, default="iterrows,chunked",
+                        help="Các cách load cần đo: iterrows, chunked (INSERT theo lô), infile (chỉ với mysql)")
+    parser.add_argument("--child", nargs=2, metavar=("MODE", "CSV"), help=argparse.SUPPRESS)
+    parser.add_argument("--db", type=str, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child[0], args.child[1], args.target, args.db)
+        sys.exit(0)
+
+    if args.target == "sqlite" and "infile" in args.modes.split(","):
+        parser.error("mode infile cần --target mysql (SQLite không có LOAD DATA LOCAL INFILE)")
+
+    work_dir = tempfile.mkdtemp(prefix="bench_load_csv_")
+    try:
+        print(f"Lô executemany / chunk: {INSERT_BATCH_SIZE} dòng, đích: {args.target}, thư mục tạm {work_dir}")
+        for rows in [int(r) for r in args.rows.split(",")]:
+            for source in ("bds", "chotot"):
+                csv_file = os.path.join(work_dir, f"{source}_01011970.csv")
+                generate_csv(csv_file, source, rows)
+                size_mb = os.path.getsize(csv_file) / 1e6
+                results = {}
+                for mode in args.modes.split(","):
+                    db_path = os.path.join(work_dir, "staging.sqlite")
+                    results[mode] = measure(mode, csv_file, args.target, db_path)
+                    if os.path.exists(db_path):
+                        os.remove(db_path)
+                    r = results[mode]
+                    print(f" {source:6s} {rows:>9,} dòng ({size_mb:.0f} MB) {mode:9s}: {r['seconds']:6.1f}s, "
+                          f"{r['rows'] / r['seconds']:>9,.0f} dòng/s, RSS đỉnh {r['peak_rss_mb']:6.0f} MB")
+                if "iterrows" in results and "chunked" in results:
+                    print(f"   → chunked nhanh hơn {results['iterrows']['seconds'] / results['chunked']['seconds']:.1f}x, "
+                          f"RSS đỉnh {results['iterrows']['peak_rss_mb'] / results['chunked']['peak_rss_mb']:.1f}x ít hơn")
+                if "chunked" in results and "infile" in results:
+                    print(f"   → LOAD DATA nhanh hơn INSERT theo lô "
+                          f"{results['chunked']['seconds'] / results['infile']['seconds']:.1f}x")
+                os.remove(csv_file)
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,189 @@
+"""
+Server giả lập để benchmark crawler offline (không gọi site thật):
+  - API ad-listing ChoTot:  /v1/public/ad-listing?o=..&limit=..&region_v2=..&area_v2=..  và  /v1/public/ad-listing/<list_id>
+  - HTML kiểu batdongsan:   /nha-dat-ban-tp-hcm, /nha-dat-ban-tp-hcm/p<n>  và trang chi tiết /ban-nha-<id>
+Dữ liệu sinh tất định theo tham số (cùng URL → cùng nội dung). Có thể thêm độ trễ và tỉ lệ lỗi 503 / chặn 429.
+
+    cd 22130049_LeTriDuc/bench && python stub_site.py --port 8765 --latency-ms 80 --error-rate 0.02
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+API_PATH = "/v1/public/ad-listing"
+BDS_PATH = "/nha-dat-ban-tp-hcm"
+ADS_PER_SHARD = 400     # Tổng số tin API báo về cho mỗi shard
+CARDS_PER_PAGE = 20     # Số tin trên 1 trang danh sách BDS
+
+DIRECTIONS = ["Đông", "Tây", "Nam", "Bắc", "Đông Nam", "Tây Bắc"]
+LEGAL_DOCS = ["Đã có sổ", "Đang chờ sổ", "Giấy tờ khác"]
+
+
+def fake_ad(list_id, area_v2):
+    rnd = random.Random(list_id)
+    size = rnd.randint(30, 200)
+    return {
+        "list_id": list_id,
+        "subject": f"Bán nhà benchmark {list_id}",
+        "area_name": f"Quận {area_v2 % 100}",
+        "area_v2": area_v2,
+        "size": size,
+        "rooms": rnd.randint(1, 6),
+        "price": size * rnd.randint(40, 120) * 1_000_000,
+        "toilets": rnd.randint(1, 5),
+        "floors": rnd.randint(1, 6),
+    }
+
+
+def listing_json(query):
+    offset = int(query.get("o", ["0"])[0])
+    limit = int(query.get("limit", ["20"])[0])
+    area_v2 = int(query.get("area_v2", query.get("region_v2", ["13000"]))[0])
+    ads = [fake_ad(area_v2 * 100000 + i, area_v2) for i in range(offset, min(offset + limit, ADS_PER_SHARD))]
+    return {"total": ADS_PER_SHARD, "ads": ads}
+
+
+def detail_json(list_id):
+    ad = fake_ad(list_id, (list_id // 100000) or 13000)
+    rnd = random.Random(-list_id)
+    return {
+        "ad": ad,
+        "parameters": [
+            {"id": "toilets", "value": f"{ad['toilets']} phòng"},
+            {"id": "floors", "value": f"{ad['floors']} tầng"},
+            {"id": "direction", "value": rnd.choice(DIRECTIONS)},
+            {"id": "property_legal_document", "value": rnd.choice(LEGAL_DOCS)},
+            {"id": "furnishing_sell", "value": "Nội thất đầy đủ"},
+        ],
+    }
+
+
+def listing_html(page_no):
+    cards = []
+    for i in range(CARDS_PER_PAGE):
+        pid = page_no * 1000 + i
+        cards.append(
+            f'<div class="js__card"><a class="js__product-link-for-product-id" href="/ban-nha-pr{pid}">Nhà {pid}</a>'
+            f'<span class="re__card-config-price">{pid % 50 + 1} tỷ</span>'
+            f'<span class="re__card-published-info-published-at">Hôm nay</span></div>'
+        )
+    return f"<html><head><title>Nhà đất bán trang {page_no}</title></head><body>{''.join(cards)}</body></html>"
+
+
+def detail_html(pid):
+    rnd = random.Random(pid)
+    specs = [
+        ("Diện tích", f"{rnd.randint(30, 200)} m²"), ("Mức giá", f"{pid % 50 + 1} tỷ"),
+        ("Hướng nhà", rnd.choice(DIRECTIONS)), ("Số tầng", f"{rnd.randint(1, 6)} tầng"),
+        ("Số phòng ngủ", f"{rnd.randint(1, 6)} phòng"), ("Pháp lý", rnd.choice(LEGAL_DOCS)),
+    ]
+    items = "".join(
+        f'<div class="re__pr-specs-content-item"><span class="re__pr-specs-content-item-title">{k}</span>'
+        f'<span class="re__pr-specs-content-item-value">{v}</span></div>'
+        for k, v in specs
+    )
+    # Đệm cho kích thước gần trang thật (~100 KB) để số byte/độ trễ parse có ý nghĩa
+    padding = "<!-- " + "x" * 100_000 + " -->"
+    return (f'<html><head><title>Nhà {pid}</title></head><body><h1 class="re__pr-title">Bán nhà benchmark {pid}</h1>'
+            f'<div class="re__pr-specs">{items}</div>{padding}</body></html>')
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive như site thật
+    server_version = "stub-site"
+
+    def do_GET(self):
+        srv = self.server
+        srv.count_request()
+        latency = srv.latency_s + srv.rnd_uniform(0, srv.jitter_s)
+        if latency > 0:
+            time.sleep(latency)
+
+        roll = srv.rnd_uniform(0, 1)
+        if roll < srv.block_rate:
+            return self.reply(429, "text/plain", b"Too Many Requests", {"Retry-After": "1"})
+        if roll < srv.block_rate + srv.error_rate:
+            return self.reply(503, "text/plain", b"Service Unavailable")
+
+        parsed = urlparse(self.path)
+        path = parsed.path.rstrip("/")
+        if path == API_PATH:
+            return self.reply_json(listing_json(parse_qs(parsed.query)))
+        if path.startswith(API_PATH + "/"):
+            return self.reply_json(detail_json(int(path.rsplit("/", 1)[1])))
+        if path == BDS_PATH or path.startswith(BDS_PATH + "/p"):
+            page_no = int(path.rsplit("/p", 1)[1]) if path != BDS_PATH else 1
+            return self.reply(200, "text/html; charset=utf-8", listing_html(page_no).encode("utf-8"))
+        if path.startswith("/ban-nha-pr"):
+            return self.reply(200, "text/html; charset=utf-8", detail_html(int(path[len("/ban-nha-pr"):])).encode("utf-8"))
+        self.reply(404, "text/plain", b"Not Found")
+
+    def reply_json(self, data):
+        self.reply(200, "application/json", json.dumps(data, ensure_ascii=False).encode("utf-8"))
+
+    def reply(self, status, content_type, body, headers=None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class StubSite(ThreadingHTTPServer):
+    """Server giả lập chạy trong thread nền; latency/jitter tính bằng giây, tỉ lệ lỗi 0..1."""
+
+    daemon_threads = True
+
+    def __init__(self, port=0, latency_s=0.0, jitter_s=0.0, error_rate=0.0, block_rate=0.0, seed=42):
+        super().__init__(("127.0.0.1", port), StubHandler)
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.error_rate = error_rate
+        self.block_rate = block_rate
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.rnd = random.Random(seed)
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_port}"
+
+    def count_request(self):
+        with self.lock:
+            self.requests += 1
+
+    def rnd_uniform(self, a, b):
+        with self.lock:
+            return self.rnd.uniform(a, b)
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Server giả lập ChoTot API + HTML batdongsan cho benchmark")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=50, help="Độ trễ cố định mỗi request (ms)")
+    parser.add_argument("--jitter-ms", type=float, default=50, help="Độ trễ ngẫu nhiên thêm vào, 0..jitter (ms)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ trả 503")
+    parser.add_argument("--block-rate", type=float, default=0.0, help="Tỉ lệ trả 429 (bị chặn)")
+    args = parser.parse_args()
+
+    site = StubSite(args.port, args.latency_ms / 1000, args.jitter_ms / 1000, args.error_rate, args.block_rate)
+    print(f"Server giả lập chạy ở {site.base_url}")
+    print(f"  ChoTot: python ChoTot.py --api-url {site.base_url}{API_PATH} --no-skip-seen")
+    print(f"  BDS:    python bds.py --url {site.base_url}{BDS_PATH} --no-skip-seen")
+    try:
+        site.serve_forever()
+    except KeyboardInterrupt:
+        site.shutdown()
@@ -1,57 +1,437 @@
-import requests
-import pandas as pd
+import argparse
+import asyncio
+import json
 import os
+import sys
 import time
 from datetime import datetime
 
+from chotot_detail import (
+    DETAIL_BUDGET, DETAIL_COLUMNS, DETAIL_CONCURRENCY, DETAIL_RATE, DetailCache, DetailEnricher, parse_detail
+)
+from chotot_fetcher import PageFetcher, RequestBudget
+from crawl_metrics import CrawlMetrics
+from crawl_checkpoint import load_checkpoint, save_checkpoint
+from crawl_queue import CrawlQueue, connect_queue
+from crawl_sink import CsvSink, JsonlSink, merge_csv, merge_jsonl
+from http_session import create_session
+from raw_archive import RawArchive
+from record_schema import CHOTOT_SCHEMA, coerce_record, write_schema
+from seen_index import SeenIndex
+
 # KHÔNG CẦN CHUẨN HOÁ GIÁ → BỎ parse_price
 
-# Crawl dữ liệu
-data_list = []
-for page in range(0, 3):  # Crawl 3 trang (mỗi trang ~20 tin)
+API_URL = "https://gateway.chotot.com/v1/public/ad-listing"
+PAGE_SIZE = 20          # API trả tối đa ~20 tin / trang
+CONCURRENCY = 8         # Số request chạy song song (tổng cho mọi shard)
+RATE = 5.0              # Số request / giây (token bucket, tự giảm khi gặp 429/5xx)
+SHARD_CONFIG = "chotot_shards.json"
+
+COLUMNS = ["title", "location", "area", "size", "rooms", "sqm_m2", "price_VND", "province", "country"]
+
+
+def build_url(offset, shard):
     url = (
-        f"https://gateway.chotot.com/v1/public/ad-listing?"
-        f"cg=1000&limit=20&o={page * 20}&st=s,k&f=p&region_v2=13000&area_v2=13100"
+        f"{API_URL}?"
+        f"cg=1000&limit={PAGE_SIZE}&o={offset}&st=s,k&f=p&region_v2={shard['region_v2']}"
     )
-    res = requests.get(url)
-
-    if res.status_code != 200:
-        print(f"Lỗi khi gọi API trang {page + 1}")
-        continue
-
-    ads = res.json().get("ads", [])
-    for ad in ads:
-        title = ad.get("subject")
-        area = ad.get("area_name")
-        price_value = ad.get("price")  # Giá VND gốc từ API
-        size = ad.get("size")
-        rooms = ad.get("rooms")
-
-        data_list.append({
-            "title": title,
-            "location": area,
-            "area": f"{size} m² - {rooms} PN" if size and rooms else None,
-            "size": f"{size} m²" if size else None,
-            "rooms": f"{rooms} PN" if rooms else None,
-            "sqm_m2": size if size else None,
-            "price_VND": price_value,  # CHỈ LẤY GIÁ GỐC
-            "province": "thanh pho ho chi minh",
-            "country": "vietnam"
-        })
-
-    print(f" Đã crawl xong trang {page + 1}")
-    time.sleep(1)
-
-# Xuất CSV
-df = pd.DataFrame(data_list)
-
-output_dir = "../data"
-file_basename = f"chotot_{datetime.now().strftime('%d%m%Y')}.csv"
-filename = os.path.join(output_dir, file_basename)
-
-# Đảm bảo thư mục 'data' tồn tại
-if not os.path.exists(output_dir):
-    os.makedirs(output_dir)
-
-df.to_csv(filename, index=False, encoding="utf-8-sig")
-print(f"Đã lưu dữ liệu vào {filename}")
+    if shard.get("area_v2"):
+        url += f"&area_v2={shard['area_v2']}"
+    return url
+
+
+def shard_key(shard):
+    return f"{shard['region_v2']}_{shard.get('area_v2') or 'all'}"
+
+
+def output_columns(enrich=False):
+    """Cột CSV: thêm các cột chi tiết ở cuối khi bật enrich (giữ nguyên vị trí field1..9 ở staging)."""
+    return COLUMNS + DETAIL_COLUMNS if enrich else COLUMNS
+
+
+def parse_ad(ad, province="thanh pho ho chi minh", detail=None):
+    title = ad.get("subject")
+    area = ad.get("area_name")
+    price_value = ad.get("price")  # Giá VND gốc từ API
+    size = ad.get("size")
+    rooms = ad.get("rooms")
+
+    row = {
+        "title": title,
+        "location": area,
+        "area": f"{size} m² - {rooms} PN" if size and rooms else None,
+        "size": f"{size} m²" if size else None,
+        "rooms": f"{rooms} PN" if rooms else None,
+        "sqm_m2": size if size else None,
+        "price_VND": price_value,  # CHỈ LẤY GIÁ GỐC
+        "province": province,
+        "country": "vietnam"
+    }
+    if detail:
+        row.update(detail)
+    return row
+
+
+def typed_ad(ad, province="thanh pho ho chi minh", detail=None):
+    """Bản ghi có kiểu theo CHOTOT_SCHEMA: số giữ nguyên kiểu từ API để transform không phải parse lại."""
+    record = {
+        "list_id": ad.get("list_id"),
+        "title": ad.get("subject"),
+        "location": ad.get("area_name"),
+        "size_m2": ad.get("size"),
+        "rooms": ad.get("rooms"),
+        "price_vnd": ad.get("price"),
+        "province": province,
+        "country": "vietnam",
+    }
+    if detail:
+        record.update(detail)
+    return coerce_record(record, CHOTOT_SCHEMA)
+
+
+def load_shard_config(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+async def discover_shards(fetcher, budget, regions, sample_pages):
+    """Lấy mẫu vài trang cấp tỉnh/thành, gom các area_v2 xuất hiện trong tin để tạo shard theo quận/huyện."""
+    shards = {}
+    for region in regions:
+        urls = [build_url(page * PAGE_SIZE, region) for page in range(budget.take(sample_pages))]
+        async for _, res in fetcher.fetch_many(urls):
+            if res is None or res.status_code != 200:
+                continue
+            for ad in res.json().get("ads", []):
+                area_v2 = ad.get("area_v2") or ad.get("area")
+                if area_v2:
+                    shards[(region["region_v2"], int(area_v2))] = {
+                        "region_v2": region["region_v2"],
+                        "area_v2": int(area_v2),
+                        "area_name": ad.get("area_name"),
+                        "province": region.get("province"),
+                    }
+    print(f" Phát hiện {len(shards)} shard quận/huyện từ API")
+    return list(shards.values())
+
+
+async def write_ads(sink, ads, province, seen, enricher=None, typed_sink=None):
+    """
+    Ghi mọi tin của trang (kể cả tin đã biết → giá/thuộc tính thay đổi vẫn về staging, giống --replay).
+    Seen index chỉ để bớt việc: chỉ tin mới được gọi API chi tiết (tin cũ lấy chi tiết từ cache nếu có)
+    và số tin mới quyết định dừng shard sớm. typed_sink nhận bản ghi có kiểu song song với CSV.
+    Trả về (số tin đã ghi, list_id các tin mới); caller thêm vào seen index sau khi ghi + checkpoint xong.
+    """
+    ids = [str(ad["list_id"]) for ad in ads if ad.get("list_id") is not None]
+    new_ids = ids if seen is None else seen.filter_new(ids)
+    details = await enricher.enrich(ads, fetch_ids=new_ids) if enricher is not None else {}
+    sink.write_rows(parse_ad(ad, province, details.get(str(ad.get("list_id")))) for ad in ads)
+    if typed_sink is not None:
+        for ad in ads:
+            typed_sink.write(typed_ad(ad, province, details.get(str(ad.get("list_id")))))
+    return len(ads), new_ids
+
+
+def record_page(fetcher, listings):
+    if fetcher.metrics is not None:
+        fetcher.metrics.add_pages(1)
+        fetcher.metrics.add_listings(listings)
+
+
+async def crawl_shard(shard, fetcher, budget, work_dir, max_pages, archive, seen=None, wave_pages=10,
+                      enricher=None):
+    """
+    Crawl 1 shard (region/area): ghi vào partition riêng, checkpoint sau mỗi trang.
+    Chạy lại trong ngày sẽ bỏ qua các trang/shard đã xong.
+    Có seen index thì dừng shard sớm khi cả 1 đợt trang toàn tin đã biết (tin vẫn được ghi đủ).
+    Trả về True nếu shard đã xong hẳn.
+    """
+    key = shard_key(shard)
+    province = shard.get("province") or "thanh pho ho chi minh"
+    ckpt_path = os.path.join(work_dir, f"{key}.json")
+    state = load_checkpoint(ckpt_path, {"num_pages": None, "done_pages": [], "finished": False})
+    if state["finished"]:
+        print(f" [{key}] đã xong từ lần chạy trước, bỏ qua")
+        return True
+
+    with CsvSink(os.path.join(work_dir, f"{key}.csv"), output_columns(enricher is not None), mode="a") as sink, \
+            JsonlSink(os.path.join(work_dir, f"{key}.jsonl"), mode="a") as typed_sink:
+        # Trang đầu cho biết tổng số tin → không gọi thừa offset rỗng
+        if state["num_pages"] is None:
+            if not budget.take():
+                print(f" [{key}] hết ngân sách request, dừng")
+                return False
+            first_url = build_url(0, shard)
+            res = await fetcher.fetch(first_url)
+            if res is None or res.status_code != 200:
+                print(f" [{key}] Lỗi khi gọi API trang 1")
+                return False
+            archive.put(first_url, res.content, shard=key, province=province)
+            first_json = res.json()
+            total = first_json.get("total") or max_pages * PAGE_SIZE
+            state["num_pages"] = max(1, min(max_pages, -(-total // PAGE_SIZE)))
+            written, new_ids = await write_ads(sink, first_json.get("ads", []), province, seen, enricher,
+                                               typed_sink)
+            record_page(fetcher, written)
+            state["done_pages"].append(0)
+            save_checkpoint(ckpt_path, state)
+            # Đánh dấu đã thấy chỉ sau khi dòng đã nằm trên đĩa và trang đã vào checkpoint
+            if seen is not None:
+                seen.add_many(new_ids)
+            print(f" [{key}] API báo {total} tin → {state['num_pages']} trang")
+
+        done = set(state["done_pages"])
+        pending = [page for page in range(state["num_pages"]) if page not in done]
+
+        # Gọi theo từng đợt để có thể dừng sớm khi toàn gặp tin cũ
+        failed_pages = []
+        while pending:
+            wave = pending[:budget.take(min(wave_pages, len(pending)))]
+            if not wave:
+                print(f" [{key}] hết ngân sách request, dừng")
+                break
+            pending = pending[len(wave):]
+            urls = {build_url(page * PAGE_SIZE, shard): page for page in wave}
+
+            new_in_wave = 0
+            failed_in_wave = 0
+            async for url, res in fetcher.fetch_many(list(urls)):
+                page = urls[url]
+                if res is None or res.status_code != 200:
+                    print(f" [{key}] Lỗi khi gọi API trang {page + 1} (đã hết lượt thử lại)")
+                    failed_pages.append(page + 1)
+                    failed_in_wave += 1
+                    continue
+                # Lưu JSON thô để sau này đổi luật parse chỉ cần --replay, không phải crawl lại
+                archive.put(url, res.content, shard=key, province=province)
+                written, new_ids = await write_ads(sink, res.json().get("ads", []), province, seen, enricher,
+                                                   typed_sink)
+                record_page(fetcher, written)
+                new_in_wave += len(new_ids)
+                state["done_pages"].append(page)
+                save_checkpoint(ckpt_path, state)
+                if seen is not None:
+                    seen.add_many(new_ids)
+
+            # Chỉ xét lỗi của đợt này: 1 trang lỗi ở đợt trước không được chặn dừng sớm cả shard
+            if seen is not None and new_in_wave == 0 and failed_in_wave == 0:
+                print(f" [{key}] {len(wave)} trang liền toàn tin đã biết → dừng shard sớm")
+                state["stopped_early"] = True
+                break
+
+        state["finished"] = state.get("stopped_early", False) or len(state["done_pages"]) >= state["num_pages"]
+        save_checkpoint(ckpt_path, state)
+        if failed_pages:
+            print(f" [{key}] CẢNH BÁO: {len(failed_pages)} trang lỗi sau khi thử lại: {sorted(failed_pages)}")
+        print(f" [{key}] xong {len(state['done_pages'])}/{state['num_pages']} trang")
+        return state["finished"]
+
+
+async def plan_shards(config, fetcher, budget, work_dir):
+    """Danh sách shard cố định trong ngày (lưu lại để lần chạy lại dùng đúng danh sách này)."""
+    shards_path = os.path.join(work_dir, "shards.json")
+    shards = load_checkpoint(shards_path, None)
+    if shards is None:
+        shards = list(config.get("shards", []))
+        discover = config.get("discover", {})
+        if discover.get("enabled"):
+            found = await discover_shards(fetcher, budget, config.get("regions", []), discover.get("sample_pages", 10))
+            known = {shard_key(s) for s in shards}
+            shards += [s for s in found if shard_key(s) not in known]
+        save_checkpoint(shards_path, shards)
+    return shards
+
+
+async def crawl(config, work_dir, concurrency, rate, archive, seen=None, enricher=None, metrics=None):
+    """
+    Crawl mọi shard bằng pool worker, dùng chung session, rate limiter và ngân sách request.
+    Trả về danh sách file partition của các shard.
+    """
+    # Session dùng chung: mỗi trang chỉ tốn 1 round trip trên kết nối keep-alive có sẵn
+    fetcher = PageFetcher(create_session(pool_size=concurrency), concurrency=concurrency, rate=rate,
+                          metrics=metrics)
+    budget = RequestBudget(config.get("max_requests", 500))
+    max_pages = config.get("max_pages_per_shard", 50)
+    shards = await plan_shards(config, fetcher, budget, work_dir)
+
+    queue = asyncio.Queue()
+    for shard in shards:
+        queue.put_nowait(shard)
+
+    async def worker():
+        while not queue.empty():
+            shard = queue.get_nowait()
+            try:
+                await crawl_shard(shard, fetcher, budget, work_dir, max_pages, archive,
+                                  seen, config.get("wave_pages", 10), enricher)
+            except Exception as e:
+                print(f" [{shard_key(shard)}] lỗi: {e}")
+
+    workers = max(1, min(config.get("workers", 4), len(shards)))
+    print(f" Crawl {len(shards)} shard, {workers} worker, {concurrency} luồng, {rate} req/s")
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    fetcher.close()
+    print(f" Còn dư {budget.remaining} request trong ngân sách")
+    return [os.path.join(work_dir, f"{shard_key(s)}.csv") for s in shards]
+
+
+async def crawl_from_queue(crawl_queue, crawl_date, config, work_dir, concurrency, rate, archive, seen=None,
+                           enricher=None, metrics=None):
+    """
+    Chế độ nhiều máy: shard được đưa vào bảng crawl_task (enqueue trùng thì bỏ qua), mỗi worker
+    nhận shard qua lease nên 2 node không crawl trùng. Trả về partition của các shard node này đã làm.
+    """
+    fetcher = PageFetcher(create_session(pool_size=concurrency), concurrency=concurrency, rate=rate,
+                          metrics=metrics)
+    budget = RequestBudget(config.get("max_requests", 500))
+    max_pages = config.get("max_pages_per_shard", 50)
+    shards = await plan_shards(config, fetcher, budget, work_dir)
+    added = crawl_queue.enqueue(crawl_date, "chotot", [(shard_key(s), s) for s in shards])
+    print(f" [queue] Thêm {added}/{len(shards)} shard mới vào hàng đợi")
+
+    done_here = []
+
+    async def crawl_task(shard):
+        if not await crawl_shard(shard, fetcher, budget, work_dir, max_pages, archive,
+                                 seen, config.get("wave_pages", 10), enricher):
+            raise Exception("shard chưa crawl xong")
+
+    async def worker():
+        while True:
+            task = crawl_queue.claim(crawl_date, "chotot")
+            if task is None:
+                return
+            print(f" [queue] Nhận shard {task['task_key']} (lần {task['attempts']})")
+            if await crawl_queue.run_task(task, crawl_task(task["payload"])):
+                done_here.append(task["payload"])
+
+    workers = max(1, config.get("workers", 4))
+    await asyncio.gather(*(worker() for _ in range(workers)))
+    fetcher.close()
+    print(f" [queue] Node {crawl_queue.owner} xong {len(done_here)} shard, trạng thái: "
+          f"{crawl_queue.stats(crawl_date, 'chotot')}")
+    return [os.path.join(work_dir, f"{shard_key(s)}.csv") for s in done_here]
+
+
+def replay(sink, archive, cache=None, typed_sink=None):
+    """Dựng lại CSV từ JSON thô đã lưu trong archive (chi tiết lấy từ cache nếu có), không gọi mạng."""
+    start = time.perf_counter()
+    pages = 0
+    for entry, body in archive.iter_bodies():
+        ads = json.loads(body).get("ads", [])
+        details = {}
+        if cache is not None:
+            for list_id, detail_body in cache.get_many(ad.get("list_id") for ad in ads if ad.get("list_id")).items():
+                details[list_id] = parse_detail(detail_body)
+        sink.write_rows(parse_ad(ad, entry.get("province"), details.get(str(ad.get("list_id")))) for ad in ads)
+        if typed_sink is not None:
+            for ad in ads:
+                typed_sink.write(typed_ad(ad, entry.get("province"), details.get(str(ad.get("list_id")))))
+        pages += 1
+    elapsed = time.perf_counter() - start
+    rate = sink.count / elapsed if elapsed > 0 else 0
+    print(f" Replay {pages} trang, {sink.count} tin trong {elapsed:.2f}s → {rate:.0f} tin/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl tin đăng ChoTot")
+    parser.add_argument("--config", type=str, default=SHARD_CONFIG, help="File cấu hình shard region/area")
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY, help="Số request song song")
+    parser.add_argument("--rate", type=float, default=RATE, help="Số request/giây")
+    parser.add_argument("--partitioned", action="store_true",
+                        help="Chỉ giữ partition theo shard, không gộp thành 1 file")
+    parser.add_argument("--no-skip-seen", action="store_true",
+                        help="Không dùng seen index (không dừng shard sớm, lấy chi tiết cho mọi tin)")
+    parser.add_argument("--enrich", action="store_true",
+                        help="Lấy thêm chi tiết (WC, số tầng, hướng, pháp lý, nội thất) cho các tin mới")
+    parser.add_argument("--detail-concurrency", type=int, default=DETAIL_CONCURRENCY,
+                        help="Số request chi tiết song song")
+    parser.add_argument("--detail-rate", type=float, default=DETAIL_RATE, help="Số request chi tiết/giây")
+    parser.add_argument("--detail-budget", type=int, default=DETAIL_BUDGET,
+                        help="Số tin tối đa gọi API chi tiết mỗi lần chạy (tin đã có trong cache không tính)")
+    parser.add_argument("--queue", action="store_true",
+                        help="Nhận shard từ hàng đợi crawl_task (chạy nhiều máy cùng 1 đợt crawl)")
+    parser.add_argument("--queue-db", type=str, default="mysql",
+                        help='DB hàng đợi: "mysql" (control) hoặc đường dẫn file SQLite thay thế')
+    parser.add_argument("--api-url", type=str, default=API_URL,
+                        help="Gốc API ad-listing (đổi sang server giả lập khi chạy benchmark offline)")
+    parser.add_argument("--replay", action="store_true", help="Dựng CSV từ JSON đã lưu, không gọi mạng")
+    parser.add_argument("--date", type=str, default=datetime.now().strftime('%d%m%Y'),
+                        help="Ngày crawl (ddmmyyyy), dùng cho --replay")
+    args = parser.parse_args()
+    API_URL = args.api_url.rstrip("/")
+
+    output_dir = "../data"
+    today = args.date
+    file_basename = f"chotot_{today}.csv"
+    filename = os.path.join(output_dir, file_basename)
+    # Bản ghi có kiểu (JSONL + file schema) đi kèm CSV, để load vào bảng staging có kiểu
+    typed_filename = os.path.join(output_dir, f"chotot_{today}.jsonl")
+    schema_filename = os.path.join(output_dir, f"chotot_{today}.schema.json")
+
+    columns = output_columns(args.enrich)
+    archive = RawArchive("chotot", today)
+    cache = DetailCache() if args.enrich else None
+    if args.replay:
+        with CsvSink(filename, columns) as sink, JsonlSink(typed_filename) as typed_sink:
+            replay(sink, archive, cache, typed_sink)
+        write_schema(schema_filename)
+        print(f"Đã lưu {sink.count} tin vào {filename} và {typed_filename}")
+        sys.exit(0)
+
+    metrics = CrawlMetrics("chotot")
+    enricher = None
+    if args.enrich:
+        detail_fetcher = PageFetcher(create_session(pool_size=args.detail_concurrency),
+                                     concurrency=args.detail_concurrency, rate=args.detail_rate,
+                                     metrics=metrics, kind="detail")
+        enricher = DetailEnricher(detail_fetcher, cache, RequestBudget(args.detail_budget),
+                                  detail_url=API_URL + "/{list_id}")
+
+    config = load_shard_config(args.config)
+
+    # Partition + checkpoint theo shard nằm trong thư mục riêng của ngày
+    work_dir = os.path.join(output_dir, f"chotot_parts_{today}")
+    os.makedirs(work_dir, exist_ok=True)
+
+    # Crawl dữ liệu, mỗi trang xong là ghi thẳng xuống partition (không giữ cả đợt crawl trong RAM)
+    seen = None if args.no_skip_seen else SeenIndex("chotot")
+    crawl_queue = None
+    if args.queue:
+        crawl_queue = CrawlQueue(connect_queue(args.queue_db))
+        # Mỗi node ghi index archive riêng để không chen dòng vào index.jsonl dùng chung
+        node = crawl_queue.owner.replace(":", "-")
+        archive = RawArchive("chotot", today, index_name=f"index-{node}.jsonl")
+        parts = asyncio.run(crawl_from_queue(crawl_queue, today, config, work_dir, args.concurrency, args.rate,
+                                             archive, seen, enricher, metrics))
+    else:
+        parts = asyncio.run(crawl(config, work_dir, args.concurrency, args.rate, archive, seen, enricher, metrics))
+    # Số liệu của lần chạy: textfile Prometheus + JSON tóm tắt trong ../data/metrics
+    metrics.export()
+    if enricher is not None:
+        enricher.report()
+        enricher.fetcher.close()
+        cache.close()
+    if seen is not None:
+        print(f" Seen index ChoTot: {seen.count()} tin")
+        seen.close()
+
+    if crawl_queue is not None:
+        # Chỉ node thấy hàng đợi đã cạn mới gộp, lấy mọi partition trong work_dir (thư mục data dùng chung)
+        drained = crawl_queue.is_drained(today, "chotot")
+        crawl_queue.close()
+        if not drained:
+            print(f"Còn shard đang chạy ở node khác, để lại {len(parts)} partition trong {work_dir}")
+            sys.exit(0)
+        shards = load_checkpoint(os.path.join(work_dir, "shards.json"), [])
+        parts = [os.path.join(work_dir, f"{shard_key(s)}.csv") for s in shards]
+    parts = [p for p in parts if os.path.exists(p)]
+
+    if args.partitioned:
+        print(f"Đã lưu {len(parts)} partition vào {work_dir}")
+    else:
+        count = merge_csv(parts, filename, columns)
+        typed_parts = [p[:-len(".csv")] + ".jsonl" for p in parts]
+        merge_jsonl([p for p in typed_parts if os.path.exists(p)], typed_filename)
+        write_schema(schema_filename)
+        print(f"Đã lưu {count} tin vào {filename} và {typed_filename}")
@@ -1,126 +1,455 @@
-from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
 from urllib.parse import urljoin
 from datetime import datetime
-import csv
+import argparse
+import asyncio
+import glob
 import time
-import random
 import os
+import sys
+
+from bds_browser import (
+    LAUNCH_ARGS, SPEC_TITLE_SELECTOR, USER_AGENT, ResourceBlocker, TabPool, ThroughputMeter, TimeBreakdown,
+    extract_cards, extract_detail, is_block_page, load_block_config
+)
+from bds_http import HttpDetailFetcher, PathStats
+from bds_parse import parse_detail_html
+from crawl_checkpoint import load_checkpoint, save_checkpoint
+from crawl_metrics import CrawlMetrics
+from crawl_queue import CrawlQueue, connect_queue
+from crawl_sink import JsonlSink, jsonl_to_csv
+from rate_limit import AdaptiveDelay, AdaptiveRateLimiter
+from raw_archive import RawArchive
+from recrawl_scheduler import DAILY_BUDGET, RecrawlScheduler
+from seen_index import SeenIndex
 
 url = "https://batdongsan.com.vn/nha-dat-ban-tp-hcm"
-base_url = "https://batdongsan.com.vn/"
 max_pages = 2
 
+POOL_SIZE = 4           # Số tab chi tiết chạy song song
+DETAIL_RATE = 0.5       # Ngân sách lịch sự chung: số trang chi tiết / giây cho cả pool
+PAGE_DELAY = (1.0, 3.0)  # Nghỉ gốc giữa 2 trang danh sách (giây), tự giãn khi bị chậm/chặn
+BLOCK_CONFIG = "bds_block.json"
+
+LINK_SELECTOR = "a.js__product-link-for-product-id"
+
 # Lưu vào thư mục data giống hệt ChoTot.py
 output_dir = "../data"
-os.makedirs(output_dir, exist_ok=True)
-output_file = os.path.join(output_dir, f"bds_{datetime.now().strftime('%d%m%Y')}.csv")
 
-all_data = []
-all_columns = set()
 
-def random_delay(min_s, max_s, desc=""):
-    delay = random.uniform(min_s, max_s)
-    print(f" Nghỉ {delay:.2f}s {desc}...")
-    time.sleep(delay)
-
-def scroll_to_bottom(page, max_scrolls=10):
+async def scroll_to_bottom(page, max_scrolls=10, expected=20):
+    """Cuộn trang và chờ theo sự kiện: dừng khi đủ tin hoặc cuộn thêm mà không có tin mới."""
     print(" Đang cuộn trang để load dữ liệu...")
+    count = len(await page.query_selector_all(LINK_SELECTOR))
     for i in range(max_scrolls):
-        page.mouse.wheel(0, 3000)
-        time.sleep(1.5)
-        links = page.query_selector_all("a.js__product-link-for-product-id")
-        if len(links) >= 20:
+        if count >= expected:
             break
+        await page.mouse.wheel(0, 3000)
+        try:
+            await page.wait_for_function(
+                "([sel, n]) => document.querySelectorAll(sel).length > n",
+                arg=[LINK_SELECTOR, count], timeout=3000
+            )
+        except PlaywrightTimeoutError:
+            break  # cuộn mà không có tin mới → đã hết
+        count = len(await page.query_selector_all(LINK_SELECTOR))
+    links = await page.query_selector_all(LINK_SELECTOR)
     print(f" Đã cuộn xong, phát hiện {len(links)} tin đăng.")
     return links
 
-with sync_playwright() as p:
-    # TRÊN SERVER: dùng headless=True + args chống detect
-    browser = p.chromium.launch(
-        headless=True,
-        args=[
-            "--no-sandbox",
-            "--disable-setuid-sandbox",
-            "--disable-dev-shm-usage",
-            "--disable-blink-features=AutomationControlled",
-            "--disable-infobars",
-            "--start-maximized",
-            "--disable-features=ImproveInformer,TranslateUI",
-            "--disable-component-extensions-with-background-pages"
-        ]
-    )
-
-    for page_num in range(1, max_pages + 1):
-        page_url = url if page_num == 1 else f"{url}/p{page_num}"
-        print(f"\n=== Đang crawl trang {page_num}: {page_url} ===")
-
-        page = browser.new_page(
-            user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36 Edg/129.0.0.0"
-        )
 
+def listing_pages(start_url, pages):
+    """Danh sách URL trang danh sách theo số trang (trang 1 là URL gốc, các trang sau thêm /p<n>)."""
+    return [start_url if n == 1 else f"{start_url}/p{n}" for n in pages]
+
+
+class BdsCrawler:
+    """
+    Crawl các trang danh sách bằng Playwright async; trang chi tiết được lấy song song
+    bởi pool tab tái sử dụng, dưới 1 rate limiter chung. Chờ theo selector/network-idle
+    thay vì sleep cố định; chỉ giãn nhịp khi độ trễ tăng hoặc có dấu hiệu bị chặn.
+    """
+
+    def __init__(self, sink, archive, pool_size=POOL_SIZE, rate=DETAIL_RATE, block_config=None, seen=None,
+                 checkpoint_path=None, http_fast_path=True, scheduler=None, metrics=None):
+        self.sink = sink
+        self.metrics = metrics
+        self.archive = archive
+        self.seen = seen
+        # Có scheduler (dựng trên seen index) thì chọn tin theo độ cũ + ngân sách ngày, không thì lấy hết;
+        # seen chỉ để ghi nhận link đã lấy
+        self.scheduler = scheduler
+        # Frontier crawl: URL các trang danh sách đã xong + link chi tiết còn lại theo từng trang chưa xong
+        self.checkpoint_path = checkpoint_path
+        self.state = {"done_pages": [], "pending": {}}
+        if checkpoint_path:
+            self.state = load_checkpoint(checkpoint_path, self.state)
+            if "page_url" in self.state:
+                # Checkpoint dạng cũ: chỉ lưu frontier của 1 trang
+                page_url = self.state.pop("page_url")
+                self.state["pending"] = {page_url: self.state["pending"]} if page_url else {}
+        # Trang danh sách lỗi tổng (không lấy được link) trong lần chạy này
+        self.failed_pages = []
+        self.pool_size = pool_size
+        self.limiter = AdaptiveRateLimiter(rate, metrics=metrics)
+        self.delay = AdaptiveDelay(PAGE_DELAY[0], PAGE_DELAY[1])
+        self.blocker = ResourceBlocker(block_config or load_block_config())
+        self.meter = ThroughputMeter()
+        self.timing = TimeBreakdown()
+        # Fast path HTTP thường + parser C; Playwright chỉ là fallback
+        self.http = HttpDetailFetcher(pool_size, metrics=metrics) if http_fast_path else None
+        self.paths = PathStats()
+        self.pool = None
+
+    async def scrape_detail(self, page_url, link, label):
+        """Lấy 1 trang chi tiết: thử HTTP thường trước, chỉ mở tab Playwright khi cần. Ghi item ra sink."""
+        async with self.timing.measure("waiting"):
+            await self.limiter.acquire()
+
+        item = None
+        if self.http is not None:
+            async with self.timing.measure("working"):
+                started = time.perf_counter()
+                item, html, reason = await self.http.fetch(link)
+            if item is not None:
+                self.paths.record("http", time.perf_counter() - started)
+                self.delay.observe(time.perf_counter() - started)
+                # Lưu HTML thô để sau này đổi luật parse chỉ cần replay, không phải crawl lại
+                self.archive.put(link, html, label=label, path="http")
+                print(f"  [{label}] {link}\n   → OK (http): {len(item)-2} thuộc tính")
+            else:
+                self.paths.fallback(reason)
+                print(f"  [{label}] {reason} → fallback Playwright")
+
+        if item is None:
+            item = await self.scrape_with_browser(link, label)
+        if item is None:
+            self.meter.failed += 1
+            return
+
+        self.sink.write(item)
+        if self.seen is not None:
+            self.seen.add(link)
+        if self.scheduler is not None:
+            self.scheduler.record(link)
+        self.mark_link_done(page_url, link)
+        self.meter.ok += 1
+
+    async def scrape_with_browser(self, link, label):
+        """Lấy trang chi tiết bằng 1 tab trong pool, trả về item hoặc None nếu lỗi."""
+        async with self.pool.tab() as detail_page, self.timing.measure("working"):
+            load_s = None
+            outcome = "error"
+            audit = self.blocker.start_listing(detail_page)
+            started = time.perf_counter()
+            try:
+                response = await detail_page.goto(link, wait_until="domcontentloaded", timeout=60000)
+                if await is_block_page(detail_page, response):
+                    self.limiter.feedback(429)
+                    self.delay.observe(blocked=True)
+                    outcome = "blocked"
+                    raise Exception(f"bị chặn (status {response.status if response else '?'})")
+                await detail_page.wait_for_selector(SPEC_TITLE_SELECTOR, timeout=20000)
+                load_s = time.perf_counter() - started
+                self.delay.observe(load_s)
+
+                # Lưu HTML thô để sau này đổi luật parse chỉ cần replay, không phải crawl lại
+                self.archive.put(link, await detail_page.content(), label=label, path="browser")
+
+                item = await extract_detail(detail_page, link)
+                outcome = "ok"
+                self.paths.record("browser", time.perf_counter() - started)
+                print(f"  [{label}] {link}\n   → OK: {len(item)-2} thuộc tính, load {load_s:.2f}s{' (audit)' if audit else ''}")
+                return item
+
+            except Exception as e:
+                if isinstance(e, PlaywrightTimeoutError):
+                    outcome = "timeout"
+                print(f"  [{label}] {link}\n   → LỖI: {e}")
+                return None
+            finally:
+                nbytes = self.blocker.finish_listing(detail_page, load_s)
+                if self.metrics is not None:
+                    self.metrics.observe("browser", time.perf_counter() - started, nbytes, outcome)
+
+    def save_state(self):
+        if self.checkpoint_path:
+            save_checkpoint(self.checkpoint_path, self.state)
+
+    def mark_link_done(self, page_url, link):
+        pending = self.state["pending"].get(page_url, [])
+        if link in pending:
+            pending.remove(link)
+            self.save_state()
+
+    @property
+    def complete(self):
+        """Mọi trang đã xong và không còn tin lỗi → có thể xoá checkpoint/JSONL trung gian."""
+        return not self.failed_pages and not any(self.state["pending"].values())
+
+    async def collect_links(self, browser, page_url):
+        """Mở trang danh sách, chờ tin hiện ra rồi trả về danh sách card {link, price, posted}."""
+        page = await browser.new_page(user_agent=USER_AGENT)
+        started = time.perf_counter()
+        outcome = "error"
         try:
-            page.goto(page_url, wait_until="domcontentloaded", timeout=60000)
-            page.wait_for_timeout(8000)  # chờ JS load
-
-            links = scroll_to_bottom(page)
-            hrefs = []
-            for a in links:
-                href = a.get_attribute("href")
-                if href:
-                    full_url = urljoin(base_url, href)
-                    if full_url not in hrefs:
-                        hrefs.append(full_url)
+            async with self.timing.measure("working"):
+                response = await page.goto(page_url, wait_until="domcontentloaded", timeout=60000)
+                if await is_block_page(page, response):
+                    self.delay.observe(blocked=True)
+                    outcome = "blocked"
+                    raise Exception(f"bị chặn (status {response.status if response else '?'})")
+                # Chờ theo sự kiện: có link tin đầu tiên, rồi network idle (không bắt buộc)
+                await page.wait_for_selector(LINK_SELECTOR, timeout=30000)
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=5000)
+                except PlaywrightTimeoutError:
+                    pass
+                self.delay.observe(time.perf_counter() - started)
+
+                await scroll_to_bottom(page)
+                cards = {}  # dict giữ thứ tự, tra trùng O(1)
+                for card in await extract_cards(page, LINK_SELECTOR):
+                    if card["href"]:
+                        # Ghép theo URL trang danh sách → chạy được với --url trỏ tới site khác (vd stub benchmark)
+                        link = urljoin(page_url, card["href"])
+                        cards[link] = {"link": link, "price": card["price"], "posted": card["posted"]}
+            outcome = "ok"
+            return list(cards.values())
+        except PlaywrightTimeoutError:
+            outcome = "timeout"
+            raise
+        finally:
+            if self.metrics is not None:
+                self.metrics.observe("listing", time.perf_counter() - started, 0, outcome)
+            await page.close()
 
+    async def crawl_page(self, browser, page_url, page_label, pages_left=1):
+        """
+        Crawl 1 trang danh sách: lấy link (hoặc frontier đã lưu) rồi lấy chi tiết song song.
+        Trang chỉ được đánh dấu xong khi mọi link đã lấy được; trả về True nếu trang đã xong.
+        """
+        if self.state["pending"].get(page_url):
+            # Resume: dùng lại frontier đã lưu (các tin lỗi lần trước), không cần mở lại trang danh sách
+            hrefs = list(self.state["pending"][page_url])
+            print(f" Tiếp tục {len(hrefs)} tin còn lại từ checkpoint.")
+        else:
+            cards = await self.collect_links(browser, page_url)
+            hrefs = [card["link"] for card in cards]
             print(f" Thu thập được {len(hrefs)} tin đăng.")
+            if self.scheduler is not None:
+                hrefs = self.scheduler.plan(cards, pages_left)
+            self.state["pending"][page_url] = list(hrefs)
+            self.save_state()
+        print(f" Lấy chi tiết {len(hrefs)} tin với {self.pool_size} tab.")
 
-            for idx, link in enumerate(hrefs, 1):
-                print(f"  [{page_num}.{idx}] {link}")
-                detail_page = browser.new_page(
-                    user_agent="Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36 Edg/129.0.0.0"
-                )
-                try:
-                    detail_page.goto(link, timeout=60000)
-                    detail_page.wait_for_selector(".re__pr-specs-content-item-title", timeout=20000)
+        await asyncio.gather(*(
+            self.scrape_detail(page_url, link, f"{page_label}.{idx}")
+            for idx, link in enumerate(hrefs, 1)
+        ))
+        self.meter.report(f"trang {page_label}")
+        if self.metrics is not None:
+            self.metrics.add_pages(1)
+        left = self.state["pending"].get(page_url)
+        if left:
+            print(f" Còn {len(left)} tin lỗi, trang chưa xong → sẽ thử lại khi --resume.")
+            self.save_state()
+            return False
+        self.state["pending"].pop(page_url, None)
+        self.state["done_pages"].append(page_url)
+        self.save_state()
+        return True
 
-                    title = detail_page.query_selector("h1.re__pr-title, h1.re__pr-title__value")
-                    title_text = title.inner_text().strip() if title else "Không có tiêu đề"
+    async def page_delay(self):
+        """Nghỉ giữa 2 trang danh sách (tuần tự, không chồng lên nhau nên cộng thẳng vào metrics)."""
+        slept = await self.delay.wait("chuyển trang")
+        self.timing.add("waiting", slept)
+        if self.metrics is not None:
+            self.metrics.add_sleep(slept)
 
-                    titles = detail_page.query_selector_all(".re__pr-specs-content-item-title")
-                    values = detail_page.query_selector_all(".re__pr-specs-content-item-value")
+    async def start_browser(self, p):
+        browser = await p.chromium.launch(headless=True, args=LAUNCH_ARGS)
+        self.pool = await TabPool(browser, self.pool_size, self.blocker).start()
+        return browser
 
-                    item = {"Link": link, "Tiêu đề": title_text}
-                    for t, v in zip(titles, values):
-                        key = t.inner_text().strip()
-                        val = v.inner_text().strip()
-                        item[key] = val
-                        all_columns.add(key)
+    async def close_browser(self, browser):
+        self.meter.report(f"tổng, pool={self.pool_size}")
+        self.blocker.report()
+        self.paths.report()
+        self.timing.report()
+        if self.metrics is not None:
+            self.metrics.add_listings(self.meter.ok)
+        if self.http is not None:
+            self.http.close()
+        await self.pool.close()
+        await browser.close()
 
-                    all_data.append(item)
-                    print(f"   → OK: {len(item)-2} thuộc tính")
+    async def run(self, page_urls=None):
+        """Crawl lần lượt các trang danh sách trong page_urls (mặc định: url, max_pages trang)."""
+        if page_urls is None:
+            page_urls = listing_pages(url, range(1, max_pages + 1))
 
+        async with async_playwright() as p:
+            browser = await self.start_browser(p)
+            for page_idx, page_url in enumerate(page_urls, 1):
+                if page_url in self.state["done_pages"]:
+                    print(f"\n=== Trang {page_url} đã xong ở lần chạy trước, bỏ qua ===")
+                    continue
+                print(f"\n=== Đang crawl trang {page_idx}/{len(page_urls)}: {page_url} ===")
+                try:
+                    await self.crawl_page(browser, page_url, page_idx, len(page_urls) - page_idx + 1)
                 except Exception as e:
-                    print(f"   → LỖI: {e}")
-                finally:
-                    detail_page.close()
+                    print(f" Trang {page_url} lỗi tổng: {e}")
+                    self.failed_pages.append(page_url)
 
-                random_delay(4, 9, "tránh bị chặn")
+                if page_idx < len(page_urls):
+                    await self.page_delay()
+            await self.close_browser(browser)
 
-        except Exception as e:
-            print(f" Trang {page_num} lỗi tổng: {e}")
-        finally:
-            page.close()
+    async def crawl_task(self, browser, page_url, page_label, pages_left):
+        # Còn tin lỗi → task lỗi, hàng đợi trả về pending để thử lại (frontier còn lại giữ trong state)
+        if not await self.crawl_page(browser, page_url, page_label, pages_left):
+            raise Exception(f"còn {len(self.state['pending'][page_url])} tin lỗi")
+
+    async def run_queue(self, crawl_queue, crawl_date):
+        """Chế độ nhiều máy: nhận từng trang danh sách từ hàng đợi crawl_task cho tới khi hết task."""
+        async with async_playwright() as p:
+            browser = await self.start_browser(p)
+            page_idx = 0
+            while True:
+                task = crawl_queue.claim(crawl_date, "bds")
+                if task is None:
+                    break
+                page_idx += 1
+                print(f"\n=== [queue] Trang {task['task_key']} (lần {task['attempts']}) ===")
+                pages_left = crawl_queue.stats(crawl_date, "bds").get("pending", 0) + 1
+                await crawl_queue.run_task(task, self.crawl_task(browser, task["task_key"], page_idx, pages_left))
+                await self.page_delay()
+            await self.close_browser(browser)
+
+
+def replay(sink, archive):
+    """Dựng lại dữ liệu từ HTML đã lưu trong archive, không cần mạng/trình duyệt."""
+    start = time.perf_counter()
+    total_bytes = 0
+    for entry, html in archive.iter_bodies():
+        total_bytes += len(html)
+        sink.write(parse_detail_html(html, entry["url"]))
+    elapsed = time.perf_counter() - start
+    rate = sink.count / elapsed if elapsed > 0 else 0
+    print(f" Replay {sink.count} trang ({total_bytes / 1e6:.1f} MB) trong {elapsed:.2f}s → {rate:.1f} trang/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl tin đăng batdongsan.com.vn")
+    parser.add_argument("--replay", action="store_true", help="Dựng CSV từ HTML đã lưu, không gọi mạng")
+    parser.add_argument("--date", type=str, default=datetime.now().strftime('%d%m%Y'),
+                        help="Ngày crawl (ddmmyyyy), dùng cho --replay")
+    parser.add_argument("--url", type=str, default=url, help="URL trang danh sách (thành phố/loại tin)")
+    parser.add_argument("--max-pages", type=int, default=max_pages, help="Số trang danh sách cần crawl")
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE, help="Số tab chi tiết chạy song song")
+    parser.add_argument("--rate", type=float, default=DETAIL_RATE, help="Số trang chi tiết/giây cho cả pool")
+    parser.add_argument("--block-config", type=str, default=BLOCK_CONFIG,
+                        help="File cấu hình chặn tài nguyên (loại request, domain)")
+    parser.add_argument("--no-block", action="store_true", help="Tắt chặn tài nguyên (đo đối chứng)")
+    parser.add_argument("--no-skip-seen", action="store_true",
+                        help="Lấy chi tiết cả tin đã crawl trước đó (không dùng seen index)")
+    parser.add_argument("--daily-budget", type=int, default=DAILY_BUDGET,
+                        help="Số trang chi tiết tối đa mỗi ngày; tin mới/đổi giá được ưu tiên, tin cũ lấy lại sau")
+    parser.add_argument("--no-http", action="store_true",
+                        help="Tắt fast path HTTP, lấy mọi trang chi tiết bằng Playwright")
+    parser.add_argument("--resume", action="store_true",
+                        help="Chạy tiếp từ checkpoint cùng ngày (giữ các tin đã crawl)")
+    parser.add_argument("--queue", action="store_true",
+                        help="Nhận trang danh sách từ hàng đợi crawl_task (chạy nhiều máy cùng 1 đợt crawl)")
+    parser.add_argument("--queue-db", type=str, default="mysql",
+                        help='DB hàng đợi: "mysql" (control) hoặc đường dẫn file SQLite thay thế')
+    parser.add_argument("--refresh-seen", action="store_true",
+                        help="Đồng bộ seen index từ warehouse.bds_common trước khi crawl")
+    args = parser.parse_args()
+
+    os.makedirs(output_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"bds_{args.date}.csv")
+    # File JSONL trung gian: mỗi tin crawl xong được ghi ngay, cột động gom lại khi dựng CSV
+    items_file = os.path.join(output_dir, f"bds_{args.date}.jsonl")
+    checkpoint_file = os.path.join(output_dir, f"bds_{args.date}.checkpoint.json")
+
+    crawl_queue = None
+    if args.queue and not args.replay:
+        # Nhiều máy: mỗi node ghi partition riêng vào thư mục data dùng chung, tiến độ nằm ở hàng đợi
+        crawl_queue = CrawlQueue(connect_queue(args.queue_db))
+        # Thư mục riêng của chế độ hàng đợi: bds_parts_<ngày> là của bds_launcher, gộp chung sẽ trùng dòng
+        work_dir = os.path.join(output_dir, f"bds_queue_{args.date}")
+        os.makedirs(work_dir, exist_ok=True)
+        node = crawl_queue.owner.replace(":", "-")
+        items_file = os.path.join(work_dir, f"queue-{node}.jsonl")
+        checkpoint_file = None
+        added = crawl_queue.enqueue(args.date, "bds",
+                                    [(page_url, None) for page_url in listing_pages(args.url, range(1, args.max_pages + 1))])
+        print(f" [queue] Thêm {added} trang danh sách mới vào hàng đợi")
+        archive = RawArchive("bds", args.date, index_name=f"index-{node}.jsonl")
+    else:
+        archive = RawArchive("bds", args.date)
+
+    if args.replay:
+        # Replay ghi JSONL riêng → không đè JSONL/checkpoint của lần crawl dở cùng ngày
+        items_file = os.path.join(output_dir, f"bds_{args.date}.replay.jsonl")
+
+    # Chạy mới thì bỏ checkpoint cũ; --resume thì ghi tiếp vào JSONL của lần chạy trước
+    resume = args.resume and not args.replay
+    if checkpoint_file and not resume and not args.replay and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+    crawler = None
 
-        random_delay(12, 25, "chuyển trang")
+    with JsonlSink(items_file, mode="a" if resume else "w") as sink:
+        if args.replay:
+            replay(sink, archive)
+        else:
+            block_config = load_block_config(args.block_config if os.path.exists(args.block_config) else None)
+            if args.no_block:
+                block_config["enabled"] = False
+            seen = None if args.no_skip_seen else SeenIndex("bds")
+            if seen is not None and args.refresh_seen:
+                seen.refresh_from_warehouse(source_id=1)
+            scheduler = None if seen is None else RecrawlScheduler(seen, args.daily_budget, args.date)
+            metrics = CrawlMetrics("bds", instance=None if crawl_queue is None else node)
+            crawler = BdsCrawler(sink, archive, args.pool_size, args.rate, block_config, seen, checkpoint_file,
+                                 http_fast_path=not args.no_http, scheduler=scheduler, metrics=metrics)
+            if crawl_queue is not None:
+                asyncio.run(crawler.run_queue(crawl_queue, args.date))
+            else:
+                asyncio.run(crawler.run(listing_pages(args.url, range(1, args.max_pages + 1))))
+            # Số liệu của lần chạy: textfile Prometheus + JSON tóm tắt trong ../data/metrics
+            metrics.export()
+            if seen is not None:
+                seen.close()
 
-    browser.close()
+    if crawl_queue is not None:
+        # Chỉ node thấy hàng đợi đã cạn mới gộp partition của mọi node thành CSV trong ngày
+        drained = crawl_queue.is_drained(args.date, "bds")
+        print(f" [queue] Trạng thái: {crawl_queue.stats(args.date, 'bds')}")
+        crawl_queue.close()
+        if not drained:
+            print(f"Còn trang đang chạy ở node khác, để lại partition {items_file}")
+            sys.exit(0)
+        parts = sorted(glob.glob(os.path.join(work_dir, "queue-*.jsonl")))
+        # Trang bị nhận lại (node chết giữa chừng) được crawl lại từ đầu → cùng tin có thể nằm ở 2 partition
+        count = jsonl_to_csv(parts, output_file, leading_columns=("Link", "Tiêu đề"), dedupe_key="Link")
+        print(f"\nHOÀN TẤT 100%!\nĐã gộp {len(parts)} partition, lưu {count} tin vào file:\n{output_file}")
+        sys.exit(0)
 
-# Ghi file CSV
-all_columns.discard("Tiêu đề")
-columns = ["Link", "Tiêu đề"] + sorted(all_columns)
+    # Dựng file CSV từ JSONL (header = Link, Tiêu đề + các thuộc tính xuất hiện, sắp xếp)
+    count = jsonl_to_csv(items_file, output_file, leading_columns=("Link", "Tiêu đề"))
+    if crawler is not None and not crawler.complete:
+        # Còn trang/tin lỗi → giữ JSONL + checkpoint để --resume lấy tiếp phần còn thiếu
+        left = sum(len(links) for links in crawler.state["pending"].values())
+        print(f"\nCHƯA XONG: {len(crawler.failed_pages)} trang lỗi, {left} tin lỗi. Đã lưu tạm {count} tin vào:\n"
+              f"{output_file}\nGiữ {items_file} và checkpoint, chạy lại với --resume để lấy tiếp.")
+        sys.exit(1)
 
-with open(output_file, "w", newline="", encoding="utf-8-sig") as f:
-    writer = csv.DictWriter(f, fieldnames=columns)
-    writer.writeheader()
-    writer.writerows(all_data)
+    os.remove(items_file)
+    if checkpoint_file and not args.replay and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
 
-print(f"\nHOÀN TẤT 100%!\nĐã lưu {len(all_data)} tin vào file:\n{output_file}")
\ No newline at end of file
+    print(f"\nHOÀN TẤT 100%!\nĐã lưu {count} tin vào file:\n{output_file}")
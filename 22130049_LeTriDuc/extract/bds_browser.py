@@ -0,0 +1,322 @@
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+
+from bds_parse import normalize_text
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36 Edg/129.0.0.0"
+
+# TRÊN SERVER: dùng headless=True + args chống detect
+LAUNCH_ARGS = [
+    "--no-sandbox",
+    "--disable-setuid-sandbox",
+    "--disable-dev-shm-usage",
+    "--disable-blink-features=AutomationControlled",
+    "--disable-infobars",
+    "--start-maximized",
+    "--disable-features=ImproveInformer,TranslateUI",
+    "--disable-component-extensions-with-background-pages"
+]
+
+
+# Trang chi tiết chỉ cần h1 + .re__pr-specs-content-item-*, mọi thứ khác có thể chặn
+DEFAULT_BLOCK_CONFIG = {
+    "enabled": True,
+    "resource_types": ["image", "media", "font", "stylesheet"],
+    "first_party_domains": ["batdongsan.com.vn"],
+    "block_third_party": True,
+    "allow_domains": [],
+    # Tỉ lệ tin được tải KHÔNG chặn để đo đối chứng → ước lượng byte/thời gian tiết kiệm
+    "audit_rate": 0.05
+}
+
+
+def load_block_config(path=None):
+    config = dict(DEFAULT_BLOCK_CONFIG)
+    if path:
+        with open(path, encoding="utf-8") as f:
+            config.update(json.load(f))
+    return config
+
+
+def _domain_match(host, domains):
+    return any(host == d or host.endswith("." + d) for d in domains)
+
+
+class ResourceBlocker:
+    """
+    Chặn request không cần thiết (ảnh, font, CSS, domain bên thứ 3/tracker) qua context.route,
+    đồng thời đo byte tải về và thời gian load của từng tin. Một phần nhỏ tin (audit_rate)
+    được tải không chặn để so sánh và báo phần tiết kiệm thực tế.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        self.resource_types = set(config["resource_types"])
+        self.blocked = Counter()
+        self.bypass = set()        # tab đang tải tin audit (không chặn)
+        self.current = {}          # tab → số liệu của tin đang tải
+        self.samples = {True: [], False: []}   # audit? → [(bytes, load_s)]
+
+    def _block_reason(self, request):
+        host = urlparse(request.url).hostname or ""
+        if _domain_match(host, self.config["allow_domains"]):
+            return None
+        if request.resource_type in self.resource_types:
+            return request.resource_type
+        if self.config["block_third_party"] and not _domain_match(host, self.config["first_party_domains"]):
+            return "third_party"
+        return None
+
+    async def _handle(self, route):
+        request = route.request
+        try:
+            bypass = request.frame.page in self.bypass
+        except Exception:
+            bypass = False
+        reason = None if bypass else self._block_reason(request)
+        if reason:
+            self.blocked[reason] += 1
+            await route.abort()
+        else:
+            await route.continue_()
+
+    async def _on_finished(self, request):
+        try:
+            record = self.current.get(request.frame.page)
+            if record is not None:
+                sizes = await request.sizes()
+                record["bytes"] += sizes["responseBodySize"] + sizes["responseHeadersSize"]
+        except Exception:
+            pass
+
+    async def install(self, context):
+        if self.config["enabled"]:
+            await context.route("**/*", self._handle)
+
+    def track(self, page):
+        page.on("requestfinished", self._on_finished)
+
+    def start_listing(self, page):
+        """Bắt đầu đo 1 tin; trả về True nếu tin này là mẫu audit (tải không chặn)."""
+        audit = self.config["enabled"] and random.random() < self.config["audit_rate"]
+        if audit:
+            self.bypass.add(page)
+        self.current[page] = {"bytes": 0, "audit": audit}
+        return audit
+
+    def finish_listing(self, page, load_s):
+        """Kết thúc đo 1 trang, trả về số byte đã tải cho trang đó."""
+        self.bypass.discard(page)
+        record = self.current.pop(page, None)
+        if record is None:
+            return 0
+        if load_s is not None:
+            self.samples[record["audit"]].append((record["bytes"], load_s))
+        return record["bytes"]
+
+    def report(self):
+        def avg(samples):
+            n = len(samples)
+            if not n:
+                return None
+            return sum(b for b, _ in samples) / n / 1024, sum(t for _, t in samples) / n, n
+
+        blocked = ", ".join(f"{k}={v}" for k, v in self.blocked.most_common()) or "không"
+        print(f" [chặn tài nguyên] đã chặn: {blocked}")
+        normal, audit = avg(self.samples[False]), avg(self.samples[True])
+        label = "Có chặn" if self.config["enabled"] else "Không chặn"
+        if normal:
+            print(f" {label}: TB {normal[0]:.0f} KB/tin, {normal[1]:.2f}s/tin (n={normal[2]})")
+        if audit:
+            print(f" Audit không chặn: TB {audit[0]:.0f} KB/tin, {audit[1]:.2f}s/tin (n={audit[2]})")
+        if normal and audit:
+            print(f" → Tiết kiệm ~{audit[0] - normal[0]:.0f} KB và {audit[1] - normal[1]:.2f}s mỗi tin")
+
+
+# Dấu hiệu trang chặn bot / captcha thay vì nội dung thật
+BLOCK_STATUS = {403, 429, 503}
+BLOCK_MARKERS = ("just a moment", "captcha", "access denied", "attention required")
+
+
+async def is_block_page(page, response=None):
+    if response is not None and response.status in BLOCK_STATUS:
+        return True
+    try:
+        title = (await page.title()).lower()
+    except Exception:
+        return False
+    return any(marker in title for marker in BLOCK_MARKERS)
+
+
+TITLE_SELECTOR = "h1.re__pr-title, h1.re__pr-title__value"
+SPEC_TITLE_SELECTOR = ".re__pr-specs-content-item-title"
+SPEC_VALUE_SELECTOR = ".re__pr-specs-content-item-value"
+
+# Trích tiêu đề + toàn bộ thông số trong 1 lần page.evaluate (1 round trip IPC thay vì 20+)
+EXTRACT_DETAIL_JS = """
+([titleSel, keySel, valSel]) => {
+    const h1 = document.querySelector(titleSel);
+    const keys = document.querySelectorAll(keySel);
+    const vals = document.querySelectorAll(valSel);
+    const specs = [];
+    const n = Math.min(keys.length, vals.length);
+    for (let i = 0; i < n; i++) {
+        specs.push([keys[i].innerText.trim(), vals[i].innerText.trim()]);
+    }
+    return {title: h1 ? h1.innerText.trim() : null, specs: specs};
+}
+"""
+
+
+def _build_item(link, title_text, specs):
+    # innerText giữ xuống dòng/NBSP → chuẩn hoá giống parse_detail_html của fast path HTTP
+    title_text = normalize_text(title_text)
+    item = {"Link": link, "Tiêu đề": title_text if title_text else "Không có tiêu đề"}
+    for key, val in specs:
+        item[normalize_text(key)] = normalize_text(val)
+    return item
+
+
+async def extract_detail(page, link):
+    """Lấy tiêu đề + dict thông số của trang chi tiết bằng 1 lần gọi page.evaluate."""
+    data = await page.evaluate(EXTRACT_DETAIL_JS, [TITLE_SELECTOR, SPEC_TITLE_SELECTOR, SPEC_VALUE_SELECTOR])
+    return _build_item(link, data["title"], data["specs"])
+
+
+async def extract_detail_per_element(page, link):
+    """Cách cũ: query_selector_all + inner_text() từng phần tử (mỗi lệnh 1 round trip). Giữ lại để benchmark."""
+    title = await page.query_selector(TITLE_SELECTOR)
+    title_text = (await title.inner_text()).strip() if title else None
+
+    titles = await page.query_selector_all(SPEC_TITLE_SELECTOR)
+    values = await page.query_selector_all(SPEC_VALUE_SELECTOR)
+    specs = []
+    for t, v in zip(titles, values):
+        specs.append(((await t.inner_text()).strip(), (await v.inner_text()).strip()))
+    return _build_item(link, title_text, specs)
+
+
+CARD_SELECTOR = ".js__card"
+CARD_PRICE_SELECTOR = ".re__card-config-price"
+CARD_DATE_SELECTOR = ".re__card-published-info-published-at"
+
+# Tóm tắt từng card trên trang danh sách (link, giá, ngày đăng) trong 1 lần page.evaluate
+EXTRACT_CARDS_JS = """
+([linkSel, cardSel, priceSel, dateSel]) => Array.from(document.querySelectorAll(linkSel)).map(a => {
+    const card = a.closest(cardSel) || a;
+    const price = card.querySelector(priceSel);
+    const date = card.querySelector(dateSel);
+    return {
+        href: a.getAttribute("href"),
+        price: price ? price.innerText.trim() : null,
+        posted: date ? (date.getAttribute("aria-label") || date.innerText).trim() : null
+    };
+})
+"""
+
+
+async def extract_cards(page, link_selector):
+    """Danh sách card trên trang danh sách: {href, price, posted} (thiếu trường nào thì None)."""
+    return await page.evaluate(
+        EXTRACT_CARDS_JS, [link_selector, CARD_SELECTOR, CARD_PRICE_SELECTOR, CARD_DATE_SELECTOR]
+    )
+
+
+class TimeBreakdown:
+    """Cộng dồn thời gian nghỉ chủ động (limiter/delay) và thời gian làm việc (tải trang, trích xuất)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.totals = Counter()
+
+    @asynccontextmanager
+    async def measure(self, kind):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.totals[kind] += time.perf_counter() - start
+
+    def add(self, kind, seconds):
+        self.totals[kind] += seconds
+
+    def report(self):
+        wall = time.perf_counter() - self.started
+        waiting, working = self.totals["waiting"], self.totals["working"]
+        busy = waiting + working
+        share = waiting / busy * 100 if busy else 0.0
+        print(f" [thời gian] wall {wall:.0f}s | nghỉ {waiting:.0f}s | làm việc {working:.0f}s "
+              f"(cộng dồn các tab) → {share:.0f}% là chờ")
+
+
+class TabPool:
+    """
+    Pool cố định N tab, mỗi tab nằm trong 1 browser context riêng (cookie/cache tách biệt).
+    Tab được tái sử dụng cho nhiều trang chi tiết thay vì new_page()/close() cho từng tin.
+    """
+
+    def __init__(self, browser, size, blocker=None):
+        self.browser = browser
+        self.size = size
+        self.blocker = blocker
+        self.contexts = []
+        self.idle = asyncio.Queue()
+
+    async def start(self):
+        for _ in range(self.size):
+            context = await self.browser.new_context(user_agent=USER_AGENT)
+            if self.blocker:
+                await self.blocker.install(context)
+            self.contexts.append(context)
+            self.idle.put_nowait(self._track(await context.new_page()))
+        return self
+
+    def _track(self, tab):
+        if self.blocker:
+            self.blocker.track(tab)
+        return tab
+
+    async def _replace(self, tab):
+        """Tab hỏng (crash/đóng) thì mở tab mới trong cùng context để pool luôn đủ N tab."""
+        context = tab.context
+        try:
+            await tab.close()
+        except Exception:
+            pass
+        return self._track(await context.new_page())
+
+    @asynccontextmanager
+    async def tab(self):
+        tab = await self.idle.get()
+        try:
+            yield tab
+        finally:
+            if tab.is_closed():
+                tab = await self._replace(tab)
+            self.idle.put_nowait(tab)
+
+    async def close(self):
+        for context in self.contexts:
+            await context.close()
+
+
+class ThroughputMeter:
+    """Đếm số tin crawl được và tính tốc độ tin/phút để chọn kích thước pool."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.ok = 0
+        self.failed = 0
+
+    def per_minute(self):
+        elapsed = time.perf_counter() - self.started
+        return self.ok * 60 / elapsed if elapsed > 0 else 0.0
+
+    def report(self, label=""):
+        elapsed = time.perf_counter() - self.started
+        print(f" [{label}] {self.ok} tin OK, {self.failed} lỗi sau {elapsed:.0f}s → {self.per_minute():.1f} tin/phút")
@@ -0,0 +1,89 @@
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import requests
+
+from crawl_metrics import classify_status, wire_bytes
+from bds_parse import HAS_LXML, has_specs, is_challenge_html, parse_detail_html
+from http_session import create_session
+
+
+class HttpDetailFetcher:
+    """
+    Fast path: lấy trang chi tiết BDS bằng HTTP thường (session pool keep-alive) và parse
+    HTML server-render. Trả lý do fallback khi thiếu bảng thông số hoặc gặp trang challenge.
+    """
+
+    def __init__(self, pool_size=4, timeout=20, metrics=None):
+        self.metrics = metrics
+        self.session = create_session(pool_size=pool_size)
+        self.session.headers["Accept"] = "text/html,application/xhtml+xml;q=0.9,*/*;q=0.8"
+        self.session.headers["Accept-Language"] = "vi-VN,vi;q=0.9,en;q=0.8"
+        self.executor = ThreadPoolExecutor(max_workers=pool_size)
+        self.timeout = timeout
+
+    def _observe(self, started, nbytes, outcome):
+        if self.metrics is not None:
+            self.metrics.observe("http", time.perf_counter() - started, nbytes, outcome)
+
+    def _fetch(self, link):
+        started = time.perf_counter()
+        try:
+            res = self.session.get(link, timeout=self.timeout)
+        except requests.RequestException as e:
+            self._observe(started, 0, "timeout" if isinstance(e, requests.Timeout) else "error")
+            return None, None, f"lỗi kết nối: {e.__class__.__name__}"
+        html = res.content.decode("utf-8", errors="replace")
+        challenged = res.status_code in (403, 429, 503) or is_challenge_html(html)
+        self._observe(started, wire_bytes(res), "blocked" if challenged else classify_status(res.status_code))
+        if challenged:
+            return None, html, f"challenge (status {res.status_code})"
+        if res.status_code != 200:
+            return None, html, f"status {res.status_code}"
+        if not has_specs(html):
+            return None, html, "không có bảng thông số trong HTML"
+        return parse_detail_html(html, link), html, None
+
+    async def fetch(self, link):
+        """Trả về (item | None, html | None, lý do fallback | None)."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, partial(self._fetch, link))
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
+
+
+class PathStats:
+    """Thống kê số trang và thời gian xử lý theo từng đường: http (fast path) / browser (Playwright)."""
+
+    def __init__(self):
+        self.count = Counter()
+        self.seconds = Counter()
+        self.fallback_reasons = Counter()
+
+    def record(self, path, seconds):
+        self.count[path] += 1
+        self.seconds[path] += seconds
+
+    def fallback(self, reason):
+        self.fallback_reasons[reason.split(":")[0]] += 1
+
+    def report(self):
+        total = sum(self.count.values())
+        if not total:
+            return
+        parser = "lxml" if HAS_LXML else "html.parser"
+        for path in ("http", "browser"):
+            n = self.count[path]
+            if not n:
+                continue
+            per_page = self.seconds[path] / n
+            print(f" [{path}] {n}/{total} trang ({n / total * 100:.0f}%), TB {per_page:.2f}s/trang "
+                  f"→ {1 / per_page if per_page else 0:.1f} trang/s mỗi luồng" + (f" (parser {parser})" if path == "http" else ""))
+        if self.fallback_reasons:
+            reasons = ", ".join(f"{k}={v}" for k, v in self.fallback_reasons.most_common())
+            print(f" Lý do fallback sang Playwright: {reasons}")
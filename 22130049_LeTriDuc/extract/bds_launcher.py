@@ -0,0 +1,133 @@
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from multiprocessing import get_context
+
+from bds import BLOCK_CONFIG, DETAIL_RATE, POOL_SIZE, BdsCrawler, listing_pages, output_dir
+from bds_browser import load_block_config
+from crawl_metrics import CrawlMetrics
+from crawl_sink import JsonlSink, jsonl_to_csv
+from raw_archive import RawArchive
+from recrawl_scheduler import DAILY_BUDGET, RecrawlScheduler
+from seen_index import SeenIndex
+
+TARGET_CONFIG = "bds_targets.json"
+WORKERS = max(1, min(4, os.cpu_count() or 1))
+
+
+def load_targets(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def split_tasks(targets, workers):
+    """
+    Trải toàn bộ trang danh sách (mọi URL thành phố/loại tin) ra các worker theo kiểu xoay vòng,
+    để worker nào cũng có cả trang đầu lẫn trang sâu của nhiều URL → tải đều hơn chia theo URL.
+    """
+    pages = []
+    for target in targets:
+        pages += listing_pages(target["url"], range(1, target.get("pages", 1) + 1))
+    return [pages[k::workers] for k in range(workers) if pages[k::workers]]
+
+
+def run_worker(part, page_urls, crawl_date, work_dir, options):
+    """Chạy trong process riêng: 1 browser, 1 partition JSONL, 1 checkpoint. Trả về (part, số tin, thời gian, đã xong hết chưa)."""
+    started = time.perf_counter()
+    items_file = os.path.join(work_dir, f"part{part}.jsonl")
+    checkpoint_file = os.path.join(work_dir, f"part{part}.checkpoint.json")
+    if not options["resume"] and os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
+
+    # Mỗi process ghi index archive riêng để không chen dòng vào nhau
+    archive = RawArchive("bds", crawl_date, index_name=f"index-part{part}.jsonl")
+    seen = None if options["no_skip_seen"] else SeenIndex("bds")
+    # Ngân sách ngày nằm trong SQLite của seen index → các process dùng chung 1 ngân sách
+    scheduler = None if seen is None else RecrawlScheduler(seen, options["daily_budget"], crawl_date)
+    # Mỗi process xuất textfile riêng (crawl_bds_part{k}.prom), node_exporter gộp theo nhãn instance_id
+    metrics = CrawlMetrics("bds", instance=f"part{part}")
+    with JsonlSink(items_file, mode="a" if options["resume"] else "w") as sink:
+        crawler = BdsCrawler(sink, archive, options["pool_size"], options["rate"], options["block_config"],
+                             seen, checkpoint_file, http_fast_path=not options["no_http"], scheduler=scheduler,
+                             metrics=metrics)
+        asyncio.run(crawler.run(page_urls))
+        count = sink.count
+        complete = crawler.complete
+    metrics.export()
+    if seen is not None:
+        seen.close()
+    return part, count, time.perf_counter() - started, complete
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Crawl batdongsan.com.vn bằng nhiều process song song")
+    parser.add_argument("--config", type=str, default=TARGET_CONFIG, help="File danh sách URL thành phố/loại tin")
+    parser.add_argument("--workers", type=int, default=None, help="Số process (mặc định lấy trong config)")
+    parser.add_argument("--date", type=str, default=datetime.now().strftime('%d%m%Y'), help="Ngày crawl (ddmmyyyy)")
+    parser.add_argument("--pool-size", type=int, default=POOL_SIZE, help="Số tab chi tiết mỗi process")
+    parser.add_argument("--rate", type=float, default=DETAIL_RATE,
+                        help="Số trang chi tiết/giây cho CẢ đợt crawl (chia đều cho các process)")
+    parser.add_argument("--block-config", type=str, default=BLOCK_CONFIG, help="File cấu hình chặn tài nguyên")
+    parser.add_argument("--no-skip-seen", action="store_true", help="Không dùng seen index")
+    parser.add_argument("--daily-budget", type=int, default=DAILY_BUDGET, help="Số trang chi tiết tối đa mỗi ngày")
+    parser.add_argument("--no-http", action="store_true", help="Tắt fast path HTTP")
+    parser.add_argument("--resume", action="store_true", help="Chạy tiếp từ checkpoint của từng partition")
+    args = parser.parse_args()
+
+    config = load_targets(args.config)
+    workers = args.workers or config.get("workers", WORKERS)
+    chunks = split_tasks(config["targets"], workers)
+
+    work_dir = os.path.join(output_dir, f"bds_parts_{args.date}")
+    os.makedirs(work_dir, exist_ok=True)
+    output_file = os.path.join(output_dir, f"bds_{args.date}.csv")
+
+    options = {
+        "resume": args.resume,
+        "no_skip_seen": args.no_skip_seen,
+        "no_http": args.no_http,
+        "pool_size": args.pool_size,
+        "daily_budget": args.daily_budget,
+        # Giữ nguyên tổng ngân sách lịch sự với site dù chạy nhiều process
+        "rate": args.rate / max(1, len(chunks)),
+        "block_config": load_block_config(args.block_config if os.path.exists(args.block_config) else None),
+    }
+
+    print(f"Crawl {sum(len(c) for c in chunks)} trang danh sách bằng {len(chunks)} process, "
+          f"{options['rate']:.2f} trang chi tiết/s mỗi process")
+    started = time.perf_counter()
+    incomplete = []
+    # spawn: mỗi process khởi tạo Playwright/SQLite sạch, không kế thừa trạng thái của process cha
+    with ProcessPoolExecutor(max_workers=len(chunks), mp_context=get_context("spawn")) as pool:
+        futures = {pool.submit(run_worker, part, page_urls, args.date, work_dir, options): part
+                   for part, page_urls in enumerate(chunks)}
+        for future in as_completed(futures):
+            part = futures[future]
+            try:
+                _, count, elapsed, complete = future.result()
+                print(f" [part{part}] {'xong' if complete else 'chưa xong'} {count} tin trong {elapsed:.0f}s")
+                if not complete:
+                    incomplete.append(part)
+            except Exception as e:
+                print(f" [part{part}] Process lỗi: {e}")
+                incomplete.append(part)
+
+    if incomplete:
+        # Còn trang/tin lỗi: giữ nguyên part*.jsonl + checkpoint, chạy lại với --resume rồi mới gộp
+        print(f"\nCHƯA XONG: {len(incomplete)} partition lỗi hoặc chưa crawl hết "
+              f"({', '.join(f'part{k}' for k in sorted(incomplete))}).\n"
+              f"Giữ {work_dir}, chạy lại với --resume để lấy tiếp.")
+        sys.exit(1)
+
+    # Gộp partition: header = Link, Tiêu đề + hợp các thuộc tính của mọi partition
+    parts = [os.path.join(work_dir, f"part{part}.jsonl") for part in range(len(chunks))]
+    parts = [p for p in parts if os.path.exists(p)]
+    count = jsonl_to_csv(parts, output_file, leading_columns=("Link", "Tiêu đề"))
+    elapsed = time.perf_counter() - started
+    print(f"\nHOÀN TẤT! Đã lưu {count} tin vào {output_file} ({elapsed:.0f}s, "
+          f"{count / elapsed * 60 if elapsed > 0 else 0:.1f} tin/phút)")
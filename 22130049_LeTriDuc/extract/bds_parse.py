@@ -0,0 +1,128 @@
+from html.parser import HTMLParser
+
+# lxml (parser C) nhanh hơn nhiều so với html.parser thuần Python; không cài thì dùng bản thuần Python
+try:
+    import lxml.html
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+TITLE_CLASSES = {"re__pr-title", "re__pr-title__value"}
+SPEC_TITLE_CLASS = "re__pr-specs-content-item-title"
+SPEC_VALUE_CLASS = "re__pr-specs-content-item-value"
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+def normalize_text(text):
+    """
+    Chuẩn hoá text thông số dùng chung cho cả fast path HTTP và Playwright (innerText):
+    gộp mọi khoảng trắng (xuống dòng, tab, NBSP) thành 1 dấu cách, bỏ khoảng trắng 2 đầu.
+    Cùng 1 tin lấy qua đường nào cũng ra cùng giá trị → seen/card_state và transform so sánh được.
+    """
+    if text is None:
+        return None
+    return " ".join(text.split())
+
+
+class _DetailParser(HTMLParser):
+    """Parser HTML thuần Python: lấy text của h1 tiêu đề và các cặp title/value thông số."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.title = None
+        self.spec_titles = []
+        self.spec_values = []
+        self._capture = None    # (loại, độ sâu thẻ bắt đầu)
+        self._depth = 0
+        self._buf = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            # <br> là xuống dòng trong innerText → giữ 1 khoảng trắng để chữ 2 bên không dính nhau
+            if tag == "br" and self._capture is not None:
+                self._buf.append("\n")
+            return
+        self._depth += 1
+        if self._capture is not None:
+            return
+        classes = set((dict(attrs).get("class") or "").split())
+        if tag == "h1" and self.title is None and classes & TITLE_CLASSES:
+            self._capture = ("title", self._depth)
+        elif SPEC_TITLE_CLASS in classes:
+            self._capture = ("spec_title", self._depth)
+        elif SPEC_VALUE_CLASS in classes:
+            self._capture = ("spec_value", self._depth)
+
+    def handle_endtag(self, tag):
+        if tag in VOID_TAGS:
+            return
+        if self._capture is not None and self._capture[1] == self._depth:
+            text = normalize_text("".join(self._buf))
+            kind = self._capture[0]
+            if kind == "title":
+                self.title = text
+            elif kind == "spec_title":
+                self.spec_titles.append(text)
+            else:
+                self.spec_values.append(text)
+            self._capture = None
+            self._buf = []
+        self._depth -= 1
+
+    def handle_data(self, data):
+        if self._capture is not None:
+            self._buf.append(data)
+
+
+# Dấu hiệu trang challenge/chống bot thay vì trang chi tiết thật
+CHALLENGE_MARKERS = ("just a moment", "cf-chl", "challenge-platform", "captcha", "access denied")
+
+
+def has_specs(html):
+    return SPEC_TITLE_CLASS in html
+
+
+def is_challenge_html(html):
+    head = html[:20000].lower()
+    return any(marker in head for marker in CHALLENGE_MARKERS)
+
+
+def _class_xpath(tag, cls):
+    return f"//{tag}[contains(concat(' ', normalize-space(@class), ' '), ' {cls} ')]"
+
+
+def _text(el):
+    return normalize_text(el.text_content())
+
+
+def _parse_lxml(html):
+    doc = lxml.html.fromstring(html)
+    # text_content() bỏ qua <br>, innerText thì xuống dòng → thêm khoảng trắng cho giống
+    for br in doc.iter("br"):
+        br.tail = "\n" + (br.tail or "")
+    title = None
+    for cls in ("re__pr-title", "re__pr-title__value"):
+        found = doc.xpath(_class_xpath("h1", cls))
+        if found:
+            title = _text(found[0])
+            break
+    titles = [_text(el) for el in doc.xpath(_class_xpath("*", SPEC_TITLE_CLASS))]
+    values = [_text(el) for el in doc.xpath(_class_xpath("*", SPEC_VALUE_CLASS))]
+    return title, titles, values
+
+
+def _parse_stdlib(html):
+    parser = _DetailParser()
+    parser.feed(html)
+    parser.close()
+    return parser.title, parser.spec_titles, parser.spec_values
+
+
+def parse_detail_html(html, link):
+    """Dựng item giống bds.py (Link, Tiêu đề, các thông số) từ HTML trang chi tiết (archive hoặc HTTP)."""
+    title, titles, values = _parse_lxml(html) if HAS_LXML else _parse_stdlib(html)
+
+    item = {"Link": link, "Tiêu đề": title if title else "Không có tiêu đề"}
+    for key, val in zip(titles, values):
+        item[key] = val
+    return item
@@ -0,0 +1,134 @@
+import json
+import sqlite3
+import zlib
+from datetime import datetime
+
+DETAIL_URL = "https://gateway.chotot.com/v1/public/ad-listing/{list_id}"
+DETAIL_CACHE_PATH = "../data/chotot_detail_cache.sqlite"
+DETAIL_CONCURRENCY = 4  # Số request chi tiết song song (pool riêng, không giành slot của API danh sách)
+DETAIL_RATE = 3.0       # Số request chi tiết / giây
+DETAIL_BUDGET = 300     # Số tin tối đa được lấy chi tiết mỗi lần chạy
+
+# Cột bổ sung (ghi nối sau các cột cũ trong CSV để field1..9 của chotot_raw giữ nguyên vị trí)
+DETAIL_COLUMNS = ["bathroom", "floors", "house_direction", "legal_doc", "furniture"]
+
+# Tham số dạng số: lấy giá trị gốc trong `ad` (số nguyên), không lấy nhãn hiển thị
+NUMERIC_PARAMS = {"toilets", "floors"}
+
+# id tham số trong response chi tiết → cột CSV
+DETAIL_PARAMS = {
+    "toilets": "bathroom",
+    "floors": "floors",
+    "direction": "house_direction",
+    "property_legal_document": "legal_doc",
+    "furnishing_sell": "furniture",
+}
+
+
+def parse_detail(body):
+    """
+    Lấy các thuộc tính bổ sung từ JSON chi tiết. Thuộc tính số lấy giá trị gốc trong `ad`;
+    thuộc tính chữ ưu tiên `parameters` (nhãn tiếng Việt, vd hướng "Đông Nam") rồi mới tới mã trong `ad`.
+    """
+    data = json.loads(body)
+    ad = data.get("ad", {})
+    labelled = {p.get("id"): p.get("value") for p in data.get("parameters", [])}
+    detail = {}
+    for param, column in DETAIL_PARAMS.items():
+        if param in NUMERIC_PARAMS:
+            detail[column] = ad.get(param) if ad.get(param) is not None else labelled.get(param)
+        else:
+            detail[column] = labelled.get(param) or ad.get(param)
+    return detail
+
+
+class DetailCache:
+    """Cache JSON chi tiết theo list_id trên đĩa (SQLite, body nén zlib). Đổi luật parse không cần gọi lại API."""
+
+    def __init__(self, path=DETAIL_CACHE_PATH):
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS detail (
+                list_id TEXT PRIMARY KEY,
+                fetched_at TEXT,
+                body BLOB
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def get_many(self, list_ids):
+        """{list_id: body} của các id đã có trong cache."""
+        list_ids = [str(i) for i in dict.fromkeys(list_ids)]
+        found = {}
+        for i in range(0, len(list_ids), 500):
+            batch = list_ids[i:i + 500]
+            placeholders = ", ".join("?" * len(batch))
+            rows = self.conn.execute(f"SELECT list_id, body FROM detail WHERE list_id IN ({placeholders})", batch)
+            found.update((row[0], zlib.decompress(row[1]).decode("utf-8")) for row in rows)
+        return found
+
+    def put(self, list_id, body):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.conn.execute(
+            "INSERT OR REPLACE INTO detail (list_id, fetched_at, body) VALUES (?, ?, ?)",
+            (str(list_id), datetime.now().isoformat(timespec="seconds"), zlib.compress(body))
+        )
+        self.conn.commit()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM detail").fetchone()[0]
+
+    def close(self):
+        self.conn.close()
+
+
+class DetailEnricher:
+    """
+    Bổ sung thuộc tính chi tiết: id đã có trong cache thì đọc cache,
+    còn lại (chỉ các tin mới nếu truyền fetch_ids) gọi API chi tiết song song qua PageFetcher riêng (giới hạn concurrency + rate + ngân sách).
+    """
+
+    def __init__(self, fetcher, cache, budget, detail_url=DETAIL_URL):
+        self.fetcher = fetcher
+        self.detail_url = detail_url
+        self.cache = cache
+        self.budget = budget
+        self.hits = 0
+        self.fetched = 0
+        self.failed = 0
+
+    async def enrich(self, ads, fetch_ids=None):
+        """
+        Trả về {list_id: dict DETAIL_COLUMNS} cho các tin lấy được chi tiết (từ cache hoặc API).
+        fetch_ids: chỉ gọi API cho các id này (vd tin mới theo seen index); None → mọi id chưa có trong cache.
+        """
+        ids = [str(ad["list_id"]) for ad in ads if ad.get("list_id") is not None]
+        bodies = self.cache.get_many(ids)
+        self.hits += len(bodies)
+
+        missing = [i for i in ids if i not in bodies]
+        if fetch_ids is not None:
+            fetch_ids = {str(i) for i in fetch_ids}
+            missing = [i for i in missing if i in fetch_ids]
+        missing = missing[:self.budget.take(len(missing))]
+        urls = {self.detail_url.format(list_id=i): i for i in missing}
+        async for url, res in self.fetcher.fetch_many(list(urls)):
+            if res is None or res.status_code != 200:
+                self.failed += 1
+                continue
+            self.cache.put(urls[url], res.content)
+            bodies[urls[url]] = res.text
+            self.fetched += 1
+
+        details = {}
+        for list_id, body in bodies.items():
+            try:
+                details[list_id] = parse_detail(body)
+            except (ValueError, AttributeError):
+                self.failed += 1
+        return details
+
+    def report(self):
+        print(f" Chi tiết tin: {self.fetched} gọi API, {self.hits} lấy từ cache, {self.failed} lỗi, "
+              f"còn {self.budget.remaining} lượt trong ngân sách")
@@ -0,0 +1,92 @@
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+import requests
+
+from crawl_metrics import classify_status, wire_bytes
+from http_session import RETRY_STATUS, MAX_RETRIES, backoff_delay, parse_retry_after
+from rate_limit import AdaptiveRateLimiter
+
+
+class RequestBudget:
+    """Tổng số request được phép dùng trong 1 lần chạy, chia chung cho mọi shard."""
+
+    def __init__(self, total):
+        self.remaining = total
+
+    def take(self, n=1):
+        """Xin n request, trả về số request thực sự được cấp (có thể ít hơn khi sắp hết)."""
+        granted = max(0, min(n, self.remaining))
+        self.remaining -= granted
+        return granted
+
+
+class PageFetcher:
+    """
+    Gọi API qua session dùng chung, tối đa `concurrency` request cùng lúc và `rate` req/s
+    (limiter + semaphore dùng chung cho mọi shard). Lỗi tạm thời (kết nối, 429/5xx)
+    được thử lại với exponential backoff có jitter.
+    Có metrics thì ghi độ trễ/byte/kết quả từng lần gọi (nhãn kind), thời gian limiter ngủ và thời gian backoff.
+    """
+
+    def __init__(self, session, concurrency=8, rate=5.0, max_rate=None, timeout=20, retries=MAX_RETRIES,
+                 metrics=None, kind="listing"):
+        self.session = session
+        self.metrics = metrics
+        self.kind = kind
+        self.limiter = AdaptiveRateLimiter(rate, max_rate=max_rate, metrics=metrics)
+        self.semaphore = asyncio.Semaphore(concurrency)
+        # requests là blocking → chạy trong pool thread riêng, đúng bằng số request song song
+        self.executor = ThreadPoolExecutor(max_workers=concurrency)
+        self.timeout = timeout
+        self.retries = retries
+
+    async def fetch(self, url):
+        """Trả về response cuối cùng (có thể vẫn là 429/5xx khi hết lượt thử) hoặc None nếu lỗi kết nối."""
+        async with self.semaphore:
+            res = None
+            for attempt in range(self.retries + 1):
+                await self.limiter.acquire()
+                started = time.perf_counter()
+                retry_after = None
+                try:
+                    loop = asyncio.get_running_loop()
+                    res = await loop.run_in_executor(
+                        self.executor, partial(self.session.get, url, timeout=self.timeout)
+                    )
+                    if self.metrics is not None:
+                        self.metrics.observe(self.kind, time.perf_counter() - started, wire_bytes(res),
+                                             classify_status(res.status_code))
+                    self.limiter.feedback(res.status_code, parse_retry_after(res))
+                    if res.status_code not in RETRY_STATUS:
+                        return res
+                    retry_after = parse_retry_after(res)
+                except requests.RequestException as e:
+                    print(f" Lỗi kết nối {url}: {e}")
+                    if self.metrics is not None:
+                        outcome = "timeout" if isinstance(e, requests.Timeout) else "error"
+                        self.metrics.observe(self.kind, time.perf_counter() - started, 0, outcome)
+                    self.limiter.feedback(503)
+                    res = None
+
+                if attempt < self.retries:
+                    delay = backoff_delay(attempt, retry_after)
+                    if self.metrics is not None:
+                        self.metrics.add_backoff(delay)
+                    await asyncio.sleep(delay)
+            return res
+
+    async def fetch_many(self, urls):
+        """Async generator (url, response | None) theo thứ tự hoàn thành."""
+        async def fetch_one(url):
+            return url, await self.fetch(url)
+
+        tasks = [asyncio.create_task(fetch_one(url)) for url in urls]
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.session.close()
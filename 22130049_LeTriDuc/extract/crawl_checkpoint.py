@@ -0,0 +1,19 @@
+import json
+import os
+
+
+def load_checkpoint(path, default):
+    """Đọc checkpoint JSON, chưa có file thì trả về bản sao của default."""
+    if not os.path.exists(path):
+        return json.loads(json.dumps(default))
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_checkpoint(path, state):
+    """Ghi checkpoint nguyên tử (ghi file tạm rồi rename) để crash giữa chừng không làm hỏng file."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
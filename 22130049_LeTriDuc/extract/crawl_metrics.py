@@ -0,0 +1,210 @@
+import json
+import os
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+METRICS_DIR = "../data/metrics"
+
+# Mốc histogram độ trễ request (giây)
+LATENCY_BUCKETS = (0.1, 0.25, 0.5, 1.0, 2.0, 5.0, 10.0, 30.0, 60.0)
+
+# Số mẫu độ trễ giữ lại mỗi loại request để tính p50/p95 (reservoir sampling, RAM cố định)
+LATENCY_SAMPLES = 10000
+
+BLOCK_STATUS = {403, 429}
+OUTCOMES = ("ok", "error", "timeout", "blocked")
+
+
+def classify_status(status_code):
+    """Kết quả 1 response: blocked (403/429), error (4xx/5xx khác), ok."""
+    if status_code in BLOCK_STATUS:
+        return "blocked"
+    if status_code >= 400:
+        return "error"
+    return "ok"
+
+
+def wire_bytes(res):
+    """
+    Số byte nhận qua mạng của 1 response requests (trước giải nén gzip): urllib3 đếm byte đã đọc từ socket;
+    không có thì lấy Content-Length, cuối cùng mới dùng độ dài body đã giải nén.
+    """
+    try:
+        n = res.raw.tell()
+        if n:
+            return n
+    except (AttributeError, OSError, ValueError):
+        pass
+    length = res.headers.get("Content-Length")
+    if length and length.isdigit():
+        return int(length)
+    return len(res.content)
+
+
+def quantile(samples, q):
+    """Phân vị q (0..1) theo nearest-rank."""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[max(0, min(len(ordered) - 1, int(round(q * len(ordered))) - 1))]
+
+
+class CrawlMetrics:
+    """
+    Số liệu 1 lần crawl: số request theo kết quả, histogram độ trễ, byte nhận qua mạng, số trang/tin,
+    thời gian nghỉ chủ động (limiter/giãn nhịp, theo đồng hồ) và tổng thời gian backoff của các request. Cuối lần chạy xuất ra textfile Prometheus (node_exporter textfile
+    collector) + 1 file JSON tóm tắt để theo dõi tốc độ crawl qua các ngày.
+    Gọi được từ nhiều thread (pool requests) nên mọi cập nhật đều qua lock.
+    """
+
+    def __init__(self, source, instance=None):
+        self.source = source
+        self.instance = instance
+        self.started = time.perf_counter()
+        self.started_at = datetime.now()
+        self.lock = threading.Lock()
+        self.requests = Counter()          # (kind, outcome) → số request
+        self.bytes = Counter()             # kind → byte
+        self.latency_buckets = {}          # kind → [số request <= mốc i]
+        self.latency_sum = Counter()
+        self.latency_count = Counter()
+        self.latency_samples = {}          # kind → mẫu độ trễ
+        self.pages = 0
+        self.listings = 0
+        self.sleep_seconds = 0.0
+        self.backoff_seconds = 0.0         # cộng theo từng request, các request song song có thể chồng nhau
+
+    def observe(self, kind, seconds, nbytes=0, outcome="ok"):
+        """Ghi nhận 1 request: kind = loại request (listing/detail/http/browser...)."""
+        with self.lock:
+            self.requests[(kind, outcome)] += 1
+            self.bytes[kind] += nbytes
+            buckets = self.latency_buckets.setdefault(kind, [0] * len(LATENCY_BUCKETS))
+            for i, bound in enumerate(LATENCY_BUCKETS):
+                if seconds <= bound:
+                    buckets[i] += 1
+            self.latency_sum[kind] += seconds
+            self.latency_count[kind] += 1
+            samples = self.latency_samples.setdefault(kind, [])
+            if len(samples) < LATENCY_SAMPLES:
+                samples.append(seconds)
+            else:
+                i = random.randrange(self.latency_count[kind])
+                if i < LATENCY_SAMPLES:
+                    samples[i] = seconds
+
+    def add_pages(self, n=1):
+        with self.lock:
+            self.pages += n
+
+    def add_listings(self, n=1):
+        with self.lock:
+            self.listings += n
+
+    def add_sleep(self, seconds):
+        with self.lock:
+            self.sleep_seconds += seconds
+
+    def add_backoff(self, seconds):
+        with self.lock:
+            self.backoff_seconds += seconds
+
+    def summary(self):
+        elapsed = time.perf_counter() - self.started
+        outcomes = Counter()
+        for (_, outcome), n in self.requests.items():
+            outcomes[outcome] += n
+        return {
+            "source": self.source,
+            "instance": self.instance,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "duration_s": round(elapsed, 3),
+            "pages": self.pages,
+            "listings": self.listings,
+            "pages_per_s": round(self.pages / elapsed, 4) if elapsed > 0 else 0.0,
+            "listings_per_s": round(self.listings / elapsed, 4) if elapsed > 0 else 0.0,
+            "requests": {outcome: outcomes[outcome] for outcome in OUTCOMES},
+            "bytes": sum(self.bytes.values()),
+            "sleep_s": round(self.sleep_seconds, 3),
+            "backoff_s": round(self.backoff_seconds, 3),
+            "latency": {
+                kind: {
+                    "count": self.latency_count[kind],
+                    "avg_s": round(self.latency_sum[kind] / self.latency_count[kind], 4),
+                    "p50_s": round(quantile(self.latency_samples[kind], 0.5), 4),
+                    "p95_s": round(quantile(self.latency_samples[kind], 0.95), 4),
+                    "buckets": dict(zip([str(b) for b in LATENCY_BUCKETS], buckets)),
+                }
+                for kind, buckets in self.latency_buckets.items() if self.latency_count[kind]
+            },
+        }
+
+    def _labels(self, **extra):
+        labels = {"source": self.source}
+        if self.instance is not None:
+            labels["instance_id"] = str(self.instance)
+        labels.update(extra)
+        return "{" + ",".join(f'{k}="{v}"' for k, v in labels.items()) + "}"
+
+    def prometheus_text(self):
+        s = self.summary()
+        lines = [
+            "# HELP crawl_requests_total Số request theo loại và kết quả",
+            "# TYPE crawl_requests_total counter",
+        ]
+        for (kind, outcome), n in sorted(self.requests.items()):
+            lines.append(f"crawl_requests_total{self._labels(kind=kind, outcome=outcome)} {n}")
+
+        lines += ["# HELP crawl_request_duration_seconds Độ trễ request",
+                  "# TYPE crawl_request_duration_seconds histogram"]
+        for kind, buckets in sorted(self.latency_buckets.items()):
+            for bound, n in zip(LATENCY_BUCKETS, buckets):
+                lines.append(f"crawl_request_duration_seconds_bucket{self._labels(kind=kind, le=bound)} {n}")
+            lines.append(f"crawl_request_duration_seconds_bucket{self._labels(kind=kind, le='+Inf')} "
+                         f"{self.latency_count[kind]}")
+            lines.append(f"crawl_request_duration_seconds_sum{self._labels(kind=kind)} {self.latency_sum[kind]:.6f}")
+            lines.append(f"crawl_request_duration_seconds_count{self._labels(kind=kind)} {self.latency_count[kind]}")
+
+        lines += ["# HELP crawl_bytes_total Byte nhận qua mạng (trước giải nén)", "# TYPE crawl_bytes_total counter"]
+        for kind, n in sorted(self.bytes.items()):
+            lines.append(f"crawl_bytes_total{self._labels(kind=kind)} {n}")
+
+        gauges = [
+            ("crawl_pages_total", "Số trang crawl xong", s["pages"]),
+            ("crawl_listings_total", "Số tin ghi ra", s["listings"]),
+            ("crawl_pages_per_second", "Tốc độ trang/giây của lần chạy", s["pages_per_s"]),
+            ("crawl_listings_per_second", "Tốc độ tin/giây của lần chạy", s["listings_per_s"]),
+            ("crawl_sleep_seconds_total", "Thời gian nghỉ chủ động (rate limiter, giãn nhịp giữa trang)", s["sleep_s"]),
+            ("crawl_backoff_seconds_total", "Tổng thời gian backoff trước khi thử lại, cộng theo request",
+             s["backoff_s"]),
+            ("crawl_duration_seconds", "Thời gian chạy", s["duration_s"]),
+            ("crawl_last_run_timestamp_seconds", "Thời điểm kết thúc lần chạy", int(time.time())),
+        ]
+        for name, help_text, value in gauges:
+            lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge", f"{name}{self._labels()} {value}"]
+        return "\n".join(lines) + "\n"
+
+    def export(self, metrics_dir=METRICS_DIR):
+        """Ghi textfile Prometheus (ghi đè, atomic) + JSON tóm tắt của lần chạy. Trả về đường dẫn JSON."""
+        os.makedirs(metrics_dir, exist_ok=True)
+        suffix = f"_{self.instance}" if self.instance is not None else ""
+
+        prom_path = os.path.join(metrics_dir, f"crawl_{self.source}{suffix}.prom")
+        with open(prom_path + ".tmp", "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+        os.replace(prom_path + ".tmp", prom_path)
+
+        summary = self.summary()
+        json_path = os.path.join(metrics_dir, f"{self.source}_{self.started_at.strftime('%d%m%Y_%H%M%S')}{suffix}.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+
+        print(f" [metrics] {summary['pages']} trang ({summary['pages_per_s']:.2f}/s), "
+              f"{summary['listings']} tin ({summary['listings_per_s']:.2f}/s), "
+              f"{summary['bytes'] / 1e6:.1f} MB, lỗi/timeout/chặn = {summary['requests']['error']}/"
+              f"{summary['requests']['timeout']}/{summary['requests']['blocked']}, nghỉ {summary['sleep_s']:.0f}s "
+              f"→ {json_path}")
+        return json_path
@@ -0,0 +1,246 @@
+import argparse
+import asyncio
+import json
+import os
+import socket
+import sqlite3
+from datetime import datetime, timedelta
+
+import pymysql
+
+# Cấu hình kết nối database control (bảng hàng đợi nằm cạnh process_log)
+CONTROL_DB_CONFIG = {
+    'host': '146.190.93.160',
+    'user': 'root',
+    'password': '123456',
+    'port': 3308,
+    'database': 'control',
+    'charset': 'utf8mb4'
+}
+
+QUEUE_TABLE_NAME = 'crawl_task'
+LEASE_SECONDS = 300     # Hết hạn lease mà không heartbeat → task được node khác nhận lại
+MAX_ATTEMPTS = 3        # Số lần nhận tối đa trước khi đánh dấu failed
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+MYSQL_DDL = f"""
+CREATE TABLE IF NOT EXISTS {QUEUE_TABLE_NAME} (
+    id INT AUTO_INCREMENT PRIMARY KEY,
+    crawl_date VARCHAR(8) NOT NULL,
+    source VARCHAR(32) NOT NULL,
+    task_key VARCHAR(255) NOT NULL,
+    payload TEXT,
+    status VARCHAR(16) NOT NULL DEFAULT 'pending',
+    attempts INT NOT NULL DEFAULT 0,
+    max_attempts INT NOT NULL DEFAULT {MAX_ATTEMPTS},
+    lease_owner VARCHAR(128),
+    lease_expires_at DATETIME,
+    heartbeat_at DATETIME,
+    last_error TEXT,
+    created_at DATETIME NOT NULL,
+    updated_at DATETIME NOT NULL,
+    UNIQUE KEY uq_task (crawl_date, source, task_key),
+    KEY idx_claim (crawl_date, source, status, lease_expires_at)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci
+"""
+
+SQLITE_DDL = f"""
+CREATE TABLE IF NOT EXISTS {QUEUE_TABLE_NAME} (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    crawl_date TEXT NOT NULL,
+    source TEXT NOT NULL,
+    task_key TEXT NOT NULL,
+    payload TEXT,
+    status TEXT NOT NULL DEFAULT 'pending',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT {MAX_ATTEMPTS},
+    lease_owner TEXT,
+    lease_expires_at TEXT,
+    heartbeat_at TEXT,
+    last_error TEXT,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL,
+    UNIQUE (crawl_date, source, task_key)
+)
+"""
+
+
+def connect_queue(db="mysql"):
+    """db="mysql" → DB control thật; đường dẫn file → SQLite thay thế (chạy thử trên máy cá nhân)."""
+    if db == "mysql":
+        return pymysql.connect(**CONTROL_DB_CONFIG, autocommit=True)
+    return sqlite3.connect(db, timeout=30, isolation_level=None)
+
+
+def default_owner():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _now(offset_s=0):
+    return (datetime.now() + timedelta(seconds=offset_s)).strftime(TIME_FORMAT)
+
+
+class CrawlQueue:
+    """
+    Hàng đợi task crawl (trang/shard) dùng chung cho nhiều máy, lưu trong bảng crawl_task.
+    Node nhận task bằng UPDATE có điều kiện (chỉ 1 node thắng), giữ lease bằng heartbeat;
+    lease hết hạn thì node khác nhận lại, quá max_attempts thì task chuyển failed.
+    """
+
+    def __init__(self, conn, owner=None, lease_seconds=LEASE_SECONDS):
+        self.conn = conn
+        self.owner = owner or default_owner()
+        self.lease_seconds = lease_seconds
+        self.is_sqlite = isinstance(conn, sqlite3.Connection)
+        self.ensure_table()
+
+    def _execute(self, sql, params=()):
+        """Chạy SQL viết theo paramstyle %s của pymysql, tự đổi sang ? khi dùng SQLite."""
+        cursor = self.conn.cursor()
+        cursor.execute(sql.replace("%s", "?") if self.is_sqlite else sql, params)
+        return cursor
+
+    def ensure_table(self):
+        self._execute(SQLITE_DDL if self.is_sqlite else MYSQL_DDL)
+
+    def enqueue(self, crawl_date, source, tasks, max_attempts=MAX_ATTEMPTS):
+        """Thêm các task (task_key, payload dict). Task đã có trong ngày thì bỏ qua → mọi node enqueue đều được."""
+        insert = "INSERT OR IGNORE" if self.is_sqlite else "INSERT IGNORE"
+        added = 0
+        for task_key, payload in tasks:
+            now = _now()
+            cursor = self._execute(
+                f"{insert} INTO {QUEUE_TABLE_NAME} "
+                "(crawl_date, source, task_key, payload, max_attempts, created_at, updated_at) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s)",
+                (crawl_date, source, task_key, json.dumps(payload, ensure_ascii=False), max_attempts, now, now)
+            )
+            added += cursor.rowcount
+        return added
+
+    def claim(self, crawl_date, source):
+        """Nhận 1 task đang chờ hoặc có lease đã hết hạn. Trả về dict task hoặc None khi không còn gì để làm."""
+        self.expire_exhausted(crawl_date, source)
+        while True:
+            now = _now()
+            row = self._execute(
+                f"SELECT id, task_key, payload, attempts FROM {QUEUE_TABLE_NAME} "
+                "WHERE crawl_date = %s AND source = %s AND attempts < max_attempts "
+                "AND (status = 'pending' OR (status = 'leased' AND lease_expires_at < %s)) "
+                "ORDER BY attempts, id LIMIT 1",
+                (crawl_date, source, now)
+            ).fetchone()
+            if row is None:
+                return None
+
+            task_id, task_key, payload, attempts = row
+            # Chỉ 1 node cập nhật được (điều kiện giống lúc SELECT) → không nhận trùng task
+            cursor = self._execute(
+                f"UPDATE {QUEUE_TABLE_NAME} SET status = 'leased', lease_owner = %s, attempts = attempts + 1, "
+                "lease_expires_at = %s, heartbeat_at = %s, updated_at = %s "
+                "WHERE id = %s AND attempts = %s "
+                "AND (status = 'pending' OR (status = 'leased' AND lease_expires_at < %s))",
+                (self.owner, _now(self.lease_seconds), now, now, task_id, attempts, now)
+            )
+            if cursor.rowcount == 1:
+                return {"id": task_id, "task_key": task_key, "payload": json.loads(payload or "null"),
+                        "attempts": attempts + 1}
+            # Node khác vừa nhận mất → thử task kế tiếp
+
+    def expire_exhausted(self, crawl_date, source):
+        """Lease hết hạn mà đã dùng hết lượt thử (node chết giữa chừng nhiều lần) → failed."""
+        now = _now()
+        self._execute(
+            f"UPDATE {QUEUE_TABLE_NAME} SET status = 'failed', last_error = 'lease hết hạn', updated_at = %s "
+            "WHERE crawl_date = %s AND source = %s AND status = 'leased' "
+            "AND attempts >= max_attempts AND lease_expires_at < %s",
+            (now, crawl_date, source, now)
+        )
+
+    def heartbeat(self, task_id):
+        """Gia hạn lease. Trả False nếu lease đã mất (hết hạn và node khác đã nhận lại)."""
+        now = _now()
+        cursor = self._execute(
+            f"UPDATE {QUEUE_TABLE_NAME} SET lease_expires_at = %s, heartbeat_at = %s, updated_at = %s "
+            "WHERE id = %s AND lease_owner = %s AND status = 'leased'",
+            (_now(self.lease_seconds), now, now, task_id, self.owner)
+        )
+        return cursor.rowcount == 1
+
+    def complete(self, task_id):
+        self._execute(
+            f"UPDATE {QUEUE_TABLE_NAME} SET status = 'done', lease_expires_at = NULL, updated_at = %s "
+            "WHERE id = %s AND lease_owner = %s",
+            (_now(), task_id, self.owner)
+        )
+
+    def fail(self, task_id, error):
+        """Trả task về hàng đợi để thử lại, hoặc đánh dấu failed khi đã dùng hết lượt."""
+        self._execute(
+            f"UPDATE {QUEUE_TABLE_NAME} SET "
+            "status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'pending' END, "
+            "lease_expires_at = NULL, last_error = %s, updated_at = %s "
+            "WHERE id = %s AND lease_owner = %s",
+            (str(error)[:1000], _now(), task_id, self.owner)
+        )
+
+    async def run_task(self, task, coro):
+        """Chạy coroutine của task, heartbeat định kỳ trong lúc chạy; xong thì complete, lỗi thì fail."""
+        async def keep_alive():
+            while True:
+                await asyncio.sleep(self.lease_seconds / 3)
+                if not self.heartbeat(task["id"]):
+                    print(f" [queue] Mất lease task {task['task_key']}")
+                    return
+
+        beat = asyncio.create_task(keep_alive())
+        try:
+            await coro
+            self.complete(task["id"])
+            return True
+        except Exception as e:
+            print(f" [queue] Task {task['task_key']} lỗi lần {task['attempts']}: {e}")
+            self.fail(task["id"], e)
+            return False
+        finally:
+            beat.cancel()
+
+    def stats(self, crawl_date, source):
+        rows = self._execute(
+            f"SELECT status, COUNT(*) FROM {QUEUE_TABLE_NAME} WHERE crawl_date = %s AND source = %s GROUP BY status",
+            (crawl_date, source)
+        ).fetchall()
+        return {status: count for status, count in rows}
+
+    def is_drained(self, crawl_date, source):
+        """Hết task chờ/đang chạy (mọi task đã done hoặc failed) → node nào thấy trước thì gộp output."""
+        self.expire_exhausted(crawl_date, source)
+        stats = self.stats(crawl_date, source)
+        return stats.get("pending", 0) == 0 and stats.get("leased", 0) == 0
+
+    def reset_failed(self, crawl_date, source):
+        cursor = self._execute(
+            f"UPDATE {QUEUE_TABLE_NAME} SET status = 'pending', attempts = 0, updated_at = %s "
+            "WHERE crawl_date = %s AND source = %s AND status = 'failed'",
+            (_now(), crawl_date, source)
+        )
+        return cursor.rowcount
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Xem/quản lý hàng đợi crawl trong DB control")
+    parser.add_argument("--db", type=str, default="mysql", help='"mysql" hoặc đường dẫn file SQLite thay thế')
+    parser.add_argument("--source", type=str, required=True, choices=["bds", "chotot"])
+    parser.add_argument("--date", type=str, default=datetime.now().strftime('%d%m%Y'), help="Ngày crawl (ddmmyyyy)")
+    parser.add_argument("--reset-failed", action="store_true", help="Đưa các task failed về pending")
+    args = parser.parse_args()
+
+    queue = CrawlQueue(connect_queue(args.db))
+    if args.reset_failed:
+        print(f"Đã đưa {queue.reset_failed(args.date, args.source)} task failed về pending")
+    print(f"Hàng đợi {args.source} ngày {args.date}: {queue.stats(args.date, args.source)}")
+    queue.close()
@@ -0,0 +1,145 @@
+import csv
+import json
+import os
+
+
+class CsvSink:
+    """
+    Ghi CSV theo kiểu stream: header cố định, mỗi lần write_rows là flush xuống đĩa ngay.
+    mode="a" để ghi tiếp vào file đã có (chỉ ghi header nếu file mới/rỗng).
+    """
+
+    def __init__(self, path, fieldnames, mode="w"):
+        self.path = path
+        self.count = 0
+        has_data = mode == "a" and os.path.exists(path) and os.path.getsize(path) > 0
+        self.file = open(path, mode, newline="", encoding="utf-8-sig")
+        self.writer = csv.DictWriter(self.file, fieldnames=fieldnames, lineterminator="\n")
+        if not has_data:
+            self.writer.writeheader()
+            self.file.flush()
+
+    def write_rows(self, rows):
+        rows = list(rows)
+        self.writer.writerows(rows)
+        self.file.flush()
+        self.count += len(rows)
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class JsonlSink:
+    """
+    Ghi từng item ra file JSONL trung gian (mỗi dòng 1 dict) cho dữ liệu có cột động như bds.py.
+    Khi crawl xong gọi jsonl_to_csv() để dựng CSV với header = hợp của tất cả các key.
+    """
+
+    def __init__(self, path, mode="w"):
+        self.path = path
+        self.count = 0
+        needs_newline = False
+        if mode == "a" and os.path.exists(path) and os.path.getsize(path) > 0:
+            # Lần chạy trước crash giữa 1 dòng → xuống dòng để dòng mới không dính vào dòng hỏng
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self.file = open(path, mode, encoding="utf-8")
+        if needs_newline:
+            self.file.write("\n")
+
+    def write(self, item):
+        self.file.write(json.dumps(item, ensure_ascii=False) + "\n")
+        self.file.flush()
+        self.count += 1
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_jsonl(path):
+    """Đọc lần lượt từng dict trong file JSONL (bỏ qua dòng cuối bị ghi dở nếu crash)."""
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                print(f" Bỏ qua dòng JSONL hỏng trong {path}")
+
+
+def jsonl_to_csv(jsonl_paths, csv_path, leading_columns=(), dedupe_key=None):
+    """
+    Chuyển JSONL → CSV qua 2 lượt đọc stream: lượt 1 gom tập cột, lượt 2 ghi dòng.
+    Bộ nhớ chỉ tốn cho tập tên cột, không phụ thuộc số dòng.
+    jsonl_paths có thể là 1 file hoặc danh sách file (partition của nhiều process) → gộp chung 1 CSV.
+    dedupe_key (vd "Link"): chỉ giữ dòng đầu tiên của mỗi giá trị, khi các partition có thể ghi trùng tin
+    (task bị nhận lại sau khi hết lease) — lúc đó tốn thêm bộ nhớ cho tập key đã gặp.
+    """
+    if isinstance(jsonl_paths, str):
+        jsonl_paths = [jsonl_paths]
+    all_columns = set()
+    for jsonl_path in jsonl_paths:
+        for item in iter_jsonl(jsonl_path):
+            all_columns.update(item.keys())
+    all_columns.difference_update(leading_columns)
+    columns = list(leading_columns) + sorted(all_columns)
+
+    count = 0
+    seen_keys = set()
+    tmp_path = csv_path + ".tmp"
+    with CsvSink(tmp_path, columns) as sink:
+        for jsonl_path in jsonl_paths:
+            for item in iter_jsonl(jsonl_path):
+                if dedupe_key is not None and item.get(dedupe_key):
+                    if item[dedupe_key] in seen_keys:
+                        continue
+                    seen_keys.add(item[dedupe_key])
+                sink.writer.writerow(item)
+                count += 1
+        sink.count = count
+    os.replace(tmp_path, csv_path)
+    return count
+
+
+def merge_csv(part_paths, csv_path, fieldnames):
+    """Gộp nhiều file CSV cùng header (partition theo shard) thành 1 file, đọc/ghi stream."""
+    count = 0
+    tmp_path = csv_path + ".tmp"
+    with CsvSink(tmp_path, fieldnames) as sink:
+        for part in part_paths:
+            with open(part, newline="", encoding="utf-8-sig") as f:
+                for row in csv.DictReader(f):
+                    sink.writer.writerow(row)
+                    count += 1
+        sink.count = count
+    os.replace(tmp_path, csv_path)
+    return count
+
+
+def merge_jsonl(part_paths, jsonl_path):
+    """Nối nhiều file JSONL (partition theo shard) thành 1 file, bỏ các dòng ghi dở."""
+    count = 0
+    tmp_path = jsonl_path + ".tmp"
+    with JsonlSink(tmp_path) as sink:
+        for part in part_paths:
+            for item in iter_jsonl(part):
+                sink.write(item)
+        count = sink.count
+    os.replace(tmp_path, jsonl_path)
+    return count
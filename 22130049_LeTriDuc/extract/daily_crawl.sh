@@ -31,6 +31,9 @@ python ChoTot.py >> "$LOG_FILE" 2>&1 || echo "Lỗi ChoTot.py" >> "$LOG_FILE"
 echo "Xóa file CSV cũ..." >> "$LOG_FILE"
 find "$DATA_DIR" -name "bds_*.csv" -mtime +1 -delete 2>> "$LOG_FILE" || echo "Lỗi xóa bds csv" >> "$LOG_FILE"
 find "$DATA_DIR" -name "chotot_*.csv" -mtime +1 -delete 2>> "$LOG_FILE" || echo "Lỗi xóa chotot csv" >> "$LOG_FILE"
+find "$DATA_DIR" -maxdepth 1 \( -name "chotot_*.jsonl" -o -name "chotot_*.schema.json" \) -mtime +1 -delete 2>> "$LOG_FILE" || echo "Lỗi xóa chotot jsonl" >> "$LOG_FILE"
+find "$DATA_DIR" -maxdepth 1 -type d -name "chotot_parts_*" -mtime +1 -exec rm -rf {} + 2>> "$LOG_FILE" || echo "Lỗi xóa partition chotot" >> "$LOG_FILE"
+find "$DATA_DIR" -maxdepth 1 -type d \( -name "bds_parts_*" -o -name "bds_queue_*" \) -mtime +1 -exec rm -rf {} + 2>> "$LOG_FILE" || echo "Lỗi xóa partition bds" >> "$LOG_FILE"
 
 # Chain: Chạy load ngay sau crawl nếu thành công
 if [ $? -eq 0 ]; then  # $? kiểm tra exit code của lệnh trước (crawl)
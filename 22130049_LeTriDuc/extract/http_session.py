@@ -0,0 +1,44 @@
+import random
+
+import requests
+from requests.adapters import HTTPAdapter
+
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/129.0.0.0 Safari/537.36 Edg/129.0.0.0"
+
+# Status code đáng để thử lại (quá tải / lỗi tạm thời phía server)
+RETRY_STATUS = {429, 500, 502, 503, 504}
+MAX_RETRIES = 5
+BACKOFF_BASE = 0.5      # giây
+BACKOFF_MAX = 30.0      # giây
+
+
+def create_session(pool_size=10):
+    """Tạo requests.Session dùng chung: giữ kết nối keep-alive, pool theo số luồng, nhận gzip."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({
+        "User-Agent": USER_AGENT,
+        "Accept": "application/json, text/html;q=0.9, */*;q=0.8",
+        "Accept-Encoding": "gzip, deflate",
+        "Connection": "keep-alive",
+    })
+    return session
+
+
+def backoff_delay(attempt, retry_after=None):
+    """Thời gian chờ trước lần thử thứ `attempt` (0, 1, 2...): exponential + full jitter."""
+    if retry_after is not None:
+        return min(BACKOFF_MAX, retry_after)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2 ** attempt)))
+
+
+def parse_retry_after(res):
+    """Đọc header Retry-After (giây), trả None nếu không có hoặc không hợp lệ."""
+    value = res.headers.get("Retry-After")
+    try:
+        return float(value) if value is not None else None
+    except ValueError:
+        return None
+
@@ -1,10 +1,18 @@
+import argparse
+import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import get_context
 import pandas as pd
 import pymysql
 import glob
 import os
 import re
+import sys
 from datetime import datetime
 
+from crawl_sink import iter_jsonl
+from record_schema import SQL_TYPES, load_schema
+
 # Cấu hình kết nối database staging
 STAGING_DB_CONFIG = {
     'host': '146.190.93.160',
@@ -28,6 +36,54 @@ CONTROL_DB_CONFIG = {
 # Tên table trong database
 BDS_TABLE_NAME = 'bds_raw'
 CHOTOT_TABLE_NAME = 'chotot_raw'
+CHOTOT_TYPED_TABLE_NAME = 'chotot_typed'
+BDS_DOC_TABLE_NAME = 'bds_doc'
+CHOTOT_DOC_TABLE_NAME = 'chotot_doc'
+TYPED_BATCH_SIZE = 1000
+INSERT_BATCH_SIZE = 5000    # Số dòng CSV đọc mỗi chunk = số dòng mỗi lần executemany
+
+# Cách đưa CSV vào bảng raw:
+#   auto   - LOAD DATA LOCAL INFILE nếu server bật local_infile, không thì INSERT theo lô
+#   infile - bắt buộc LOAD DATA LOCAL INFILE (lỗi nếu server tắt)
+#   insert - luôn INSERT theo lô (executemany)
+LOAD_MODE = 'auto'
+LOAD_MODES = ('auto', 'infile', 'insert')
+
+# Staging dạng document: mỗi dòng CSV là 1 JSON {tên cột header: giá trị}, không phụ thuộc thứ tự/số cột.
+# Key hay lọc/join được tách ra cột sinh tự động (VIRTUAL) có index: (tên cột, key trong header, kiểu, độ dài)
+BDS_HOT_KEYS = [
+    ('link', 'Link', 'VARCHAR', 768),
+    ('price_raw', 'Khoảng giá', 'VARCHAR', 64),
+    ('area_raw', 'Diện tích', 'VARCHAR', 64),
+]
+CHOTOT_HOT_KEYS = [
+    ('title', 'title', 'VARCHAR', 512),
+    ('province', 'province', 'VARCHAR', 64),
+    ('price_vnd', 'price_VND', 'VARCHAR', 32),
+]
+
+# Bố cục bảng staging: fields (field1..fieldN theo vị trí → bds_raw/chotot_raw, dùng LOAD DATA/INSERT theo lô)
+# hoặc doc (JSON theo header → bds_doc/chotot_doc). Mỗi nguồn có bố cục riêng trong SOURCES, --layout chỉ để
+# ép tạm cả đợt load. Transform đọc bảng nào được load gần nhất nên đổi bố cục không cần dọn bảng còn lại.
+LAYOUTS = ('fields', 'doc')
+
+# Nguồn staging: bảng raw, source_id/process_code trong process_log, bố cục mặc định của nguồn:
+#   bds    - doc: header động (hợp các thuộc tính của mọi tin) nên fieldN theo vị trí lệch cột giữa các ngày
+#   chotot - fields: header cố định, chỉ thêm cột ở cuối → giữ đường LOAD DATA nhanh
+SOURCES = [
+    {'name': 'bds', 'table': BDS_TABLE_NAME, 'source_id': 1, 'process_code': 'P1',
+     'process_name': 'load bds staging', 'allow_extend': False, 'layout': 'doc',
+     'doc_table': BDS_DOC_TABLE_NAME, 'hot_keys': BDS_HOT_KEYS},
+    {'name': 'chotot', 'table': CHOTOT_TABLE_NAME, 'source_id': 2, 'process_code': 'P2',
+     'process_name': 'load chotot staging', 'allow_extend': True, 'layout': 'fields',
+     'typed_table': CHOTOT_TYPED_TABLE_NAME, 'doc_table': CHOTOT_DOC_TABLE_NAME, 'hot_keys': CHOTOT_HOT_KEYS},
+]
+
+BACKFILL_WORKERS = 4    # Số process load song song khi backfill
+
+# Load vào bảng shadow <bảng>__new rồi RENAME TABLE đổi chỗ; bản trước giữ ở <bảng>__old để rollback
+SHADOW_SUFFIX = '__new'
+OLD_SUFFIX = '__old'
 
 
 def log_process(cursor, source_id, process_code, process_name, status, started_at=None):
@@ -53,8 +109,28 @@ def get_today_csv(pattern):
     return None
 
 
-def create_table_if_not_exists(cursor, table_name, num_fields):
-    """Tạo table nếu chưa tồn tại. Nếu đã tồn tại thì không drop mà giữ nguyên schema."""
+def find_csv_files(pattern, start, end):
+    """Các file ../data/pattern_ddmmyyyy.csv có ngày trong [start, end], trả về [(ngày, đường dẫn)] theo ngày."""
+    found = []
+    for csv_file in glob.glob(f'../data/{pattern}_*.csv'):
+        match = re.search(r'_(\d{8})\.csv$', csv_file)
+        if not match:
+            continue
+        try:
+            day = datetime.strptime(match.group(1), '%d%m%Y')
+        except ValueError:
+            continue
+        if start <= day <= end:
+            found.append((day, csv_file))
+    return sorted(found)
+
+
+def create_table_if_not_exists(cursor, table_name, num_fields, allow_extend=False):
+    """
+    Tạo table nếu chưa tồn tại. Nếu đã tồn tại thì không drop mà giữ nguyên schema.
+    allow_extend=True (nguồn chỉ thêm cột ở cuối, vd ChoTot bật --enrich): CSV nhiều cột hơn thì
+    ALTER TABLE thêm fieldN ở cuối, ít cột hơn thì các field dư để NULL.
+    """
     cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
     exists = cursor.fetchone()
 
@@ -65,7 +141,13 @@ def create_table_if_not_exists(cursor, table_name, num_fields):
         cursor.execute(f"SHOW COLUMNS FROM {table_name}")
         current_columns = [col[0] for col in cursor.fetchall() if col[0].startswith("field")]
 
-        if len(current_columns) != num_fields:
+        if allow_extend and len(current_columns) < num_fields:
+            add_defs = ', '.join([f'ADD COLUMN field{i + 1} TEXT' for i in range(len(current_columns), num_fields)])
+            cursor.execute(f"ALTER TABLE {table_name} {add_defs}")
+            print(f"Đã thêm field{len(current_columns) + 1}..field{num_fields} vào {table_name}")
+        elif allow_extend and len(current_columns) > num_fields:
+            print(f"CSV có {num_fields} cột, bảng có {len(current_columns)} cột — các field dư để NULL.")
+        elif len(current_columns) != num_fields:
             raise Exception(
                 f"Schema mismatch: CSV có {num_fields} cột nhưng bảng có {len(current_columns)} cột. "
                 f"Bạn cần ALTER TABLE thủ công hoặc xóa bảng một lần."
@@ -88,112 +170,465 @@ def create_table_if_not_exists(cursor, table_name, num_fields):
 
 
 
-def load_csv_to_db(csv_file, table_name):
-    """Đọc CSV và load vào database"""
-    # Đọc CSV, tất cả cột là string (text)
-    df = pd.read_csv(csv_file, dtype=str, keep_default_na=False, na_values='')
-    num_fields = len(df.columns)
+def read_csv_header(csv_file):
+    """Chỉ đọc dòng header để biết số cột (tạo/kiểm tra bảng trước khi stream dữ liệu). CsvSink ghi kèm BOM."""
+    return list(pd.read_csv(csv_file, dtype=str, nrows=0, encoding='utf-8-sig').columns)
+
+
+def iter_csv_batches(csv_file, batch_size=INSERT_BATCH_SIZE):
+    """
+    Đọc CSV theo từng chunk, mỗi chunk thành 1 lô tuple lấy thẳng từ mảng các cột (zip),
+    không iterrows / dict từng dòng → RAM chỉ cỡ 1 chunk dù file lớn. Ô trống giữ là chuỗi rỗng.
+    """
+    for chunk in pd.read_csv(csv_file, dtype=str, keep_default_na=False, chunksize=batch_size):
+        chunk = chunk.fillna('')  # dòng thiếu cột cuối
+        yield list(zip(*[chunk.iloc[:, i].tolist() for i in range(chunk.shape[1])]))
+
+
+def insert_batches(cursor, table_name, num_fields, batches):
+    """executemany từng lô vào field1..fieldN, trả về tổng số dòng."""
+    insert_sql = f"""
+    INSERT INTO {table_name} ({', '.join([f'field{i + 1}' for i in range(num_fields)])})
+    VALUES ({', '.join(['%s'] * num_fields)})
+    """
+    total = 0
+    for batch in batches:
+        cursor.executemany(insert_sql, batch)
+        total += len(batch)
+    return total
+
+
+def detect_line_terminator(csv_file):
+    """Kết thúc dòng của file: CsvSink ghi LF, file cũ ghi từ pandas trên Windows có thể là CRLF."""
+    with open(csv_file, 'rb') as f:
+        head = f.read(65536)
+    end = head.find(b'\n')
+    return '\r\n' if end > 0 and head[end - 1:end] == b'\r' else '\n'
+
+
+def local_infile_enabled(cursor):
+    cursor.execute("SHOW VARIABLES LIKE 'local_infile'")
+    row = cursor.fetchone()
+    return row is not None and str(row[1]).upper() in ('ON', '1')
+
+
+def load_data_infile(cursor, csv_file, table_name, num_fields):
+    """
+    Đẩy thẳng file CSV vào field1..fieldN bằng LOAD DATA LOCAL INFILE (bulk loader của server).
+    Định dạng khớp csv.writer: phân cách ',', ô có ký tự đặc biệt bọc '"' (nháy kép bên trong viết "").
+    ESCAPED BY '' để không coi dấu gạch ngược là ký tự escape → ô trống vào bảng là chuỗi rỗng giống đường INSERT.
+    Đọc vào biến @vN rồi SET fieldN = COALESCE(@vN, ''): dòng thiếu cột cuối cũng ra '' như đường INSERT, không ra NULL.
+    """
+    terminator = detect_line_terminator(csv_file)
+    variables = ', '.join([f'@v{i + 1}' for i in range(num_fields)])
+    assignments = ', '.join([f"field{i + 1} = COALESCE(@v{i + 1}, '')" for i in range(num_fields)])
+    cursor.execute(f"""
+    LOAD DATA LOCAL INFILE %s INTO TABLE {table_name}
+    CHARACTER SET utf8mb4
+    FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+    LINES TERMINATED BY %s
+    IGNORE 1 LINES
+    ({variables})
+    SET {assignments}
+    """, (os.path.abspath(csv_file), terminator))
+    total = cursor.rowcount
+
+    cursor.execute("SHOW COUNT(*) WARNINGS")
+    warnings = cursor.fetchone()[0]
+    if warnings:
+        cursor.execute("SHOW WARNINGS LIMIT 3")
+        print(f"LOAD DATA {table_name}: {warnings} cảnh báo, vd: {[w[2] for w in cursor.fetchall()]}")
+    return total
+
+
+def prepare_shadow_table(cursor, table_name):
+    """Bảng shadow rỗng cùng cấu trúc bảng thật; transform/dashboard vẫn đọc bảng thật trong lúc load."""
+    shadow = table_name + SHADOW_SUFFIX
+    cursor.execute(f"DROP TABLE IF EXISTS {shadow}")
+    cursor.execute(f"CREATE TABLE {shadow} LIKE {table_name}")
+    return shadow
+
+
+def table_exists(cursor, table_name):
+    cursor.execute(f"SHOW TABLES LIKE '{table_name}'")
+    return cursor.fetchone() is not None
+
+
+def swap_in_shadow(cursor, table_name, keep_old=True):
+    """
+    1 lệnh RENAME TABLE (atomic): bảng thật → __old, shadow → bảng thật. Không lúc nào bảng rỗng/dở dang.
+    keep_old=False khi bảng thật vừa được tạo rỗng ở lần load này (vd bảng theo ngày của backfill): __old
+    rỗng không phải bản trước nào nên bỏ luôn, --rollback sẽ báo không có bản trước.
+    """
+    old = table_name + OLD_SUFFIX
+    cursor.execute(f"DROP TABLE IF EXISTS {old}")
+    cursor.execute(f"RENAME TABLE {table_name} TO {old}, {table_name}{SHADOW_SUFFIX} TO {table_name}")
+    if keep_old:
+        print(f"Đã đổi {table_name} sang bản mới (bản trước giữ ở {old})")
+    else:
+        cursor.execute(f"DROP TABLE {old}")
+        print(f"Đã đổi {table_name} sang bản mới (bảng mới, không có bản trước)")
+
 
-    # Kết nối DB
+def drop_shadow_table(cursor, table_name):
+    cursor.execute(f"DROP TABLE IF EXISTS {table_name}{SHADOW_SUFFIX}")
+
+
+def discard_shadow(connection, table_name):
+    """
+    Load lỗi: bảng thật chưa bị đụng tới, chỉ bỏ shadow dở dang. Kết nối có thể đã chết (chính là lý do lỗi)
+    nên dọn dẹp lỗi thì chỉ in ra — __new sót lại sẽ bị DROP ở lần prepare_shadow_table sau.
+    """
+    try:
+        connection.rollback()
+        with connection.cursor() as cursor:
+            drop_shadow_table(cursor, table_name)
+    except Exception as e:
+        print(f"Không dọn được {table_name}{SHADOW_SUFFIX}: {e}")
+
+
+def rollback_table(table_name):
+    """Đổi bản trước (__old) về lại bảng thật; bản vừa bị thay ra nằm ở __old nên chạy lại là quay về."""
+    old = table_name + OLD_SUFFIX
     connection = pymysql.connect(**STAGING_DB_CONFIG)
     try:
         with connection.cursor() as cursor:
-            # Tạo/DROP table để khớp num_fields
-            create_table_if_not_exists(cursor, table_name, num_fields)
-            # Xóa dữ liệu cũ
-            cursor.execute(f"TRUNCATE TABLE {table_name}")
-            print(f"Đã TRUNCATE TABLE {table_name}")
-
-            # Chuẩn bị dữ liệu: Chuyển df thành list of dicts với key 'field1', 'field2', ...
-            data_to_insert = []
-            for _, row in df.iterrows():
-                row_dict = {f'field{i + 1}': str(val) if pd.notna(val) else '' for i, val in enumerate(row)}
-                data_to_insert.append(row_dict)
-
-            # Insert từng row (vì cột động, dùng executemany với placeholders)
-            placeholders = ', '.join(['%s'] * num_fields)
-            insert_sql = f"""
-            INSERT INTO {table_name} ({', '.join([f'field{i + 1}' for i in range(num_fields)])})
-            VALUES ({placeholders})
-            """
-            field_names = [f'field{i + 1}' for i in range(num_fields)]
-            values = [tuple(row_dict[field] for field in field_names) for row_dict in data_to_insert]
-
-            cursor.executemany(insert_sql, values)
+            cursor.execute(f"SHOW TABLES LIKE '{old}'")
+            if not cursor.fetchone():
+                print(f"Không có bản trước {old} để rollback")
+                return False
+            swap = table_name + '__swap'
+            cursor.execute(f"RENAME TABLE {table_name} TO {swap}, {old} TO {table_name}, {swap} TO {old}")
+            print(f"Đã rollback {table_name} về bản trước")
+            return True
+    finally:
+        connection.close()
+
+
+def load_csv_to_db(csv_file, table_name, allow_extend=False, mode=LOAD_MODE):
+    """
+    Load CSV vào bảng shadow rồi đổi chỗ atomic với bảng thật (không TRUNCATE bảng đang được đọc).
+    Ghi bằng LOAD DATA LOCAL INFILE khi được phép, không thì đọc theo chunk + INSERT theo lô.
+    """
+    num_fields = len(read_csv_header(csv_file))
+
+    # Kết nối DB (client phải bật local_infile thì server mới nhận LOAD DATA LOCAL)
+    connection = pymysql.connect(**STAGING_DB_CONFIG, local_infile=mode != 'insert')
+    try:
+        with connection.cursor() as cursor:
+            # Tạo table / kiểm tra num_fields trên bảng thật, shadow copy cấu trúc từ đó
+            existed = create_table_if_not_exists(cursor, table_name, num_fields, allow_extend)
+            shadow = prepare_shadow_table(cursor, table_name)
+
+            total = None
+            if mode != 'insert':
+                if local_infile_enabled(cursor):
+                    try:
+                        total = load_data_infile(cursor, csv_file, shadow, num_fields)
+                        print(f"Đã LOAD DATA {total} rows vào table {shadow}")
+                    except (pymysql.err.OperationalError, pymysql.err.InternalError) as e:
+                        if mode == 'infile':
+                            raise
+                        print(f"LOAD DATA lỗi ({e}) → chuyển sang INSERT theo lô")
+                        cursor.execute(f"TRUNCATE TABLE {shadow}")
+                elif mode == 'infile':
+                    raise Exception("Server tắt local_infile, không dùng được LOAD DATA LOCAL INFILE")
+                else:
+                    print("Server tắt local_infile → INSERT theo lô")
+
+            if total is None:
+                total = insert_batches(cursor, shadow, num_fields, iter_csv_batches(csv_file))
+                print(f"Đã insert {total} rows vào table {shadow}")
             connection.commit()
-            print(f"Đã insert {len(values)} rows vào table {table_name}")
+            swap_in_shadow(cursor, table_name, keep_old=existed)
             return True  # Thành công
 
     except Exception as e:
         print(f"Lỗi khi load {table_name}: {e}")
-        if 'connection' in locals():
-            connection.rollback()
+        discard_shadow(connection, table_name)
         return False  # Thất bại
     finally:
-        if 'connection' in locals():
-            connection.close()
+        connection.close()
 
 
-if __name__ == "__main__":
-    # Kết nối DB control để ghi log
-    control_connection = None
+def json_path(key):
+    """Đường dẫn JSON tới 1 key header (key có dấu cách, dấu phẩy, tiếng Việt nên luôn đặt trong nháy kép)."""
+    return '$.' + json.dumps(key, ensure_ascii=False)
+
+
+def hot_column_def(name, key, col_type, length):
+    # LEFT(...) để giá trị dài bất thường không làm lỗi INSERT khi tính cột sinh
+    return (f"`{name}` {col_type}({length}) GENERATED ALWAYS AS "
+            f"(LEFT(JSON_UNQUOTE(JSON_EXTRACT(doc, '{json_path(key)}')), {length})) VIRTUAL")
+
+
+def create_doc_table_if_not_exists(cursor, table_name, hot_keys):
+    """
+    Bảng staging dạng document: cột doc JSON + cột sinh có index cho các key hay dùng.
+    Header CSV thêm/bớt cột không cần đổi bảng; thêm hot key mới thì ALTER thêm cột sinh + index.
+    """
+    hot_defs = ''.join(f"{hot_column_def(*hot)},\n        " for hot in hot_keys)
+    index_defs = ''.join(f",\n        INDEX idx_{name} (`{name}`)" for name, _, _, _ in hot_keys)
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {table_name} (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        doc JSON NOT NULL,
+        {hot_defs}created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP{index_defs}
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """)
+    cursor.execute(f"SHOW COLUMNS FROM {table_name}")
+    existing = {col[0] for col in cursor.fetchall()}
+    for hot in hot_keys:
+        if hot[0] not in existing:
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN {hot_column_def(*hot)}, ADD INDEX idx_{hot[0]} (`{hot[0]}`)")
+            print(f"Đã thêm cột sinh {hot[0]} ({hot[1]}) vào {table_name}")
+
+
+def iter_doc_batches(csv_file, batch_size=INSERT_BATCH_SIZE):
+    """Đọc CSV theo chunk, mỗi dòng thành 1 JSON theo tên cột header; ô trống bỏ khỏi document (thông số không có)."""
+    for chunk in pd.read_csv(csv_file, dtype=str, keep_default_na=False, encoding='utf-8-sig', chunksize=batch_size):
+        columns = list(chunk.columns)
+        rows = zip(*[chunk.iloc[:, i].tolist() for i in range(chunk.shape[1])])
+        yield [
+            (json.dumps({k: v for k, v in zip(columns, values) if isinstance(v, str) and v != ''}, ensure_ascii=False),)
+            for values in rows
+        ]
+
+
+def load_csv_docs_to_db(csv_file, table_name, hot_keys):
+    """Load CSV vào bảng document (qua shadow + RENAME như bảng raw)."""
+    connection = pymysql.connect(**STAGING_DB_CONFIG)
     try:
-        control_connection = pymysql.connect(**CONTROL_DB_CONFIG)
-        control_cursor = control_connection.cursor()
+        with connection.cursor() as cursor:
+            existed = table_exists(cursor, table_name)
+            create_doc_table_if_not_exists(cursor, table_name, hot_keys)
+            shadow = prepare_shadow_table(cursor, table_name)
+            insert_sql = f"INSERT INTO {shadow} (doc) VALUES (%s)"
+            total = 0
+            for batch in iter_doc_batches(csv_file):
+                cursor.executemany(insert_sql, batch)
+                total += len(batch)
+            connection.commit()
+            print(f"Đã insert {total} document vào table {shadow}")
+            swap_in_shadow(cursor, table_name, keep_old=existed)
+            return True
 
-        # Log và Load BDS (wrap riêng để lỗi không ảnh hưởng Chotot)
-        bds_csv = get_today_csv('bds')
-        if bds_csv:
-            print(f"Đang load BDS từ file hôm nay: {bds_csv}")
-            try:
-                success = load_csv_to_db(bds_csv, BDS_TABLE_NAME)
-                status = 'SUCCESS' if success else 'FAILED'
+    except Exception as e:
+        print(f"Lỗi khi load {table_name}: {e}")
+        discard_shadow(connection, table_name)
+        return False
+    finally:
+        connection.close()
 
-                # Log sau khi load xong
-                bds_started_at = log_process(control_cursor,1, 'P1', 'load bds staging', status)
-                control_connection.commit()
-                print(f"Log BDS: {status}")
 
-            except Exception as e:
-                print(f"Lỗi BDS process: {e}")
-                status = 'FAILED'
-                if control_connection:
-                    try:
-                        bds_started_at = log_process(control_cursor,1, 'P1', 'load bds staging', status)
-                        control_connection.commit()
-                    except Exception as log_e:
-                        print(f"Lỗi log BDS failed: {log_e}")
-        else:
-            print("Không tìm thấy file BDS hôm nay, bỏ qua.")
+def load_staging(csv_file, source, mode=LOAD_MODE, layout=None, suffix=''):
+    """Load file CSV của 1 nguồn theo bố cục (mặc định của nguồn): doc → <doc_table>, fields → <table> (field1..N)."""
+    if (layout or source['layout']) == 'doc':
+        return load_csv_docs_to_db(csv_file, source['doc_table'] + suffix, source['hot_keys'])
+    return load_csv_to_db(csv_file, source['table'] + suffix, source['allow_extend'], mode)
 
-        # Log và Load ChoTot (wrap riêng)
-        chotot_csv = get_today_csv('chotot')
-        if chotot_csv:
-            print(f"Đang load ChoTot từ file hôm nay: {chotot_csv}")
-            try:
-                success = load_csv_to_db(chotot_csv, CHOTOT_TABLE_NAME)
-                status = 'SUCCESS' if success else 'FAILED'
 
-                # Log sau khi load xong
-                chotot_started_at = log_process(control_cursor,2, 'P2', 'load chotot staging', status)
-                control_connection.commit()
-                print(f"Log Chotot: {status}")
+def create_typed_table_if_not_exists(cursor, table_name, schema):
+    """Bảng staging có kiểu theo file schema (BIGINT/DOUBLE/TEXT); schema có thêm trường thì ALTER thêm cột."""
+    cols_def = ', '.join([f'`{name}` {SQL_TYPES[type_name]}' for name, type_name in schema])
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS {table_name} (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        {cols_def},
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_unicode_ci;
+    """)
+    cursor.execute(f"SHOW COLUMNS FROM {table_name}")
+    existing = {col[0] for col in cursor.fetchall()}
+    for name, type_name in schema:
+        if name not in existing:
+            cursor.execute(f"ALTER TABLE {table_name} ADD COLUMN `{name}` {SQL_TYPES[type_name]}")
+            print(f"Đã thêm cột {name} vào {table_name}")
+
+
+def load_typed_jsonl_to_db(jsonl_file, schema_file, table_name):
+    """Load bản ghi có kiểu (JSONL + schema) vào bảng staging có kiểu: số vào cột số, không qua chuỗi."""
+    schema = load_schema(schema_file)
+    names = [name for name, _ in schema]
+    insert_sql = f"""
+    INSERT INTO {table_name}{SHADOW_SUFFIX} ({', '.join([f'`{n}`' for n in names])})
+    VALUES ({', '.join(['%s'] * len(names))})
+    """
+
+    connection = pymysql.connect(**STAGING_DB_CONFIG)
+    try:
+        with connection.cursor() as cursor:
+            existed = table_exists(cursor, table_name)
+            create_typed_table_if_not_exists(cursor, table_name, schema)
+            prepare_shadow_table(cursor, table_name)
+
+            total = 0
+            batch = []
+            for record in iter_jsonl(jsonl_file):
+                batch.append(tuple(record.get(n) for n in names))
+                if len(batch) >= TYPED_BATCH_SIZE:
+                    cursor.executemany(insert_sql, batch)
+                    total += len(batch)
+                    batch = []
+            if batch:
+                cursor.executemany(insert_sql, batch)
+                total += len(batch)
+            connection.commit()
+            print(f"Đã insert {total} bản ghi có kiểu vào table {table_name}{SHADOW_SUFFIX}")
+            swap_in_shadow(cursor, table_name, keep_old=existed)
+            return True
+
+    except Exception as e:
+        print(f"Lỗi khi load {table_name}: {e}")
+        discard_shadow(connection, table_name)
+        return False
+    finally:
+        connection.close()
+
 
+def backfill_file(source, day, csv_file, mode=LOAD_MODE, layout=None):
+    """
+    Chạy trong process riêng: load 1 file vào bảng staging theo ngày (vd bds_doc_20251125) và ghi 1 dòng
+    process_log cho file đó. Mã process có hậu tố B (P1B/P2B) để không bị tính là lần load hôm nay của P1/P2.
+    Xử lý tiếp ngày đó: transform_bds_chotot.py --date ddmmyyyy đọc đúng các bảng _YYYYMMDD này.
+    """
+    started_at = datetime.now()
+    suffix = day.strftime('%Y%m%d')
+    typed_jsonl = csv_file[:-len('.csv')] + '.jsonl'
+    typed_schema = csv_file[:-len('.csv')] + '.schema.json'
+    try:
+        success = load_staging(csv_file, source, mode, layout, f"_{suffix}")
+        if success and source.get('typed_table') and os.path.exists(typed_jsonl) and os.path.exists(typed_schema):
+            success = load_typed_jsonl_to_db(typed_jsonl, typed_schema, f"{source['typed_table']}_{suffix}")
+    except Exception as e:
+        # Lỗi kết nối staging vẫn phải có dòng FAILED trong process_log
+        print(f"Lỗi khi load {csv_file}: {e}")
+        success = False
+    status = 'SUCCESS' if success else 'FAILED'
+
+    control_connection = pymysql.connect(**CONTROL_DB_CONFIG)
+    try:
+        with control_connection.cursor() as control_cursor:
+            log_process(control_cursor, source['source_id'], source['process_code'] + 'B',
+                        f"backfill {source['name']} staging {day.strftime('%d%m%Y')}", status, started_at)
+        control_connection.commit()
+    finally:
+        control_connection.close()
+    return status, (datetime.now() - started_at).total_seconds()
+
+
+def backfill(start, end, sources=SOURCES, workers=BACKFILL_WORKERS, mode=LOAD_MODE, layout=None):
+    """Load mọi file trong khoảng ngày, song song bằng process pool. Trả về số file lỗi."""
+    tasks = [(source, day, csv_file) for source in sources for day, csv_file in find_csv_files(source['name'], start, end)]
+    if not tasks:
+        print("Không có file nào trong khoảng ngày này.")
+        return 0
+
+    print(f"Backfill {len(tasks)} file từ {start:%d/%m/%Y} đến {end:%d/%m/%Y} bằng {workers} process")
+    failed = 0
+    # spawn: mỗi process mở kết nối MySQL riêng, không kế thừa socket của process cha
+    with ProcessPoolExecutor(max_workers=workers, mp_context=get_context("spawn")) as pool:
+        futures = {pool.submit(backfill_file, source, day, csv_file, mode, layout): csv_file for source, day, csv_file in tasks}
+        for future in as_completed(futures):
+            try:
+                status, elapsed = future.result()
             except Exception as e:
-                print(f"Lỗi Chotot process: {e}")
-                status = 'FAILED'
-                if control_connection:
-                    try:
-                        chotot_started_at = log_process(control_cursor, 2,'P2', 'load chotot staging', status)
-                        control_connection.commit()
-                    except Exception as log_e:
-                        print(f"Lỗi log Chotot failed: {log_e}")
-        else:
-            print("Không tìm thấy file ChoTot hôm nay, bỏ qua.")
+                status, elapsed = f'FAILED ({e})', 0
+            if status != 'SUCCESS':
+                failed += 1
+            print(f" [{status}] {futures[future]} ({elapsed:.0f}s)")
+    print(f"Backfill xong: {len(tasks) - failed}/{len(tasks)} file thành công")
+    return failed
 
-        print("Hoàn tất load dữ liệu vào database!")
+
+def load_source(source, csv_file, mode=LOAD_MODE, layout=None):
+    """
+    Chạy trong process riêng: load file hôm nay của 1 nguồn (kết nối staging/control riêng) và ghi
+    process_log của nguồn đó (P1/P2). Lỗi của nguồn này không ảnh hưởng nguồn khác.
+    """
+    started_at = datetime.now()
+    print(f"[{source['name']}] Đang load từ file hôm nay: {csv_file}")
+    try:
+        # Mỗi bảng chỉ đổi chỗ 1 lần với shadow đã load đầy đủ → __old luôn là lần load thật trước đó.
+        # Bảng không load hôm nay (bố cục còn lại, *_typed khi không có JSONL) giữ nguyên; transform so
+        # created_at để bỏ qua bảng cũ hơn bảng vừa load.
+        success = load_staging(csv_file, source, mode, layout)
+
+        # Bản ghi có kiểu đi kèm (nếu crawler có ghi) → bảng *_typed cho transform đọc thẳng số
+        if success and source.get('typed_table'):
+            typed_jsonl = csv_file[:-len('.csv')] + '.jsonl'
+            typed_schema = csv_file[:-len('.csv')] + '.schema.json'
+            if os.path.exists(typed_jsonl) and os.path.exists(typed_schema):
+                success = load_typed_jsonl_to_db(typed_jsonl, typed_schema, source['typed_table'])
     except Exception as e:
-        print(f"Lỗi tổng (kết nối control): {e}")
+        print(f"[{source['name']}] Lỗi process: {e}")
+        success = False
+    status = 'SUCCESS' if success else 'FAILED'
+
+    control_connection = pymysql.connect(**CONTROL_DB_CONFIG)
+    try:
+        with control_connection.cursor() as control_cursor:
+            log_process(control_cursor, source['source_id'], source['process_code'], source['process_name'],
+                        status, started_at)
+        control_connection.commit()
     finally:
-        if control_connection:
-            control_connection.close()
\ No newline at end of file
+        control_connection.close()
+    print(f"[{source['name']}] Log: {status}")
+    return status, (datetime.now() - started_at).total_seconds()
+
+
+def load_today(sources=SOURCES, mode=LOAD_MODE, layout=None):
+    """Load file hôm nay của các nguồn song song, mỗi nguồn 1 process → thời gian = nguồn chậm nhất."""
+    tasks = []
+    for source in sources:
+        csv_file = get_today_csv(source['name'])
+        if csv_file:
+            tasks.append((source, csv_file))
+        else:
+            print(f"Không tìm thấy file {source['name']} hôm nay, bỏ qua.")
+    if not tasks:
+        return 0
+
+    failed = 0
+    with ProcessPoolExecutor(max_workers=len(tasks), mp_context=get_context("spawn")) as pool:
+        futures = {pool.submit(load_source, source, csv_file, mode, layout): source['name'] for source, csv_file in tasks}
+        for future in as_completed(futures):
+            try:
+                status, elapsed = future.result()
+            except Exception as e:
+                # Ví dụ không ghi được process_log (control DB lỗi)
+                status, elapsed = f'FAILED ({e})', 0
+            if status != 'SUCCESS':
+                failed += 1
+            print(f"[{futures[future]}] {status} ({elapsed:.0f}s)")
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load CSV crawl hôm nay vào staging")
+    parser.add_argument("--mode", choices=LOAD_MODES, default=LOAD_MODE,
+                        help="auto: LOAD DATA LOCAL INFILE nếu server cho phép, không thì INSERT theo lô")
+    parser.add_argument("--layout", choices=LAYOUTS, default=None,
+                        help="Ép bố cục cho mọi nguồn (mặc định theo SOURCES: bds=doc, chotot=fields). "
+                             "fields: field1..N (bds_raw/chotot_raw); doc: mỗi dòng là JSON theo header (bds_doc/chotot_doc)")
+    parser.add_argument("--rollback", type=str, metavar="TABLE",
+                        help="Đổi bản trước (TABLE__old) về lại, vd bds_raw; không load gì")
+    parser.add_argument("--backfill", nargs=2, metavar=("FROM", "TO"),
+                        help="Load lại mọi file trong khoảng ngày (ddmmyyyy) vào bảng theo ngày, vd bds_raw_20251125")
+    parser.add_argument("--workers", type=int, default=BACKFILL_WORKERS, help="Số process khi --backfill")
+    parser.add_argument("--sources", type=str, default=",".join(s['name'] for s in SOURCES),
+                        help="Nguồn cần load, cách nhau dấu phẩy")
+    args = parser.parse_args()
+
+    if args.rollback:
+        sys.exit(0 if rollback_table(args.rollback) else 1)
+
+    selected = [s for s in SOURCES if s['name'] in args.sources.split(',')]
+    if args.backfill:
+        start, end = (datetime.strptime(d, '%d%m%Y') for d in args.backfill)
+        sys.exit(1 if backfill(start, end, selected, args.workers, args.mode, args.layout) else 0)
+
+    # Các nguồn độc lập (bảng riêng, kết nối riêng, log P1/P2 riêng) → load song song
+    failed = load_today(selected, args.mode, args.layout)
+    print("Hoàn tất load dữ liệu vào database!")
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,94 @@
+import asyncio
+import random
+import time
+
+from http_session import RETRY_STATUS
+
+
+class AdaptiveRateLimiter:
+    """
+    Token bucket giới hạn số request/giây, tự giảm tốc khi gặp 429/5xx (AIMD).
+    Có metrics thì ghi thời gian limiter thực sự ngủ (chỉ coroutine giữ lock ngủ → không bị cộng trùng).
+    """
+
+    def __init__(self, rate, max_rate=None, min_rate=0.2, burst=None, metrics=None):
+        self.rate = float(rate)
+        self.max_rate = float(max_rate or rate)
+        self.min_rate = min(float(min_rate), self.rate)
+        self.capacity = float(burst or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = asyncio.Lock()
+        self.metrics = metrics
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    async def acquire(self):
+        """Chờ đến khi có token (và hết thời gian tạm dừng nếu server vừa báo quá tải)."""
+        async with self.lock:
+            while True:
+                now = self._refill()
+                if now < self.paused_until:
+                    await self._sleep(self.paused_until - now)
+                    continue
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await self._sleep((1 - self.tokens) / self.rate)
+
+    async def _sleep(self, seconds):
+        if self.metrics is not None:
+            self.metrics.add_sleep(seconds)
+        await asyncio.sleep(seconds)
+
+    def feedback(self, status_code, retry_after=None):
+        """Điều chỉnh tốc độ theo kết quả request: lỗi → giảm nửa, thành công → tăng dần."""
+        if status_code in RETRY_STATUS:
+            self.rate = max(self.min_rate, self.rate / 2)
+            pause = retry_after if retry_after is not None else 1.0 / self.rate
+            self.paused_until = max(self.paused_until, time.monotonic() + pause)
+            self.tokens = 0.0
+            print(f" Server trả {status_code} → giảm tốc còn {self.rate:.2f} req/s, nghỉ {pause:.1f}s")
+        elif status_code == 200 and self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + 0.1 * self.max_rate)
+
+
+class AdaptiveDelay:
+    """
+    Bộ điều khiển độ trễ giữa các bước: mặc định nghỉ ngắn, chỉ giãn ra khi độ trễ phản hồi
+    tăng vọt so với mức nền hoặc gặp dấu hiệu bị chặn; khi ổn định lại thì co dần về mức gốc.
+    """
+
+    def __init__(self, min_s=1.0, max_s=3.0, max_factor=16.0):
+        self.min_s = min_s
+        self.max_s = max_s
+        self.max_factor = max_factor
+        self.factor = 1.0
+        self.baseline = None     # độ trễ nền (EWMA chậm)
+        self.recent = None       # độ trễ gần đây (EWMA nhanh)
+
+    def observe(self, latency_s=None, blocked=False):
+        if blocked:
+            self.factor = min(self.max_factor, self.factor * 2)
+            print(f" Phát hiện dấu hiệu bị chặn → giãn nghỉ x{self.factor:.1f}")
+            return
+        if latency_s is None:
+            return
+        self.recent = latency_s if self.recent is None else 0.5 * self.recent + 0.5 * latency_s
+        self.baseline = latency_s if self.baseline is None else 0.95 * self.baseline + 0.05 * latency_s
+        if self.recent > 2 * self.baseline:
+            self.factor = min(self.max_factor, self.factor * 1.5)
+        else:
+            self.factor = max(1.0, self.factor * 0.9)
+
+    async def wait(self, desc=""):
+        """Nghỉ theo mức hiện tại, trả về số giây đã nghỉ."""
+        delay = random.uniform(self.min_s, self.max_s) * self.factor
+        print(f" Nghỉ {delay:.2f}s {desc} (x{self.factor:.1f})...")
+        await asyncio.sleep(delay)
+        return delay
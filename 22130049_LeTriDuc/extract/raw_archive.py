@@ -0,0 +1,70 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+from datetime import datetime
+
+ARCHIVE_ROOT = "../data/raw"
+
+
+class RawArchive:
+    """
+    Kho lưu response thô (JSON của ChoTot, HTML trang chi tiết BDS) đã nén gzip,
+    key theo URL + ngày crawl: ../data/raw/<source>/<ddmmyyyy>/<sha1(url)>.gz
+    Mỗi thư mục ngày có index.jsonl (url, key, thời điểm, metadata) để replay không cần mạng.
+    Nhiều process ghi cùng ngày thì mỗi process dùng index riêng (index_name), đọc lại gộp hết.
+    """
+
+    def __init__(self, source, crawl_date=None, root=ARCHIVE_ROOT, index_name="index.jsonl"):
+        self.crawl_date = crawl_date or datetime.now().strftime("%d%m%Y")
+        self.dir = os.path.join(root, source, self.crawl_date)
+        self.index_path = os.path.join(self.dir, index_name)
+
+    @staticmethod
+    def key(url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest()
+
+    def put(self, url, body, **meta):
+        """Lưu body (bytes hoặc str) của 1 URL, ghi đè bản cũ cùng ngày nếu có."""
+        os.makedirs(self.dir, exist_ok=True)
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        key = self.key(url)
+        path = os.path.join(self.dir, f"{key}.gz")
+        tmp_path = path + ".tmp"
+        with gzip.open(tmp_path, "wb", compresslevel=6) as f:
+            f.write(body)
+        os.replace(tmp_path, path)
+
+        entry = {"url": url, "key": key, "fetched_at": datetime.now().isoformat(timespec="seconds"), **meta}
+        with open(self.index_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def get(self, url):
+        """Đọc lại body dạng str của 1 URL, không có thì trả None."""
+        path = os.path.join(self.dir, f"{self.key(url)}.gz")
+        if not os.path.exists(path):
+            return None
+        with gzip.open(path, "rb") as f:
+            return f.read().decode("utf-8")
+
+    def entries(self):
+        """Danh sách entry trong index (mỗi URL lấy bản ghi mới nhất, giữ thứ tự crawl)."""
+        latest = {}
+        for index_path in sorted(glob.glob(os.path.join(self.dir, "index*.jsonl"))):
+            with open(index_path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        entry = json.loads(line)
+                        latest.pop(entry["url"], None)
+                        latest[entry["url"]] = entry
+        return list(latest.values())
+
+    def iter_bodies(self):
+        """Duyệt (entry, body) của toàn bộ URL đã lưu trong ngày."""
+        for entry in self.entries():
+            body = self.get(entry["url"])
+            if body is not None:
+                yield entry, body
@@ -0,0 +1,56 @@
+import json
+
+# Schema bản ghi có kiểu của ChoTot: giữ số nguyên bản từ API (không format thành "78 m²", "2 PN")
+CHOTOT_SCHEMA = [
+    ("list_id", "int"),
+    ("title", "str"),
+    ("location", "str"),
+    ("size_m2", "float"),
+    ("rooms", "int"),
+    ("price_vnd", "int"),
+    ("province", "str"),
+    ("country", "str"),
+    ("bathroom", "int"),
+    ("floors", "int"),
+    ("house_direction", "str"),
+    ("legal_doc", "str"),
+    ("furniture", "str"),
+]
+
+# Kiểu trong schema → kiểu cột MySQL của bảng staging có kiểu
+SQL_TYPES = {"int": "BIGINT", "float": "DOUBLE", "str": "TEXT"}
+
+
+def coerce(value, type_name):
+    """
+    Ép 1 giá trị về kiểu trong schema; rỗng hoặc không ép được thì None (không đoán bằng regex).
+    Kiểu int không cắt phần lẻ: "1.234" (có thể là 1234 viết kiểu VN) thành None chứ không thành 1.
+    """
+    if value is None or value == "":
+        return None
+    try:
+        if type_name == "int":
+            number = float(value)
+            return int(number) if number.is_integer() else None
+        if type_name == "float":
+            return float(value)
+    except (TypeError, ValueError, OverflowError):
+        return None
+    return str(value)
+
+
+def coerce_record(record, schema=CHOTOT_SCHEMA):
+    """Dict đúng thứ tự + kiểu theo schema, bỏ key ngoài schema."""
+    return {name: coerce(record.get(name), type_name) for name, type_name in schema}
+
+
+def write_schema(path, schema=CHOTOT_SCHEMA, source="chotot"):
+    """Ghi file schema đi kèm file JSONL để bước load tạo cột đúng kiểu."""
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "fields": [{"name": n, "type": t} for n, t in schema]},
+                  f, ensure_ascii=False, indent=2)
+
+
+def load_schema(path):
+    with open(path, encoding="utf-8") as f:
+        return [(field["name"], field["type"]) for field in json.load(f)["fields"]]
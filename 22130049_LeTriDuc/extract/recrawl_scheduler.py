@@ -0,0 +1,131 @@
+import math
+from datetime import datetime
+
+DAILY_BUDGET = 200      # Số trang chi tiết tối đa lấy trong 1 ngày (mọi lần chạy cộng lại)
+MIN_REFRESH_DAYS = 7    # Tin không đổi giá/ngày đăng chỉ lấy lại khi bản lưu cũ hơn số ngày này
+
+# Điểm ưu tiên: tin mới > đổi giá > đăng lại/đẩy tin > cũ lâu chưa lấy lại
+SCORE_NEW = 1000
+SCORE_PRICE_CHANGED = 800
+SCORE_REPOSTED = 600
+SCORE_MAX_STALE = 500
+
+
+def _normalize(text):
+    return " ".join(text.split()).lower() if text else None
+
+
+def score_card(card, state, now=None):
+    """
+    Chấm điểm 1 card so với bản lưu gần nhất. Trả về (điểm, lý do); điểm 0 là không cần lấy lại.
+    state = (card_price, card_posted, last_seen) từ seen index, None nếu tin chưa từng lấy.
+    """
+    if state is None:
+        return SCORE_NEW, "mới"
+    old_price, old_posted, last_seen = state
+    price, posted = _normalize(card.get("price")), _normalize(card.get("posted"))
+    if price and old_price and price != _normalize(old_price):
+        return SCORE_PRICE_CHANGED, "đổi giá"
+    if posted and old_posted and posted != _normalize(old_posted):
+        return SCORE_REPOSTED, "đăng lại"
+
+    now = now or datetime.now()
+    age_days = (now - datetime.fromisoformat(last_seen)).total_seconds() / 86400 if last_seen else MIN_REFRESH_DAYS
+    if age_days < MIN_REFRESH_DAYS:
+        return 0, "còn mới"
+    # Càng lâu chưa lấy lại càng ưu tiên, chặn trên để không vượt tin đổi giá
+    return min(SCORE_MAX_STALE, int(age_days * 10)), f"cũ {age_days:.0f} ngày"
+
+
+class RecrawlScheduler:
+    """
+    Chọn trang chi tiết cần lấy theo độ cũ của dữ liệu, trong ngân sách cố định mỗi ngày.
+    Ngân sách đã dùng lưu cùng file SQLite với seen index nên cộng dồn qua các lần chạy trong ngày
+    và dùng chung cho mọi process (bds_launcher) trỏ vào cùng file.
+    """
+
+    def __init__(self, seen, daily_budget=DAILY_BUDGET, day=None):
+        self.seen = seen
+        self.daily_budget = daily_budget
+        self.day = day or datetime.now().strftime("%d%m%Y")
+        self.cards = {}     # link → card của lần crawl này, lưu lại khi lấy chi tiết thành công
+        self.reasons = {}
+        seen.conn.execute("""
+            CREATE TABLE IF NOT EXISTS recrawl_budget (
+                source TEXT NOT NULL,
+                day TEXT NOT NULL,
+                used INTEGER NOT NULL,
+                PRIMARY KEY (source, day)
+            ) WITHOUT ROWID
+        """)
+        seen.conn.commit()
+
+    @property
+    def used(self):
+        row = self.seen.conn.execute(
+            "SELECT used FROM recrawl_budget WHERE source = ? AND day = ?", (self.seen.source, self.day)
+        ).fetchone()
+        return row[0] if row else 0
+
+    @property
+    def remaining(self):
+        return max(0, self.daily_budget - self.used)
+
+    def _reserve(self, wanted, pages_left=1):
+        """
+        Giữ chỗ trong ngân sách ngày: đọc phần còn lại và cộng phần được cấp trong CÙNG 1 transaction ghi
+        (BEGIN IMMEDIATE khoá ghi file SQLite) → nhiều process không cùng đọc 1 số dư rồi tiêu lố.
+        Phần còn lại chia đều cho các trang chưa crawl. Trả về số trang được cấp.
+        """
+        conn = self.seen.conn
+        if conn.in_transaction:
+            conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT used FROM recrawl_budget WHERE source = ? AND day = ?", (self.seen.source, self.day)
+            ).fetchone()
+            remaining = max(0, self.daily_budget - (row[0] if row else 0))
+            granted = min(wanted, math.ceil(remaining / max(1, pages_left)))
+            if granted > 0:
+                conn.execute(
+                    """
+                    INSERT INTO recrawl_budget (source, day, used) VALUES (?, ?, ?)
+                    ON CONFLICT(source, day) DO UPDATE SET used = used + excluded.used
+                    """, (self.seen.source, self.day, granted)
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return granted
+
+    def plan(self, cards, pages_left=1):
+        """
+        Chọn link cần lấy chi tiết trong các card của 1 trang danh sách, theo điểm giảm dần.
+        Phần ngân sách còn lại chia đều cho các trang chưa crawl; tin mới/đổi giá luôn được ưu tiên trước.
+        """
+        cards = {card["link"]: card for card in cards}
+        states = self.seen.card_states(cards)
+        scored = []
+        for link, card in cards.items():
+            score, reason = score_card(card, states.get(link))
+            if score > 0:
+                scored.append((score, link, reason))
+        scored.sort(key=lambda x: -x[0])
+
+        chosen = scored[:self._reserve(len(scored), pages_left)]
+        for _, link, reason in chosen:
+            self.cards[link] = cards[link]
+            self.reasons[link] = reason
+
+        skipped = len(cards) - len(scored)
+        print(f" Lịch crawl lại: {len(chosen)}/{len(cards)} tin cần lấy "
+              f"({len(scored) - len(chosen)} để sau vì hết ngân sách, {skipped} không đổi), "
+              f"ngân sách còn {self.remaining}/{self.daily_budget}")
+        return [link for _, link, _ in chosen]
+
+    def record(self, link):
+        """Lấy chi tiết thành công → lưu giá/ngày đăng của card làm bản so sánh cho lần sau."""
+        card = self.cards.pop(link, {})
+        self.seen.save_card(link, card.get("price"), card.get("posted"))
@@ -0,0 +1,150 @@
+import argparse
+import sqlite3
+from datetime import datetime
+
+import pymysql
+
+# Cấu hình kết nối database warehouse (nguồn để đồng bộ link tin đã có)
+WAREHOUSE_DB_CONFIG = {
+    'host': '146.190.93.160',
+    'user': 'root',
+    'password': '123456',
+    'port': 3308,
+    'database': 'warehouse',
+    'charset': 'utf8mb4'
+}
+
+SEEN_INDEX_PATH = "../data/seen_index.sqlite"
+BATCH_SIZE = 500
+
+
+class SeenIndex:
+    """
+    Tập hợp (source, key) các tin đã crawl, lưu trên đĩa bằng SQLite (tra cứu O(log n) theo khóa chính).
+    key là URL chi tiết với BDS, list_id với ChoTot.
+    """
+
+    def __init__(self, source, path=SEEN_INDEX_PATH):
+        self.source = source
+        self.conn = sqlite3.connect(path, timeout=30)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                first_seen TEXT,
+                last_seen TEXT,
+                PRIMARY KEY (source, key)
+            ) WITHOUT ROWID
+        """)
+        # Tóm tắt card lần gần nhất lấy chi tiết (giá, ngày đăng) → so sánh để quyết định có crawl lại không
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS card_state (
+                source TEXT NOT NULL,
+                key TEXT NOT NULL,
+                card_price TEXT,
+                card_posted TEXT,
+                PRIMARY KEY (source, key)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def __contains__(self, key):
+        row = self.conn.execute(
+            "SELECT 1 FROM seen WHERE source = ? AND key = ?", (self.source, str(key))
+        ).fetchone()
+        return row is not None
+
+    def filter_new(self, keys):
+        """Giữ lại các key chưa có trong index (giữ thứ tự, bỏ trùng)."""
+        keys = [str(k) for k in dict.fromkeys(keys)]
+        known = set()
+        for i in range(0, len(keys), BATCH_SIZE):
+            batch = keys[i:i + BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"SELECT key FROM seen WHERE source = ? AND key IN ({placeholders})", (self.source, *batch)
+            )
+            known.update(row[0] for row in rows)
+        return [k for k in keys if k not in known]
+
+    def add_many(self, keys):
+        now = datetime.now().isoformat(timespec="seconds")
+        self.conn.executemany(
+            """
+            INSERT INTO seen (source, key, first_seen, last_seen) VALUES (?, ?, ?, ?)
+            ON CONFLICT(source, key) DO UPDATE SET last_seen = excluded.last_seen
+            """,
+            [(self.source, str(k), now, now) for k in keys]
+        )
+        self.conn.commit()
+
+    def add(self, key):
+        self.add_many([key])
+
+    def card_states(self, keys):
+        """{key: (card_price, card_posted, last_seen)} của các key đã biết (key chưa có card thì giá/ngày là None)."""
+        keys = [str(k) for k in dict.fromkeys(keys)]
+        states = {}
+        for i in range(0, len(keys), BATCH_SIZE):
+            batch = keys[i:i + BATCH_SIZE]
+            placeholders = ", ".join("?" * len(batch))
+            rows = self.conn.execute(
+                f"""
+                SELECT s.key, c.card_price, c.card_posted, s.last_seen
+                FROM seen s LEFT JOIN card_state c ON c.source = s.source AND c.key = s.key
+                WHERE s.source = ? AND s.key IN ({placeholders})
+                """, (self.source, *batch)
+            )
+            states.update((row[0], row[1:]) for row in rows)
+        return states
+
+    def save_card(self, key, price, posted):
+        """Lưu giá/ngày đăng trên card của lần lấy chi tiết này (None thì giữ giá trị cũ)."""
+        self.conn.execute(
+            """
+            INSERT INTO card_state (source, key, card_price, card_posted) VALUES (?, ?, ?, ?)
+            ON CONFLICT(source, key) DO UPDATE SET
+                card_price = COALESCE(excluded.card_price, card_price),
+                card_posted = COALESCE(excluded.card_posted, card_posted)
+            """, (self.source, str(key), price, posted)
+        )
+        self.conn.commit()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen WHERE source = ?", (self.source,)).fetchone()[0]
+
+    def refresh_from_warehouse(self, source_id, db_config=WAREHOUSE_DB_CONFIG):
+        """Nạp toàn bộ link đã có trong warehouse.bds_common của source_id vào index."""
+        connection = pymysql.connect(**db_config)
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    "SELECT DISTINCT link FROM bds_common WHERE source_id = %s AND link IS NOT NULL AND link <> ''",
+                    (source_id,)
+                )
+                total = 0
+                while True:
+                    rows = cursor.fetchmany(5000)
+                    if not rows:
+                        break
+                    self.add_many(row[0] for row in rows)
+                    total += len(rows)
+        finally:
+            connection.close()
+        print(f" Đồng bộ {total} link từ warehouse.bds_common (source_id={source_id}) vào seen index")
+        return total
+
+    def close(self):
+        self.conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Đồng bộ seen index từ warehouse")
+    parser.add_argument("--source", type=str, default="bds", help="Tên nguồn trong index")
+    parser.add_argument("--source-id", type=int, default=1, help="source_id trong warehouse.bds_common")
+    args = parser.parse_args()
+
+    index = SeenIndex(args.source)
+    index.refresh_from_warehouse(args.source_id)
+    print(f" Index {args.source}: {index.count()} tin")
+    index.close()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# Các module crawler nằm phẳng trong extract/ và import lẫn nhau theo tên
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "extract"))
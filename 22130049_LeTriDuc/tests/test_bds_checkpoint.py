@@ -0,0 +1,78 @@
+import asyncio
+import json
+
+from bds import BdsCrawler
+from bds_browser import load_block_config
+from crawl_sink import JsonlSink, iter_jsonl
+
+PAGE_1 = "https://batdongsan.com.vn/nha-dat-ban-tp-hcm"
+PAGE_2 = "https://batdongsan.com.vn/nha-dat-ban-tp-hcm/p2"
+
+
+def make_crawler(tmp_path, fail_links=(), resume=False):
+    """Crawler không mở trình duyệt: trang danh sách và trang chi tiết được giả lập."""
+    sink = JsonlSink(str(tmp_path / "bds.jsonl"), mode="a" if resume else "w")
+    crawler = BdsCrawler(sink, None, pool_size=2, rate=1000, block_config=load_block_config(),
+                         checkpoint_path=str(tmp_path / "bds.checkpoint.json"), http_fast_path=False)
+    fail_links = set(fail_links)
+
+    async def collect_links(browser, page_url):
+        return [{"link": f"{page_url}/tin-{i}", "price": None, "posted": None} for i in range(3)]
+
+    async def scrape_with_browser(link, label):
+        return None if link in fail_links else {"Link": link, "Tiêu đề": label}
+
+    crawler.collect_links = collect_links
+    crawler.scrape_with_browser = scrape_with_browser
+    return crawler, sink
+
+
+def run_pages(crawler, pages):
+    return [asyncio.run(crawler.crawl_page(None, page_url, idx)) for idx, page_url in enumerate(pages, 1)]
+
+
+def test_page_with_failed_links_is_not_done(tmp_path):
+    crawler, sink = make_crawler(tmp_path, fail_links={f"{PAGE_1}/tin-1"})
+    assert run_pages(crawler, [PAGE_1, PAGE_2]) == [False, True]
+    sink.close()
+
+    assert crawler.state["done_pages"] == [PAGE_2]
+    # Frontier của trang 1 không bị trang 2 ghi đè
+    assert crawler.state["pending"] == {PAGE_1: [f"{PAGE_1}/tin-1"]}
+    assert not crawler.complete
+    with open(tmp_path / "bds.checkpoint.json", encoding="utf-8") as f:
+        assert json.load(f) == crawler.state
+
+
+def test_resume_retries_only_pending_links(tmp_path):
+    crawler, sink = make_crawler(tmp_path, fail_links={f"{PAGE_1}/tin-1"})
+    run_pages(crawler, [PAGE_1, PAGE_2])
+    sink.close()
+
+    resumed, sink = make_crawler(tmp_path, resume=True)
+    opened = []
+    collect_links = resumed.collect_links
+
+    async def tracking_collect(browser, page_url):
+        opened.append(page_url)
+        return await collect_links(browser, page_url)
+
+    resumed.collect_links = tracking_collect
+    assert asyncio.run(resumed.crawl_page(None, PAGE_1, 1)) is True
+    sink.close()
+
+    # Không mở lại trang danh sách, chỉ lấy lại đúng tin lỗi
+    assert opened == []
+    assert resumed.complete
+    assert resumed.state["done_pages"] == [PAGE_2, PAGE_1]
+    links = [item["Link"] for item in iter_jsonl(str(tmp_path / "bds.jsonl"))]
+    assert sorted(links) == sorted(f"{page}/tin-{i}" for page in (PAGE_1, PAGE_2) for i in range(3))
+
+
+def test_old_checkpoint_format_is_upgraded(tmp_path):
+    with open(tmp_path / "bds.checkpoint.json", "w", encoding="utf-8") as f:
+        json.dump({"done_pages": [PAGE_2], "page_url": PAGE_1, "pending": [f"{PAGE_1}/tin-2"]}, f)
+
+    crawler, sink = make_crawler(tmp_path, resume=True)
+    sink.close()
+    assert crawler.state == {"done_pages": [PAGE_2], "pending": {PAGE_1: [f"{PAGE_1}/tin-2"]}}
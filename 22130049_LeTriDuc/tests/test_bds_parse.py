@@ -0,0 +1,25 @@
+from bds_browser import _build_item
+from bds_parse import _parse_lxml, _parse_stdlib, parse_detail_html
+
+LINK = "https://batdongsan.com.vn/ban-nha-pr1"
+HTML = (
+    '<html><body><h1 class="re__pr-title">  Bán nhà\n  Quận 5 </h1><div class="re__pr-specs">'
+    '<span class="re__pr-specs-content-item-title">Diện&nbsp;tích</span>'
+    '<span class="re__pr-specs-content-item-value">63&nbsp;m²</span>'
+    '<span class="re__pr-specs-content-item-title">Pháp lý</span>'
+    '<span class="re__pr-specs-content-item-value">Sổ đỏ<br>Sổ hồng</span>'
+    '</div></body></html>'
+)
+
+# Giá trị innerText(). trim() mà Playwright trả về cho cùng trang: giữ NBSP và xuống dòng của <br>
+INNER_TEXT = ("Bán nhà\nQuận 5", [("Diện\u00a0tích", "63\u00a0m²"), ("Pháp lý", "Sổ đỏ\nSổ hồng")])
+
+
+def test_http_and_browser_paths_give_same_item():
+    from_browser = _build_item(LINK, *INNER_TEXT)
+    assert parse_detail_html(HTML, LINK) == from_browser
+    assert from_browser == {"Link": LINK, "Tiêu đề": "Bán nhà Quận 5", "Diện tích": "63 m²", "Pháp lý": "Sổ đỏ Sổ hồng"}
+
+
+def test_lxml_and_stdlib_parsers_agree():
+    assert _parse_lxml(HTML) == _parse_stdlib(HTML)
@@ -0,0 +1,34 @@
+import json
+
+from chotot_detail import parse_detail
+
+
+def test_parse_detail_prefers_raw_numbers_and_labelled_text():
+    body = json.dumps({
+        "ad": {"list_id": 1, "toilets": 2, "floors": 3, "direction": 5, "property_legal_document": 1},
+        "parameters": [
+            {"id": "toilets", "value": "2 phòng"},
+            {"id": "direction", "value": "Đông Nam"},
+            {"id": "property_legal_document", "value": "Đã có sổ"},
+        ],
+    }, ensure_ascii=False)
+
+    assert parse_detail(body) == {
+        "bathroom": 2,
+        "floors": 3,
+        "house_direction": "Đông Nam",
+        "legal_doc": "Đã có sổ",
+        "furniture": None,
+    }
+
+
+def test_parse_detail_falls_back_to_parameters_and_ad_codes():
+    body = json.dumps({
+        "ad": {"furnishing_sell": 2},
+        "parameters": [{"id": "floors", "value": "4"}],
+    })
+
+    detail = parse_detail(body)
+    assert detail["floors"] == "4"
+    assert detail["furniture"] == 2
+    assert detail["bathroom"] is None
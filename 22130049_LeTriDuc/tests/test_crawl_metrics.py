@@ -0,0 +1,55 @@
+import asyncio
+import gzip
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from crawl_metrics import CrawlMetrics, wire_bytes
+from http_session import create_session
+from rate_limit import AdaptiveRateLimiter
+
+BODY = ("Bán nhà " * 5000).encode("utf-8")
+
+
+class GzipHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = gzip.compress(BODY)
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_limiter_sleep_is_not_multiplied_by_concurrency():
+    metrics = CrawlMetrics("test")
+    limiter = AdaptiveRateLimiter(20, burst=1, metrics=metrics)
+
+    async def worker():
+        for _ in range(5):
+            await limiter.acquire()
+
+    async def main():
+        await asyncio.gather(*(worker() for _ in range(8)))
+
+    started = time.perf_counter()
+    asyncio.run(main())
+    elapsed = time.perf_counter() - started
+    # 40 token ở 20 token/s → ~2s ngủ; 8 coroutine chờ cùng lúc không được nhân lên ~8 lần
+    assert 1.5 < metrics.sleep_seconds <= elapsed + 0.05
+
+
+def test_wire_bytes_counts_compressed_size():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), GzipHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        session = create_session(pool_size=1)
+        res = session.get(f"http://127.0.0.1:{server.server_port}/")
+        assert res.content == BODY
+        assert wire_bytes(res) == len(gzip.compress(BODY)) < len(BODY)
+        session.close()
+    finally:
+        server.shutdown()
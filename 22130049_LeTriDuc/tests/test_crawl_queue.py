@@ -0,0 +1,60 @@
+import asyncio
+
+import crawl_queue
+from crawl_queue import CrawlQueue, connect_queue
+
+DAY = "01012026"
+
+
+def make_queue(tmp_path, owner, lease_seconds=300):
+    return CrawlQueue(connect_queue(str(tmp_path / "queue.sqlite")), owner=owner, lease_seconds=lease_seconds)
+
+
+def test_each_task_is_claimed_once(tmp_path):
+    node_a, node_b = make_queue(tmp_path, "a:1"), make_queue(tmp_path, "b:1")
+    assert node_a.enqueue(DAY, "bds", [("p1", None), ("p2", None)]) == 2
+    # Node khác enqueue lại cùng danh sách → bỏ qua
+    assert node_b.enqueue(DAY, "bds", [("p1", None), ("p2", None)]) == 0
+
+    claimed = [node_a.claim(DAY, "bds"), node_b.claim(DAY, "bds")]
+    assert sorted(task["task_key"] for task in claimed) == ["p1", "p2"]
+    assert node_a.claim(DAY, "bds") is None
+    assert node_a.stats(DAY, "bds") == {"leased": 2}
+
+
+def test_expired_lease_is_reclaimed_by_another_node(tmp_path):
+    node_a, node_b = make_queue(tmp_path, "a:1"), make_queue(tmp_path, "b:1")
+    node_a.enqueue(DAY, "bds", [("p1", None)])
+    task = node_a.claim(DAY, "bds")
+    assert node_b.claim(DAY, "bds") is None
+
+    # Node a chết: lease hết hạn (giả lập bằng cách cho lease đã hết hạn từ 1 giây trước)
+    node_a._execute("UPDATE crawl_task SET lease_expires_at = %s WHERE id = %s",
+                    (crawl_queue._now(-1), task["id"]))
+    reclaimed = node_b.claim(DAY, "bds")
+    assert reclaimed["task_key"] == "p1" and reclaimed["attempts"] == 2
+    # Node a sống lại: heartbeat báo mất lease, complete không ghi đè task của node b
+    assert node_a.heartbeat(task["id"]) is False
+    node_a.complete(task["id"])
+    assert node_b.stats(DAY, "bds") == {"leased": 1}
+
+    node_b.complete(reclaimed["id"])
+    assert node_b.is_drained(DAY, "bds")
+
+
+def test_failed_task_is_retried_until_max_attempts(tmp_path):
+    node = make_queue(tmp_path, "a:1")
+    node.enqueue(DAY, "bds", [("p1", None)], max_attempts=2)
+
+    async def boom():
+        raise Exception("lỗi mạng")
+
+    for _ in range(2):
+        task = node.claim(DAY, "bds")
+        assert asyncio.run(node.run_task(task, boom())) is False
+    assert node.claim(DAY, "bds") is None
+    assert node.stats(DAY, "bds") == {"failed": 1}
+    assert node.is_drained(DAY, "bds")
+
+    assert node.reset_failed(DAY, "bds") == 1
+    assert node.claim(DAY, "bds")["task_key"] == "p1"
@@ -0,0 +1,42 @@
+from crawl_sink import JsonlSink, iter_jsonl, jsonl_to_csv
+
+
+def test_append_after_partial_line_keeps_new_items(tmp_path):
+    path = str(tmp_path / "items.jsonl")
+    with JsonlSink(path) as sink:
+        sink.write({"Link": "a", "Tiêu đề": "A"})
+    # Crash giữa lúc ghi dòng thứ 2
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"Link": "b", "Tiê')
+
+    with JsonlSink(path, mode="a") as sink:
+        sink.write({"Link": "c", "Tiêu đề": "C", "Diện tích": "50 m²"})
+
+    assert [item["Link"] for item in iter_jsonl(path)] == ["a", "c"]
+
+
+def test_jsonl_to_csv_merges_columns(tmp_path):
+    part1, part2 = str(tmp_path / "part0.jsonl"), str(tmp_path / "part1.jsonl")
+    with JsonlSink(part1) as sink:
+        sink.write({"Link": "a", "Tiêu đề": "A", "Số tầng": "2"})
+    with JsonlSink(part2) as sink:
+        sink.write({"Link": "b", "Tiêu đề": "B", "Diện tích": "50 m²"})
+
+    csv_path = str(tmp_path / "bds.csv")
+    assert jsonl_to_csv([part1, part2], csv_path, leading_columns=("Link", "Tiêu đề")) == 2
+    with open(csv_path, encoding="utf-8-sig") as f:
+        assert f.readline().strip() == "Link,Tiêu đề,Diện tích,Số tầng"
+
+
+def test_jsonl_to_csv_dedupes_reclaimed_links(tmp_path):
+    part1, part2 = str(tmp_path / "queue-a.jsonl"), str(tmp_path / "queue-b.jsonl")
+    with JsonlSink(part1) as sink:
+        sink.write({"Link": "a", "Tiêu đề": "A"})
+        sink.write({"Link": "b", "Tiêu đề": "B"})
+    # Node b nhận lại trang của node a sau khi hết lease → ghi lại tin a
+    with JsonlSink(part2) as sink:
+        sink.write({"Link": "a", "Tiêu đề": "A"})
+        sink.write({"Link": "c", "Tiêu đề": "C"})
+
+    csv_path = str(tmp_path / "bds.csv")
+    assert jsonl_to_csv([part1, part2], csv_path, leading_columns=("Link", "Tiêu đề"), dedupe_key="Link") == 3
@@ -0,0 +1,87 @@
+import csv
+import json
+from datetime import datetime
+
+from load_csv import (INSERT_BATCH_SIZE, SOURCES, detect_line_terminator, find_csv_files, insert_batches,
+                      iter_csv_batches, iter_doc_batches, json_path, read_csv_header)
+
+
+class RecordingCursor:
+    """Cursor giả chỉ ghi lại các lần executemany (không cần MySQL)."""
+
+    def __init__(self):
+        self.calls = []
+
+    def executemany(self, sql, rows):
+        self.calls.append((sql, list(rows)))
+
+
+def write_csv(path, header, rows, newline="\n"):
+    with open(path, "w", newline="", encoding="utf-8-sig") as f:
+        writer = csv.writer(f, lineterminator=newline)
+        writer.writerow(header)
+        writer.writerows(rows)
+    return str(path)
+
+
+def test_iter_csv_batches_keeps_empty_cells_as_strings(tmp_path):
+    csv_file = write_csv(tmp_path / "chotot.csv", ["title", "size", "rooms"],
+                         [["Nhà, hẻm", "78 m²", ""], ["Căn hộ", "", "2 PN"]])
+    assert list(iter_csv_batches(csv_file)) == [[("Nhà, hẻm", "78 m²", ""), ("Căn hộ", "", "2 PN")]]
+
+
+def test_insert_batches_splits_at_batch_size(tmp_path):
+    rows = [[f"tin {i}", str(i)] for i in range(INSERT_BATCH_SIZE + 1)]
+    csv_file = write_csv(tmp_path / "bds.csv", ["Link", "Tiêu đề"], rows)
+    cursor = RecordingCursor()
+
+    assert insert_batches(cursor, "bds_raw__new", 2, iter_csv_batches(csv_file)) == INSERT_BATCH_SIZE + 1
+    assert [len(batch) for _, batch in cursor.calls] == [INSERT_BATCH_SIZE, 1]
+    assert cursor.calls[1][1] == [(f"tin {INSERT_BATCH_SIZE}", str(INSERT_BATCH_SIZE))]
+    assert "INSERT INTO bds_raw__new (field1, field2)" in cursor.calls[0][0]
+
+
+def test_detect_line_terminator(tmp_path):
+    lf = write_csv(tmp_path / "lf.csv", ["title"], [["a"]])
+    crlf = write_csv(tmp_path / "crlf.csv", ["title"], [["a"]], newline="\r\n")
+    assert detect_line_terminator(lf) == "\n"
+    assert detect_line_terminator(crlf) == "\r\n"
+
+
+def test_find_csv_files_filters_by_date_range(tmp_path, monkeypatch):
+    data = tmp_path / "data"
+    data.mkdir()
+    for name in ["bds_24112025.csv", "bds_25112025.csv", "bds_01122025.csv", "bds_99999999.csv",
+                 "bds_25112025.checkpoint.json", "chotot_25112025.csv"]:
+        (data / name).write_text("Link\n", encoding="utf-8")
+    (tmp_path / "extract").mkdir()
+    monkeypatch.chdir(tmp_path / "extract")
+
+    found = find_csv_files("bds", datetime(2025, 11, 25), datetime(2025, 12, 1))
+    assert [(day.strftime("%d%m%Y"), path.replace("\\", "/")) for day, path in found] == [
+        ("25112025", "../data/bds_25112025.csv"),
+        ("01122025", "../data/bds_01122025.csv"),
+    ]
+
+
+def test_read_csv_header_strips_bom(tmp_path):
+    csv_file = write_csv(tmp_path / "chotot.csv", ["title", "size"], [["Nhà", "78 m²"]])
+    assert read_csv_header(csv_file) == ["title", "size"]
+
+
+def test_iter_doc_batches_keys_by_header_without_bom(tmp_path):
+    csv_file = write_csv(tmp_path / "bds.csv", ["Link", "Diện tích", "Số tầng"],
+                         [["https://x/1", "50 m²", ""], ["https://x/2", "", "3"]])
+    docs = [json.loads(doc) for batch in iter_doc_batches(csv_file) for (doc,) in batch]
+    # Key đầu tiên là "Link" chứ không phải "\ufeffLink"; ô trống bỏ khỏi document
+    assert docs == [{"Link": "https://x/1", "Diện tích": "50 m²"}, {"Link": "https://x/2", "Số tầng": "3"}]
+
+
+def test_json_path_quotes_vietnamese_keys():
+    assert json_path("Link") == '$."Link"'
+    assert json_path("Số phòng tắm, vệ sinh") == '$."Số phòng tắm, vệ sinh"'
+    assert json_path('a"b') == '$."a\\"b"'
+
+
+def test_sources_default_layouts():
+    assert {s["name"]: s["layout"] for s in SOURCES} == {"bds": "doc", "chotot": "fields"}
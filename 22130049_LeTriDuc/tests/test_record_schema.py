@@ -0,0 +1,28 @@
+from record_schema import coerce, coerce_record
+
+
+def test_coerce_numbers():
+    assert coerce("78.5", "float") == 78.5
+    assert coerce(3100000000, "int") == 3100000000
+    assert coerce("2", "int") == 2
+    assert coerce("2.0", "int") == 2
+
+
+def test_coerce_int_does_not_truncate_fraction():
+    # "1.234" có thể là 1234 có dấu chấm hàng nghìn → không đoán, để None
+    assert coerce("1.234", "int") is None
+    assert coerce("1.234", "float") == 1.234
+
+
+def test_coerce_empty_and_garbage_become_none():
+    assert coerce("", "int") is None
+    assert coerce(None, "float") is None
+    assert coerce("2 PN", "int") is None
+    assert coerce("inf", "int") is None
+    assert coerce(12, "str") == "12"
+
+
+def test_coerce_record_follows_schema_order():
+    schema = [("list_id", "int"), ("title", "str"), ("size_m2", "float")]
+    record = coerce_record({"size_m2": "32.2", "title": "Nhà", "list_id": "7", "extra": 1}, schema)
+    assert list(record.items()) == [("list_id", 7), ("title", "Nhà"), ("size_m2", 32.2)]
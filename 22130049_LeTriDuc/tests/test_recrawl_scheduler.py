@@ -0,0 +1,72 @@
+import threading
+from datetime import datetime, timedelta
+
+from recrawl_scheduler import SCORE_NEW, SCORE_PRICE_CHANGED, RecrawlScheduler, score_card
+from seen_index import SeenIndex
+
+DAY = "01012026"
+
+
+def cards(prefix, n, price="3 tỷ"):
+    return [{"link": f"https://bds/{prefix}-{i}", "price": price, "posted": "Hôm nay"} for i in range(n)]
+
+
+def test_budget_is_split_over_remaining_pages_and_persists(tmp_path):
+    path = str(tmp_path / "seen.sqlite")
+    scheduler = RecrawlScheduler(SeenIndex("bds", path), daily_budget=10, day=DAY)
+    assert len(scheduler.plan(cards("a", 8), pages_left=2)) == 5
+    assert scheduler.remaining == 5
+
+    # Lần chạy sau trong ngày dùng tiếp phần còn lại, không vượt ngân sách
+    again = RecrawlScheduler(SeenIndex("bds", path), daily_budget=10, day=DAY)
+    assert len(again.plan(cards("b", 8))) == 5
+    assert again.plan(cards("c", 8)) == []
+    assert again.used == 10
+
+    # Ngày mới có ngân sách mới
+    assert len(RecrawlScheduler(SeenIndex("bds", path), daily_budget=10, day="02012026").plan(cards("d", 3))) == 3
+
+
+def test_new_and_price_changed_listings_go_first(tmp_path):
+    seen = SeenIndex("bds", str(tmp_path / "seen.sqlite"))
+    old = cards("old", 3)
+    seen.add_many(card["link"] for card in old)
+    for card in old:
+        seen.save_card(card["link"], card["price"], card["posted"])
+    changed = dict(old[0], price="2,5 tỷ")
+
+    scheduler = RecrawlScheduler(seen, daily_budget=2, day=DAY)
+    chosen = scheduler.plan([old[1], old[2], changed] + cards("new", 1))
+    assert chosen == ["https://bds/new-0", changed["link"]]
+    assert score_card(changed, (old[0]["price"], old[0]["posted"], datetime.now().isoformat())) == \
+        (SCORE_PRICE_CHANGED, "đổi giá")
+    assert score_card(old[1], None) == (SCORE_NEW, "mới")
+
+
+def test_stale_listing_is_refreshed_after_min_days():
+    state = ("3 tỷ", "Hôm nay", (datetime.now() - timedelta(days=30)).isoformat())
+    score, _ = score_card({"link": "x", "price": "3 tỷ", "posted": "Hôm nay"}, state)
+    assert 0 < score < SCORE_PRICE_CHANGED
+
+
+def test_concurrent_processes_never_overspend(tmp_path):
+    """Nhiều process bds_launcher dùng chung 1 file SQLite: tổng tin được cấp không vượt ngân sách."""
+    path = str(tmp_path / "seen.sqlite")
+    RecrawlScheduler(SeenIndex("bds", path), daily_budget=20, day=DAY)
+    barrier = threading.Barrier(8)
+    chosen = []
+
+    def worker(k):
+        scheduler = RecrawlScheduler(SeenIndex("bds", path), daily_budget=20, day=DAY)
+        barrier.wait()
+        for page in range(3):
+            chosen.extend(scheduler.plan(cards(f"w{k}p{page}", 5)))
+
+    threads = [threading.Thread(target=worker, args=(k,)) for k in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(chosen) == 20
+    assert RecrawlScheduler(SeenIndex("bds", path), daily_budget=20, day=DAY).used == 20
@@ -1,3 +1,5 @@
+import argparse
+import json
 import re
 from datetime import datetime
 import traceback
@@ -34,6 +36,15 @@ BASE_CSV_DIR = "/D/DW/staging/data/"
 BDS_CSV_PATH = f"{BASE_CSV_DIR}bds_clean_{TODAY}.csv"
 CHOTOT_CSV_PATH = f"{BASE_CSV_DIR}chotot_clean_{TODAY}.csv"
 
+
+# --- CHẠY LẠI 1 NGÀY CŨ (--date): đọc bảng staging theo ngày do load_csv.py --backfill tạo (vd bds_raw_20251125) ---
+def staging_suffix(crawl_date=None):
+    return crawl_date.strftime("_%Y%m%d") if crawl_date else ""
+
+
+def clean_csv_path(csv_path: str, crawl_date=None):
+    return csv_path.replace(TODAY, crawl_date.strftime("%d%m%Y")) if crawl_date else csv_path
+
 # --- HELPER: gửi email (fix lỗi join) ---
 def send_error_email(process_name: str, error_message: str):
     subject = f"[LỖI ETL] {process_name} thất bại - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
@@ -74,13 +85,17 @@ def get_source_id(source_name: str):
         raise Exception(f"Không tìm thấy source_id cho {source_name}: {e}")
 
 # --- LOG PROCESS START ---
-def log_process_start(process_name: str, source_id: int = None):
+def log_process_start(process_name: str, source_id: int = None, crawl_date=None):
     start_time = datetime.now()
     process_code_map = {
         PROCESS_BDS: "P3",
         PROCESS_CHOTOT: "P4"
     }
     process_code = process_code_map.get(process_name, "unknown")
+    if crawl_date:
+        # Chạy lại ngày cũ: hậu tố B như P1B/P2B của backfill, không bị tính là transform hôm nay
+        process_code += "B"
+        process_name = f"{process_name} {crawl_date.strftime('%d%m%Y')}"
     try:
         sql = text("""
             INSERT INTO process_log (process_code, process_name, started_at, status, source_id)
@@ -204,41 +219,117 @@ def check_table_has_data(table_name: str):
         raise Exception(f"Lỗi khi kiểm tra dữ liệu bảng {table_name}: {e}")
 
 
+# --- THÊM CỘT CÒN THIẾU VÀO BẢNG CLEAN (to_sql append không tự thêm cột) ---
+def add_missing_columns(table_name: str, df: pd.DataFrame):
+    with staging_engine.begin() as conn:
+        existing = {row[0] for row in conn.execute(text(f"SHOW COLUMNS FROM {table_name}"))}
+        for col in df.columns:
+            if col not in existing:
+                col_type = "INT" if pd.api.types.is_integer_dtype(df[col]) else "TEXT"
+                conn.execute(text(f"ALTER TABLE {table_name} ADD COLUMN `{col}` {col_type}"))
+                print(f"Đã thêm cột {col} vào {table_name}")
+
+
+# --- ĐỌC BẢNG DOCUMENT: mỗi dòng là JSON {tên cột header CSV: giá trị}, đọc theo key thay vì vị trí ---
+def read_doc_table(table_name: str, key_mapping: dict, optional_mapping: dict = None):
+    try:
+        df_doc = pd.read_sql(f"SELECT doc, created_at FROM {table_name}", staging_engine)
+    except Exception as e:
+        raise Exception(f"Không đọc được {table_name}")
+
+    docs = pd.DataFrame([json.loads(d) for d in df_doc["doc"]])
+    # Key tuỳ chọn (vd cột chi tiết ChoTot) chỉ lấy khi có trong ít nhất 1 document
+    mapping = dict(key_mapping)
+    mapping.update({k: v for k, v in (optional_mapping or {}).items() if k in docs.columns})
+    # Key không có trong document = ô trống trong CSV → "" như bảng fieldN
+    df = docs.reindex(columns=list(mapping.keys())).fillna("").rename(columns=mapping)
+    return df_doc, df
+
+
+BDS_DOC_MAPPING = {
+    "Link": "link",
+    "Tiêu đề": "title",
+    "Diện tích": "area_raw",
+    "Hướng ban công": "balcony_direction",
+    "Hướng nhà": "house_direction",
+    "Khoảng giá": "price_raw",
+    "Mặt tiền": "front_width",
+    "Nội thất": "furniture",
+    "Pháp lý": "legal_doc",
+    "Số phòng ngủ": "bedroom_raw",
+    "Số phòng tắm, vệ sinh": "bathroom_raw",
+    "Số tầng": "floor_raw",
+    "Đường vào": "entrance_width",
+}
+
+CHOTOT_DOC_MAPPING = {
+    "title": "title",
+    "location": "address",
+    "area": "area_desc",
+    "size": "size_raw",
+    "rooms": "bedroom_raw",
+    "sqm_m2": "area_m2",
+    "price_VND": "price_raw",
+    "province": "province",
+    "country": "country",
+}
+
+# Cột chi tiết (ChoTot.py --enrich)
+CHOTOT_DOC_DETAIL_MAPPING = {
+    "bathroom": "bathroom_raw",
+    "floors": "floor_raw",
+    "house_direction": "house_direction",
+    "legal_doc": "legal_doc",
+    "furniture": "furniture",
+}
+
+
+# --- ĐỌC BDS_RAW: cột fieldN theo vị trí ---
+def read_bds_raw(table_name: str = "bds_raw"):
+    # 3.1.4 Đọc dữ liệu raw
+    try:
+        df_raw = pd.read_sql(f"SELECT * FROM {table_name}", staging_engine)
+    except Exception as e:
+        raise Exception(f"Không đọc được {table_name}")
+
+    # 3.1.5 Kiểm tra thiếu cột và rename
+    column_mapping = {
+        "field1": "link",
+        "field2": "title",
+        "field3": "area_raw",
+        "field4": "balcony_direction",
+        "field5": "house_direction",
+        "field6": "price_raw",
+        "field7": "front_width",
+        "field8": "furniture",
+        "field9": "legal_doc",
+        "field10": "bedroom_raw",
+        "field11": "bathroom_raw",
+        "field12": "floor_raw",
+        "field13": "entrance_width"
+    }
+    missing_cols = [c for c in column_mapping if c not in df_raw.columns]
+    if missing_cols:
+        raise Exception(f"Thiếu cột trong {table_name}: {missing_cols}")
+
+    # Rename và chọn cột cần thiết
+    df = df_raw[list(column_mapping.keys())].rename(columns=column_mapping)
+    return df_raw, df
+
+
 # ---------------- TRANSFORM BDS ----------------
-def transform_bds(source_id: int = None, process_id: int = None):
+def transform_bds(source_id: int = None, process_id: int = None, crawl_date=None):
     process_name = PROCESS_BDS
+    suffix = staging_suffix(crawl_date)
     try:
-        # 3.1.3 Kiểm tra bảng raw có dữ liệu không
-        check_table_has_data("bds_raw")
-
-        # 3.1.4 Đọc dữ liệu raw
-        try:
-            df_raw = pd.read_sql("SELECT * FROM bds_raw", staging_engine)
-        except Exception as e:
-            raise Exception(f"Không đọc được bds_raw")
-
-        # 3.1.5 Kiểm tra thiếu cột và rename
-        column_mapping = {
-            "field1": "link",
-            "field2": "title",
-            "field3": "area_raw",
-            "field4": "balcony_direction",
-            "field5": "house_direction",
-            "field6": "price_raw",
-            "field7": "front_width",
-            "field8": "furniture",
-            "field9": "legal_doc",
-            "field10": "bedroom_raw",
-            "field11": "bathroom_raw",
-            "field12": "floor_raw",
-            "field13": "entrance_width"
-        }
-        missing_cols = [c for c in column_mapping if c not in df_raw.columns]
-        if missing_cols:
-            raise Exception(f"Thiếu cột trong bds_raw: {missing_cols}")
-
-        # Rename và chọn cột cần thiết
-        df = df_raw[list(column_mapping.keys())].rename(columns=column_mapping)
+        # 3.1.3 Kiểm tra staging có dữ liệu không: đọc bố cục được load gần nhất (document theo header
+        # hoặc fieldN theo vị trí), bảng của bố cục còn lại có thể là dữ liệu ngày cũ
+        if is_newer(f"bds_doc{suffix}", than=[f"bds_raw{suffix}"]):
+            df_raw, df = read_doc_table(f"bds_doc{suffix}", BDS_DOC_MAPPING)
+            print(f"Đọc bds_doc{suffix} (theo key header)")
+        else:
+            check_table_has_data(f"bds_raw{suffix}")
+            df_raw, df = read_bds_raw(f"bds_raw{suffix}")
 
         # 3.1.6 Transform dữ liệu
         try:
@@ -257,7 +348,9 @@ def transform_bds(source_id: int = None, process_id: int = None):
             else:
                 df["created_at"] = df_raw["created_at"]
 
-            df["date_key"] = pd.to_datetime(df["created_at"]).dt.strftime('%Y%m%d').astype(int)
+            # Bảng theo ngày được load lúc backfill → date_key lấy ngày crawl, không lấy ngày load
+            df["date_key"] = int(crawl_date.strftime('%Y%m%d')) if crawl_date else \
+                pd.to_datetime(df["created_at"]).dt.strftime('%Y%m%d').astype(int)
             df["transformed_at"] = datetime.now()
         except Exception as e:
             raise Exception(f"Transform thất bại: {e}")
@@ -276,7 +369,7 @@ def transform_bds(source_id: int = None, process_id: int = None):
             with staging_engine.begin() as conn:
                 conn.execute(text("TRUNCATE TABLE bds_clean"))
             df_clean.to_sql("bds_clean", staging_engine, if_exists="append", index=False)
-            df_clean.to_csv(BDS_CSV_PATH, index=False, encoding="utf-8-sig")
+            df_clean.to_csv(clean_csv_path(BDS_CSV_PATH, crawl_date), index=False, encoding="utf-8-sig")
         except Exception as e:
             raise Exception(f"Load bds_clean thất bại: {e}")
 
@@ -294,45 +387,126 @@ def transform_bds(source_id: int = None, process_id: int = None):
         # Báo lỗi lên process_log + gửi email
         tb = traceback.format_exc()
         error_message = f"{str(e)}\n\nTraceback:\n{tb}"
-        fail_and_report(process_id, process_name, source_id, error_message, process_code="P3")
+        fail_and_report(process_id, process_name, source_id, error_message, process_code="P3B" if crawl_date else "P3")
         raise
 
 
+# --- THỜI ĐIỂM LOAD GẦN NHẤT (MAX(created_at)); bảng chưa tồn tại hoặc rỗng thì trả None ---
+def latest_load(table_name: str):
+    with staging_engine.connect() as conn:
+        if conn.execute(text(f"SHOW TABLES LIKE '{table_name}'")).first() is None:
+            return None
+        return conn.execute(text(f"SELECT MAX(created_at) FROM {table_name}")).scalar()
+
+
+# --- BẢNG CÓ DỮ LIỆU VÀ ĐƯỢC LOAD KHÔNG CŨ HƠN CÁC BẢNG SO SÁNH ---
+# load_csv không làm rỗng bảng không load hôm nay (để __old luôn là lần load thật trước đó),
+# nên chọn nguồn theo created_at thay vì chỉ xem bảng có dòng hay không
+def is_newer(table_name: str, than: list):
+    loaded_at = latest_load(table_name)
+    if loaded_at is None:
+        return False
+    others = [t for t in (latest_load(name) for name in than) if t is not None]
+    return all(loaded_at >= t for t in others)
+
+
+# --- ĐỌC CHOTOT_RAW: cột fieldN theo vị trí, số còn ở dạng chuỗi ---
+def read_chotot_raw(table_name: str = "chotot_raw"):
+    # 3.1.11. Đọc dữ liệu raw
+    try:
+        df_raw = pd.read_sql(f"SELECT * FROM {table_name}", staging_engine)
+    except Exception as e:
+        raise Exception(f"Không đọc được {table_name}")
+
+    # 3.1.12. Kiểm tra cột và rename
+    column_mapping = {
+        "field1": "title",
+        "field2": "address",
+        "field3": "area_desc",
+        "field4": "size_raw",
+        "field5": "bedroom_raw",
+        "field6": "area_m2",
+        "field7": "price_raw",
+        "field8": "province",
+        "field9": "country",
+    }
+    missing_cols = [c for c in column_mapping if c not in df_raw.columns]
+    if missing_cols:
+        raise Exception(f"Thiếu cột trong {table_name}")
+
+    # Cột chi tiết (ChoTot.py --enrich) nằm sau field9, chỉ có khi crawl có bật enrich
+    detail_mapping = {
+        "field10": "bathroom_raw",
+        "field11": "floor_raw",
+        "field12": "house_direction",
+        "field13": "legal_doc",
+        "field14": "furniture",
+    }
+    column_mapping.update({k: v for k, v in detail_mapping.items() if k in df_raw.columns})
+
+    df = df_raw[list(column_mapping.keys())].rename(columns=column_mapping)
+    return df_raw, df
+
+
+# --- ĐỌC CHOTOT_TYPED: số đã đúng kiểu từ crawler (JSONL + schema), không cần regex ---
+def read_chotot_typed(table_name: str = "chotot_typed"):
+    try:
+        df_typed = pd.read_sql(f"SELECT * FROM {table_name}", staging_engine)
+    except Exception as e:
+        raise Exception(f"Không đọc được {table_name}")
+
+    size = df_typed["size_m2"]
+    rooms = df_typed["rooms"]
+    # Số thập phân cố định (không ra dạng 1e+06 với diện tích lớn), bỏ số 0 thừa: 78.0 → "78", 32.2 → "32.2"
+    size_raw = size.map(lambda v: f"{v:.2f}".rstrip("0").rstrip(".") + " m²", na_action="ignore")
+    bedroom_raw = rooms.map(lambda v: f"{int(v)} PN", na_action="ignore")
+    df = pd.DataFrame({
+        "title": df_typed["title"],
+        "address": df_typed["location"],
+        "size_raw": size_raw,
+        "bedroom_raw": bedroom_raw,
+        "area_m2": size,
+        "price_raw": df_typed["price_vnd"],
+        "province": df_typed["province"],
+        "country": df_typed["country"],
+        "bedroom": rooms,
+        "price_vnd": df_typed["price_vnd"],
+        "bathroom": df_typed["bathroom"].fillna(-1).astype(int),
+        "floors": df_typed["floors"].fillna(-1).astype(int),
+        "house_direction": df_typed["house_direction"],
+        "legal_doc": df_typed["legal_doc"],
+        "furniture": df_typed["furniture"],
+    })
+    # Giống cột area của crawler: chỉ có khi đủ cả diện tích lẫn số phòng (cột toàn NaN không cộng chuỗi được)
+    area_desc = size_raw.fillna("").astype(str) + " - " + bedroom_raw.fillna("").astype(str)
+    df["area_desc"] = area_desc.where(size_raw.notna() & bedroom_raw.notna(), None)
+    return df_typed, df
+
+
 # ---------------- TRANSFORM CHOTOT ----------------
-def transform_chotot(source_id: int = None, process_id: int = None):
+def transform_chotot(source_id: int = None, process_id: int = None, crawl_date=None):
     process_name = PROCESS_CHOTOT
+    suffix = staging_suffix(crawl_date)
     try:
-        # 3.1.10 Kiểm tra bảng raw có dữ liệu không
-        check_table_has_data("chotot_raw")
-            
-        # 3.1.11. Đọc dữ liệu raw
-        try:
-            df_raw = pd.read_sql("SELECT * FROM chotot_raw", staging_engine)
-        except Exception as e:
-            raise Exception(f"Không đọc được chotot_raw")
-
-        # 3.1.12. Kiểm tra cột và rename
-        column_mapping = {
-            "field1": "title",
-            "field2": "address",
-            "field3": "area_desc",
-            "field4": "size_raw",
-            "field5": "bedroom_raw",
-            "field6": "area_m2",
-            "field7": "price_raw",
-            "field8": "province",
-            "field9": "country",
-        }
-        missing_cols = [c for c in column_mapping if c not in df_raw.columns]
-        if missing_cols:
-            raise Exception(f"Thiếu cột trong chotot_raw")
-
-        df = df_raw[list(column_mapping.keys())].rename(columns=column_mapping)
+        # Có bản ghi có kiểu cùng lần load (load_csv nạp từ JSONL + schema ngay sau CSV) thì đọc thẳng số,
+        # bỏ qua regex; chotot_typed cũ hơn CSV hôm nay (hôm nay crawl không ghi JSONL) thì bỏ qua
+        if is_newer(f"chotot_typed{suffix}", than=[f"chotot_raw{suffix}", f"chotot_doc{suffix}"]):
+            df_raw, df = read_chotot_typed(f"chotot_typed{suffix}")
+            print(f"Đọc chotot_typed{suffix} (số đúng kiểu, không parse lại)")
+        elif is_newer(f"chotot_doc{suffix}", than=[f"chotot_raw{suffix}"]):
+            df_raw, df = read_doc_table(f"chotot_doc{suffix}", CHOTOT_DOC_MAPPING, CHOTOT_DOC_DETAIL_MAPPING)
+            print(f"Đọc chotot_doc{suffix} (theo key header)")
+        else:
+            # 3.1.10 Kiểm tra bảng raw có dữ liệu không
+            check_table_has_data(f"chotot_raw{suffix}")
+            df_raw, df = read_chotot_raw(f"chotot_raw{suffix}")
 
         # 3.1.13 Transform dữ liệu
         try:
-            df["bedroom"] = df["bedroom_raw"].apply(normalize_int)
-            df["price_vnd"] = df["price_raw"].apply(normalize_price_vnd)
+            if "bedroom" not in df.columns:
+                # Chỉ nhánh chotot_raw mới phải parse chuỗi bằng regex
+                df["bedroom"] = df["bedroom_raw"].apply(normalize_int)
+                df["price_vnd"] = df["price_raw"].apply(normalize_price_vnd)
             df["price_val_million"] = df["price_vnd"] / 1_000_000
             df["price_billion"] = df["price_vnd"] / 1_000_000_000
 
@@ -340,12 +514,19 @@ def transform_chotot(source_id: int = None, process_id: int = None):
                 df[["bedroom", "price_vnd", "price_val_million", "price_billion"]].fillna(-1)
             df["bedroom"] = df["bedroom"].astype(int)
 
+            if "bathroom_raw" in df.columns:
+                df["bathroom"] = df["bathroom_raw"].apply(normalize_int).fillna(-1).astype(int)
+                df["floors"] = df["floor_raw"].apply(normalize_int).fillna(-1).astype(int)
+                for col in ["house_direction", "legal_doc", "furniture"]:
+                    df[col] = df[col].where(df[col] != "", None)
+
             if "created_at" not in df_raw.columns:
                 df["created_at"] = datetime.now()
             else:
                 df["created_at"] = df_raw["created_at"]
 
-            df["date_key"] = pd.to_datetime(df["created_at"]).dt.strftime('%Y%m%d').astype(int)
+            df["date_key"] = int(crawl_date.strftime('%Y%m%d')) if crawl_date else \
+                pd.to_datetime(df["created_at"]).dt.strftime('%Y%m%d').astype(int)
             df["transformed_at"] = datetime.now()
         except Exception as e:
             raise Exception(f"Transform thất bại: {e}")
@@ -354,6 +535,7 @@ def transform_chotot(source_id: int = None, process_id: int = None):
             "title", "address", "area_desc", "size_raw", "bedroom_raw",
             "area_m2", "price_raw", "province", "country",
             "bedroom", "price_vnd", "price_val_million", "price_billion",
+            "bathroom_raw", "floor_raw", "bathroom", "floors", "house_direction", "legal_doc", "furniture",
             "date_key", "created_at", "transformed_at"
         ]
         df_clean = df[[c for c in final_cols if c in df.columns]]
@@ -362,8 +544,9 @@ def transform_chotot(source_id: int = None, process_id: int = None):
         try:
             with staging_engine.begin() as conn:
                 conn.execute(text("TRUNCATE TABLE chotot_clean"))
+            add_missing_columns("chotot_clean", df_clean)
             df_clean.to_sql("chotot_clean", staging_engine, if_exists="append", index=False)
-            df_clean.to_csv(CHOTOT_CSV_PATH, index=False, encoding="utf-8-sig")
+            df_clean.to_csv(clean_csv_path(CHOTOT_CSV_PATH, crawl_date), index=False, encoding="utf-8-sig")
         except Exception as e:
             raise Exception(f"Load chotot_clean thất bại: {e}")
 
@@ -381,12 +564,12 @@ def transform_chotot(source_id: int = None, process_id: int = None):
         # Báo lỗi lên process_log + gửi email
         tb = traceback.format_exc()
         error_message = f"{str(e)}\n\nTraceback:\n{tb}"
-        fail_and_report(process_id, process_name, source_id, error_message, process_code="P4")
+        fail_and_report(process_id, process_name, source_id, error_message, process_code="P4B" if crawl_date else "P4")
         raise
 
 
 # HÀM RUNNER tổng quát
-def run_transform_for_source(process_name: str, source_name: str, transform_func):
+def run_transform_for_source(process_name: str, source_name: str, transform_func, crawl_date=None):
     source_id = None
     process_id = None
     # 3.1.1. Lấy source_id
@@ -403,7 +586,7 @@ def run_transform_for_source(process_name: str, source_name: str, transform_func
 
     # 3.1.2. Log process start 
     try:
-        process_id = log_process_start(process_name, source_id)
+        process_id = log_process_start(process_name, source_id, crawl_date)
     except Exception as e:
         tb = traceback.format_exc()
         error_message = f"Lỗi khi insert process_log start: {e}"
@@ -412,7 +595,7 @@ def run_transform_for_source(process_name: str, source_name: str, transform_func
         return
 
     # THỰC HIỆN TRANSFORM 
-    row_count = transform_func(source_id=source_id, process_id=process_id)
+    row_count = transform_func(source_id=source_id, process_id=process_id, crawl_date=crawl_date)
 
     # 3.1.9, 3.1.16 Nếu thành công -> log process end SUCCESS và in
     msg = f"OK - {row_count} rows"
@@ -420,10 +603,16 @@ def run_transform_for_source(process_name: str, source_name: str, transform_func
     print(f"{process_name}: {msg}")
 
 def main():
+    parser = argparse.ArgumentParser(description="Transform staging BDS/ChoTot sang bảng clean")
+    parser.add_argument("--date", type=str, default=None,
+                        help="Chạy lại 1 ngày cũ (ddmmyyyy) từ bảng theo ngày của load_csv.py --backfill")
+    args = parser.parse_args()
+    crawl_date = datetime.strptime(args.date, "%d%m%Y") if args.date else None
+
     # BDS Branch
-    run_transform_for_source(PROCESS_BDS, SOURCE_BDS_NAME, transform_bds)
+    run_transform_for_source(PROCESS_BDS, SOURCE_BDS_NAME, transform_bds, crawl_date)
     # Chotot Branch
-    run_transform_for_source(PROCESS_CHOTOT, SOURCE_CHOTOT_NAME, transform_chotot)
+    run_transform_for_source(PROCESS_CHOTOT, SOURCE_CHOTOT_NAME, transform_chotot, crawl_date)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file